@@ -3,9 +3,10 @@ from dash import dash_table
 import pandas as pd
 from dash import dcc, html
 from dash import ctx
-from dash.dependencies import Input, Output, State
+from dash.dependencies import ClientsideFunction, Input, Output, State
+from dash.exceptions import PreventUpdate
+from flask import Response
 import os
-import shutil
 import base64
 import plotly.graph_objs as go
 import ast  # For safely evaluating the list input
@@ -17,21 +18,29 @@ from pages_layouts.explore_system_page import explore_system_page
 from pages_layouts.advanced_search_page import advanced_search_page
 
 
-from callbacks_helpers import db_calls, estimators_calls
-from files_utils import system_functions, demarcators, read_l, read_mat, estimators
+from callbacks_helpers import api, db_calls, estimators_calls, figures_calls, jobs, table_calls, transport
+from callbacks_helpers.lru_cache import LRUCache
+from files_utils import system_functions, demarcators, read_l, read_mat, metrics
+from files_utils.lazy import lazy_import
+
+# numba and scipy are only imported once an estimation is run
+estimators = lazy_import("files_utils.estimators")
 
 
 #############################   Global Variables  #############################
 systems_db = {}
 data_folder_path = ""
-current_system_df_l = None
-current_system_df_mat = None
+# Frames of the systems loaded in this process, keyed by `system_frames_key`; each
+# browser session keeps the key of its system in 'loaded-system-store'
+loaded_systems = LRUCache(maxsize=4)
+top_k_matches = 10
 
 
 #############################   Main Layout  #############################
 # Initialize the Dash app
-app = dash.Dash(__name__, suppress_callback_exceptions=True)
+app = dash.Dash(__name__, suppress_callback_exceptions=True, background_callback_manager=jobs.background_callback_manager)
 app.title = "Binary Stars Data Analysis"
+transport.enable_compression(app.server)
 
 
 # Define the layout of the navigation bar
@@ -44,19 +53,30 @@ navbar_layout = html.Div([
 ], className='navbar')
 
 
-# Define the main layout
-app.layout = html.Div([
-    dcc.Location(id='url', refresh=False),
-    html.H1("Binary Stars Data Analysis", className='main-header'),
-    navbar_layout,
-    html.Div(id='page-content')
-])
+def systems_schema():
+    """Names of the systems, kept by the browser in 'systems-schema-store' to fill dropdowns."""
+    return {'systems': list(systems_db.keys())}
+
+
+# Define the main layout, served on every page load so that it carries the current systems
+def serve_layout():
+    return html.Div([
+        dcc.Location(id='url', refresh=False),
+        dcc.Store(id='systems-schema-store', data=systems_schema()),
+        html.H1("Binary Stars Data Analysis", className='main-header'),
+        navbar_layout,
+        html.Div(id='page-content')
+    ])
+
+
+app.layout = serve_layout
 
 
 @app.callback(
     Output('page-content', 'children'), 
     Input('url', 'pathname')
 )
+@metrics.timed(name="callback.display_page")
 def display_page(pathname):
     """Dynamically displays content based on the URL path."""
     if pathname == '/db': return db_page
@@ -72,6 +92,7 @@ def display_page(pathname):
     Output('systems-list-output', 'children'), 
     Input('load-systems-button', 'n_clicks')
 )
+@metrics.timed(name="callback.show_systems_in_db")
 def show_systems_in_db(n_clicks):
     """Displays the names of systems in the database."""
     if not n_clicks:
@@ -92,21 +113,24 @@ def show_systems_in_db(n_clicks):
 
 @app.callback(
     Output("system-upload-output", "children"),
+    Output("systems-schema-store", "data", allow_duplicate=True),
     Input("system-upload-button", "n_clicks"),
     State("system-name-input", "value"),
     State("input-files", "contents"),
-    State("input-files", "filename")
+    State("input-files", "filename"),
+    prevent_initial_call=True
 )
+@metrics.timed(name="callback.add_system_db")
 def add_system_db(n_clicks, system_name, contents, filenames):
     global systems_db
     if not n_clicks:
-        return ""
+        return "", dash.no_update
     if not system_name:
-        return html.Div("⚠️ Please enter a system name.")
+        return html.Div("⚠️ Please enter a system name."), dash.no_update
     if system_name in systems_db:
-        return html.Div("⚠️ System already in the database.")
+        return html.Div("⚠️ System already in the database."), dash.no_update
     if not contents or not filenames:
-        return html.Div("⚠️ No files uploaded.")
+        return html.Div("⚠️ No files uploaded."), dash.no_update
 
     # Normalize to list
     if isinstance(contents, str):
@@ -121,15 +145,15 @@ def add_system_db(n_clicks, system_name, contents, filenames):
             decoded = base64.b64decode(content_string)
             decoded_files.append({"filename": filename, "content": decoded})
         except Exception as e:
-            return html.Div(f"⚠️ Error decoding {filename}: {e}")
+            return html.Div(f"⚠️ Error decoding {filename}: {e}"), dash.no_update
 
     try:
         db_calls.add_system(data_folder_path, system_name, decoded_files)
     except Exception as e:
-        return html.Div(f"❌ Error in add_system: {e}")
+        return html.Div(f"❌ Error in add_system: {e}"), dash.no_update
 
     systems_db = db_calls.inspect_db(data_folder_path)
-    return html.Div(f"✅ files: {[file['filename'] for file in decoded_files]} added to system '{system_name}'.")
+    return html.Div(f"✅ files: {[file['filename'] for file in decoded_files]} added to system '{system_name}'."), systems_schema()
 
 
 @app.callback(
@@ -141,6 +165,7 @@ def add_system_db(n_clicks, system_name, contents, filenames):
     State("file-name", "value"),
     prevent_initial_call=True
 )
+@metrics.timed(name="callback.add_file_db")
 def add_file_db(n_clicks, contents, filenames, system_name, file_name):
     global systems_db
     if not contents:
@@ -182,6 +207,7 @@ def add_file_db(n_clicks, contents, filenames, system_name, file_name):
     State("file-name", "value"),
     prevent_initial_call=True
 )
+@metrics.timed(name="callback.delete_file_db")
 def delete_file_db(n_clicks, system_name, file_name):
     global systems_db
     if not system_name:
@@ -203,44 +229,77 @@ def delete_file_db(n_clicks, system_name, file_name):
 
 @app.callback(
     Output("update-existing-system-output", "children", allow_duplicate=True),
+    Output("systems-schema-store", "data", allow_duplicate=True),
     Input("delete-system-button", "n_clicks"),
     State("existing-system-id", "value"),
     prevent_initial_call=True
 )
+@metrics.timed(name="callback.delete_system_db")
 def delete_system_db(n_clicks, system_name):
     global systems_db
     if not system_name:
-        return html.Div("⚠️ Please enter a system name.")  
+        return html.Div("⚠️ Please enter a system name."), dash.no_update
     system_path = os.path.join(data_folder_path, system_name)
     if not os.path.exists(system_path):
-        return html.Div(f"⚠️ System '{system_name}' not found.")
+        return html.Div(f"⚠️ System '{system_name}' not found."), dash.no_update
     
     try:
         # Delete the system directory and its contents
-        shutil.rmtree(system_path)
+        db_calls.delete_system(data_folder_path, system_name)
         systems_db = db_calls.inspect_db(data_folder_path)
-        return html.Div(f"✅ System '{system_name}' and its files have been deleted.")
+        return html.Div(f"✅ System '{system_name}' and its files have been deleted."), systems_schema()
     except Exception as e:
-        return html.Div(f"❌ Error deleting system '{system_name}': {e}")
+        return html.Div(f"❌ Error deleting system '{system_name}': {e}"), dash.no_update
 
 
 #############################   Explore System Page   #######################
-@app.callback(
+# The dropdowns of system and column names are filled in the browser, see assets/schema.js
+app.clientside_callback(
+    ClientsideFunction(namespace='schema', function_name='systemOptions'),
     Output('system-name-dropdown', 'options'),
-    Input('url', 'pathname')
+    Input('url', 'pathname'),
+    Input('systems-schema-store', 'data')
 )
-def populate_dropdown_systems_names(n_clicks):
-    return [{'label': name, 'value': name} for name in systems_db.keys()]
 
 
-@app.callback([Output('files-list-to_display', 'children'), Output('system-info-output', 'children'), Output('cycle-length-col-dropdown', 'options')],
+def system_frames_key(system_name):
+    """Key of a system's frames in `loaded_systems`, valid until the database changes."""
+    return ("system", system_name, db_calls.get_db_version())
+
+
+def load_system_job(system_name):
+    """
+    Saves a system's frames to disk for the server processes and returns what the page
+    shows of them, sharing the work with identical in-flight jobs.
+    """
+    def load():
+        system_df_l, system_df_mat = db_calls.save_system(data_folder_path, system_name, systems_db[system_name])
+        merged_df = pd.merge(system_df_l, system_df_mat, on='cycle', how='outer')
+        return {
+            'info': system_functions.system_info(merged_df),
+            'memory': {name: system_functions.system_info(df, df.attrs.get('load_peak_bytes'))['memory']
+                       for name, df in (('L', system_df_l), ('MAT', system_df_mat))},
+            # Column names per file type, for the column dropdowns
+            'columns': {'L': system_df_l.columns.tolist(), 'MAT': system_df_mat.columns.tolist(), 'MERGED': merged_df.columns.tolist()},
+        }
+
+    return jobs.run_deduplicated(system_frames_key(system_name), load)
+
+
+@app.callback([Output('files-list-to_display', 'children'), Output('system-info-output', 'children'), Output('loaded-system-store', 'data')],
     [Input('load-button', 'n_clicks')],
     [State('system-name-dropdown', 'value')],
+    background=True,
+    running=[(Output('load-button', 'disabled'), True, False), (Output('cancel-load-button', 'disabled'), False, True)],
+    cancel=[Input('cancel-load-button', 'n_clicks')],
+    progress=[Output('load-progress', 'children')],
     prevent_initial_call=True
 )
-def enter_system_to_explore(n_clicks, system_name):
+@jobs.publishing_metrics
+@metrics.timed(name="callback.enter_system_to_explore")
+def enter_system_to_explore(set_progress, n_clicks, system_name):
     if not n_clicks or not system_name:
-        return "", ""
+        return "", "", None
 
     # Get file names
     system_files = systems_db.get(system_name, [])
@@ -251,22 +310,9 @@ def enter_system_to_explore(n_clicks, system_name):
         html.Ul([html.Li(f) for f in system_files_flat])
     ])
 
-    system_path = os.path.join(data_folder_path, system_name)
-
-    l_files = [os.path.join(system_path, f) for f in system_files[0]]
-    mat_files = [os.path.join(system_path, f) for f in system_files[1]]
-
-    system_df_l = read_l.concatenate_files(l_files)
-    system_df_mat = read_mat.concatenate_files(mat_files)
-    merged_df = pd.merge(system_df_l, system_df_mat, on='cycle', how='outer')
-    
-    global current_system_df_l
-    global current_system_df_mat
-    current_system_df_l = system_df_l
-    current_system_df_mat = system_df_mat
-
-    # Get system info
-    info = system_functions.system_info(merged_df)
+    set_progress(f"Reading {len(system_files_flat)} files...")
+    summary = load_system_job(system_name)
+    info = summary['info']
 
     info_display = html.Div([
         html.H4("System Information:"),
@@ -274,29 +320,92 @@ def enter_system_to_explore(n_clicks, system_name):
             html.Li(f"Number of Rows: {info['num_rows']}"),
             html.Li(f"Number of Columns: {info['num_columns']}"),
             html.Li(f"Number of Cycles: {info['max_cycle']}")
-        ])
+        ]),
+        memory_display(summary['memory']),
     ])
 
-    cycle_len_plot_cols = [{'label': col, 'value': col} for col in current_system_df_mat.columns]
-    return (file_list, info_display, cycle_len_plot_cols)
+    set_progress("")
+    return (file_list, info_display, {'system': system_name, 'key': system_frames_key(system_name), 'columns': summary['columns']})
 
 
+# Runs in the server process, which keeps the frames for the later table and plot callbacks
 @app.callback(
+    Input('loaded-system-store', 'data'),
+    prevent_initial_call=True
+)
+@metrics.timed(name="callback.keep_loaded_system")
+def keep_loaded_system(loaded_system):
+    get_system_frames(loaded_system)
+
+
+def _megabytes(n_bytes):
+    return f"{n_bytes / 1e6:.1f} MB" if n_bytes is not None else "unknown"
+
+
+def memory_display(reports, n_columns=10):
+    """Memory of the loaded frames, with their largest columns."""
+    largest = sorted(
+        ((col, name, usage) for name, report in reports.items() for col, usage in report['columns'].items()),
+        key=lambda item: -item[2]['bytes']
+    )[:n_columns]
+
+    return html.Div([
+        html.H4("Memory:"),
+        html.Ul([
+            html.Li(f"{name} frame: {_megabytes(report['total_bytes'])} (peak while loading: {_megabytes(report['load_peak_bytes'])})")
+            for name, report in reports.items()
+        ] + [html.Li(f"Compact dtypes: {'on' if db_calls.COMPACT_FRAMES else 'off'}")]),
+        html.Table([
+            html.Tr([html.Th("Column"), html.Th("File"), html.Th("Type"), html.Th("Memory")]),
+            *[html.Tr([html.Td(col), html.Td(name), html.Td(usage['dtype']), html.Td(_megabytes(usage['bytes']))])
+              for col, name, usage in largest]
+        ]),
+    ])
+
+
+app.clientside_callback(
+    ClientsideFunction(namespace='schema', function_name='matColumnOptions'),
+    Output('cycle-length-col-dropdown', 'options'),
+    Input('loaded-system-store', 'data'),
+    prevent_initial_call=True
+)
+
+
+def get_system_frames(loaded_system):
+    """
+    Returns the frames of the session's loaded system, reading them the first time this
+    process needs them from the copy saved by the load job (or from the files).
+    """
+    if not loaded_system:
+        raise PreventUpdate
+
+    def load():
+        system_name = loaded_system['system']
+        frames = db_calls.read_saved_system(data_folder_path, system_name, systems_db[system_name])
+        if frames is None:
+            frames = db_calls.load_system(data_folder_path, system_name, systems_db[system_name])
+        return {'L': frames[0], 'MAT': frames[1], 'MERGED': None}
+
+    return loaded_systems.get_or_compute(tuple(loaded_system['key']), load)
+
+
+app.clientside_callback(
+    ClientsideFunction(namespace='schema', function_name='columnOptions'),
     Output('df-column-selector', 'options'),
     Input('df-selector-display-table', 'value'),
+    State('loaded-system-store', 'data'),
     prevent_initial_call=True
 )
-def get_df_columns(file_type):
-    current_df = get_df_type(file_type)
-    return [{'label': col, 'value': col} for col in current_df.columns]
 
 
-def get_df_type(file_type):
-    if file_type == 'L':
-        return current_system_df_l
-    elif file_type == 'MAT':
-        return current_system_df_mat
-    return pd.merge(current_system_df_l, current_system_df_mat, on='cycle', how='outer')
+def get_df_type(file_type, loaded_system):
+    frames = get_system_frames(loaded_system)
+    if file_type in ('L', 'MAT'):
+        return frames[file_type]
+    # Merged once per loaded system, so that per-frame caches (e.g. plot pyramids) are reused
+    if frames['MERGED'] is None:
+        frames['MERGED'] = pd.merge(frames['L'], frames['MAT'], on='cycle', how='outer')
+    return frames['MERGED']
 
 
 @app.callback(
@@ -306,37 +415,70 @@ def get_df_type(file_type):
     State('df-selector-display-table', 'value'),
     State('row-start', 'value'),
     State('row-end', 'value'),
+    State('loaded-system-store', 'data'),
     prevent_initial_call=True
 )
-def update_table(n_clicks, selected_columns, file_type, row_start, row_end):
+@metrics.timed(name="callback.update_table")
+def update_table(n_clicks, selected_columns, file_type, row_start, row_end, loaded_system):
     if n_clicks == 0 or not file_type:
         return ""
 
-    current_df = get_df_type(file_type)
-    
-    # get the df
-    preview_df = system_functions.get_df_preview(current_df, selected_columns, row_start=row_start, row_end=row_end)
-
-    # Return as a Dash DataTable for display
-    return dash_table.DataTable(
-        data=preview_df.to_dict('records'),
-        columns=[{'name': col, 'id': col} for col in preview_df.columns],
-        page_size=10,
-        sort_action='native',
-        style_table={'overflowX': 'auto'},
-        style_cell={'textAlign': 'left'},
-    )
+    current_df = get_df_type(file_type, loaded_system)
+    columns = [col for col in selected_columns if col in current_df.columns] if selected_columns is not None else list(current_df.columns)
+
+    # Only the current page is sent to the browser, see page_table
+    view = {'file_type': file_type, 'columns': columns, 'row_start': row_start, 'row_end': row_end}
+    return html.Div([
+        dcc.Store(id='df-table-view', data=view),
+        dash_table.DataTable(
+            id='df-table',
+            columns=[{'name': col, 'id': col} for col in columns],
+            page_current=0,
+            page_size=10,
+            page_action='custom',
+            sort_action='custom',
+            sort_mode='multi',
+            sort_by=[],
+            filter_action='custom',
+            filter_query='',
+            style_table={'overflowX': 'auto'},
+            style_cell={'textAlign': 'left'},
+        ),
+    ])
 
 
 @app.callback(
+    Output('df-table', 'data'),
+    Output('df-table', 'page_count'),
+    Input('df-table', 'page_current'),
+    Input('df-table', 'page_size'),
+    Input('df-table', 'sort_by'),
+    Input('df-table', 'filter_query'),
+    State('df-table-view', 'data'),
+    State('loaded-system-store', 'data'),
+)
+@metrics.timed(name="callback.page_table")
+def page_table(page_current, page_size, sort_by, filter_query, view, loaded_system):
+    """Filters, sorts and slices the displayed frame on the server, returning only the current page."""
+    if not view:
+        raise PreventUpdate
+
+    # Row slice only: the columns are selected on the page, avoiding a copy of the frame
+    rows_df = get_df_type(view['file_type'], loaded_system).iloc[view['row_start']:view['row_end']]
+    view_key = (tuple(loaded_system['key']), view['file_type'], view['row_start'], view['row_end'])
+    try:
+        return table_calls.query_page(rows_df, view_key, view['columns'], page_current, page_size, sort_by, filter_query)
+    except ValueError:
+        return [], 1
+
+
+app.clientside_callback(
+    ClientsideFunction(namespace='schema', function_name='plotColumnOptions'),
     [Output('plot-col1', 'options'), Output('plot-col2', 'options')],
     Input('df-selector-plot', 'value'),
+    State('loaded-system-store', 'data'),
     prevent_initial_call=True
 )
-def get_plot_columns(file_type):
-    current_df = get_df_type(file_type)
-    options = [{'label': col, 'value': col} for col in current_df.columns]
-    return options, options
 
 
 @app.callback(
@@ -347,9 +489,14 @@ def get_plot_columns(file_type):
     State('plot-col2', 'value'),
     State('log-scale-col1', 'value'),
     State('log-scale-col2', 'value'),
+    State('plot-mode', 'value'),
+    State('loaded-system-store', 'data'),
     prevent_initial_call=True
 )
-def plot_2_params(n_clicks, file_type, col1, col2, log1, log2):
+@metrics.timed(name="callback.plot_2_params")
+def plot_2_params(n_clicks, file_type, col1, col2, log1, log2, plot_mode, loaded_system):
+    if not loaded_system:
+        return html.Div("Please load a system first.", className='warning-message')
     if col1 is None or col2 is None:
         return html.Div("Please select both columns.", className='warning-message')
 
@@ -358,21 +505,64 @@ def plot_2_params(n_clicks, file_type, col1, col2, log1, log2):
     log_y = 'log' in log2 if log2 else False
 
     try:
-        df = get_df_type(file_type)
-        fig = system_functions.plot_x_vs_y(df, col1, col2, log_x=log_x, log_y=log_y)
-        return dcc.Graph(figure=fig)
+        def build_figure():
+            df = get_df_type(file_type, loaded_system)
+            if plot_mode == 'density':
+                return system_functions.plot_x_vs_y_density(df, col1, col2, log_x=log_x, log_y=log_y)
+            return system_functions.plot_x_vs_y(df, col1, col2, log_x=log_x, log_y=log_y)
+
+        key = (tuple(loaded_system['key']), plot_mode, file_type, col1, col2, log_x, log_y)
+        fig = figures_calls.cached_figure(key, build_figure)
+        return dcc.Graph(id='two-params-graph', figure=fig)
     except Exception as e:
         return html.Div(f"Error generating plot: {str(e)}", className='error-message')
 
 
+@app.callback(
+    Output('two-params-graph', 'figure'),
+    Input('two-params-graph', 'relayoutData'),
+    State('df-selector-plot', 'value'),
+    State('plot-col1', 'value'),
+    State('plot-col2', 'value'),
+    State('log-scale-col1', 'value'),
+    State('log-scale-col2', 'value'),
+    State('plot-mode', 'value'),
+    State('loaded-system-store', 'data'),
+    prevent_initial_call=True
+)
+@metrics.timed(name="callback.zoom_2_params")
+def zoom_2_params(relayout_data, file_type, col1, col2, log1, log2, plot_mode, loaded_system):
+    """Re-aggregates the scatter plot for the visible x range after a zoom or pan."""
+    if not relayout_data or plot_mode == 'density' or col1 is None or col2 is None:
+        raise PreventUpdate
+
+    if 'xaxis.range[0]' in relayout_data:
+        x_range = (relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]'])
+    elif 'xaxis.range' in relayout_data:
+        x_range = tuple(relayout_data['xaxis.range'])
+    elif relayout_data.get('xaxis.autorange'):
+        x_range = None
+    else:
+        raise PreventUpdate
+
+    log_x = 'log' in log1 if log1 else False
+    log_y = 'log' in log2 if log2 else False
+    df = get_df_type(file_type, loaded_system)
+    return system_functions.plot_x_vs_y(df, col1, col2, log_x=log_x, log_y=log_y, x_range=x_range)
+
+
 @app.callback(
     Output('plot-cycle-length-output', 'children'),
     Input('plot-cycle-length-button', 'n_clicks'),
     State('cycle-length-col-dropdown', 'value'),
     State('log-scale-checklist', 'value'),
+    State('loaded-system-store', 'data'),
     prevent_initial_call=True
 )
-def cycle_length_vs_col_plot(n_clicks, selected_column, log_scale_values):
+@metrics.timed(name="callback.cycle_length_vs_col_plot")
+def cycle_length_vs_col_plot(n_clicks, selected_column, log_scale_values, loaded_system):
+    if not loaded_system:
+        return html.Div("Please load a system first.", className='warning-message')
     if not n_clicks or not selected_column:
         return html.Div("Please select a column and click Plot.")
 
@@ -382,53 +572,104 @@ def cycle_length_vs_col_plot(n_clicks, selected_column, log_scale_values):
     
     # Create the figure
     try:
-        fig =  system_functions.plot_cycles_lengths_vs_param(current_system_df_l, current_system_df_mat, selected_column, log_x, log_y)
+        columns = tuple(selected_column) if isinstance(selected_column, list) else (selected_column,)
+        frames = get_system_frames(loaded_system)
+        key = (tuple(loaded_system['key']), 'cycles_lengths_vs_param', columns, log_x, log_y)
+        fig = figures_calls.cached_figure(key, lambda: system_functions.plot_cycles_lengths_vs_param(
+            frames['L'], frames['MAT'], list(columns), log_x, log_y))
         return dcc.Graph(figure=fig)
     except Exception as e:
         return html.Div(f"Error generating plot: {str(e)}", className='error-message')
 
 
 ############################  Data Analysis Page   ####################
+app.clientside_callback(
+    ClientsideFunction(namespace='schema', function_name='systemOptions'),
+    Output('system-name-dropdown-temp-time', 'options'),
+    Input('url', 'pathname'),
+    Input('systems-schema-store', 'data')
+)
+
+
 @app.callback(
     Output('temp-time-plot', 'children'),
     Input('generate-temp-time-plot-button', 'n_clicks'),
-    State('system-name-input-temp-time', 'value'),
-    State('cycles-list-input-temp-time', 'value')
+    State('system-name-dropdown-temp-time', 'value'),
+    State('cycles-list-input-temp-time', 'value'),
+    background=True,
+    running=[(Output('generate-temp-time-plot-button', 'disabled'), True, False), (Output('cancel-temp-time-plot-button', 'disabled'), False, True)],
+    cancel=[Input('cancel-temp-time-plot-button', 'n_clicks')],
+    progress=[Output('temp-time-plot-progress', 'children')],
 )
-def plot_effective_temperature_vs_time(n_clicks, system_name, cycles_list_str):
-    if n_clicks == 0 or not system_name or not cycles_list_str:
-        return html.Div("Please enter the system name and the list of cycles to plot.")
+@jobs.publishing_metrics
+@metrics.timed(name="callback.plot_effective_temperature_vs_time")
+def plot_effective_temperature_vs_time(set_progress, n_clicks, system_names, cycles_list_str):
+    if n_clicks == 0 or not cycles_list_str:
+        return html.Div("Please select the systems and enter the list of cycles to plot.")
 
     try:
-        # convert the cycles list from an input string to a list
-        cycles_list = ast.literal_eval(cycles_list_str)
-        if not isinstance(cycles_list, list):
+        # convert the cycles list from an input string to a list, or to a dict of lists per system
+        cycles_input = ast.literal_eval(cycles_list_str)
+        if isinstance(cycles_input, dict):
+            selections = [(name, list(cycles)) for name, cycles in cycles_input.items()]
+        elif isinstance(cycles_input, list):
+            system_names = system_names if isinstance(system_names, list) else [system_names] if system_names else []
+            selections = [(name, cycles_input) for name in system_names]
+        else:
             raise ValueError
     except Exception:
-        return html.Div("Invalid cycles list format. Use [10, 100, 200]")
+        return html.Div("Invalid cycles list format. Use [10, 100, 200] or {'system_a': [10], 'system_b': [20, 30]}")
 
-    files_lst = systems_db[system_name][0]
-    system_path = os.path.join(data_folder_path, system_name)
-    files_lst = [os.path.join(system_path, f) for f in files_lst]
-    system = read_l.concatenate_files(files_lst)
+    if not selections:
+        return html.Div("Please select at least one system.")
+    unknown = [name for name, _ in selections if name not in systems_db]
+    if unknown:
+        return html.Div(f"Unknown systems: {', '.join(unknown)}", className='error-message')
 
-    # Call plot function
+    def build_figure():
+        set_progress(f"Loading and demarcating {len(selections)} system(s)...")
+        return transport.figure_to_json(figures_calls.plot_systems_decay(data_folder_path, systems_db, selections))
+
+    # Figures live in the job store since this callback runs outside the server process
+    key = ("figure", "decay", db_calls.get_db_version()) + tuple((name, tuple(cycles)) for name, cycles in selections)
     try:
-        fig = system_functions.plot_cycles(system , cycles_list, demarcators.demarcate_decay_phases)
+        fig = transport.loads(jobs.run_deduplicated(key, build_figure))
+        set_progress("")
         return dcc.Graph(figure=fig)
     except Exception as e:
         return html.Div(f"Error generating time-temp plot: {str(e)}", className='error-message')
 
 #############################   Estimate Page   #######################
+def load_estimation_systems():
+    return estimators_calls.retrieve_systems_with_companion_mass(systems_db, estimators_calls.ESTIMATION_DATASET, data_folder_path)
+
+
+def find_matches_job(margins):
+    """Closest matches for the margins, sharing the work with identical in-flight jobs."""
+    return jobs.run_deduplicated(
+        estimators_calls.estimation_cache_key("find_closest_matches", estimators_calls.ESTIMATION_DATASET, margins, top_k_matches),
+        lambda: estimators_calls.cached_find_closest_matches(
+            load_estimation_systems(), estimators_calls.ESTIMATION_DATASET, margins, k=top_k_matches
+        )
+    )
+
+
 @app.callback(
     Output('last-nova-output', 'children'),
     Input('estimate-nova-button', 'n_clicks'),
     State('wd-mass-input', 'value'), State('wd-mass-delta-input', 'value'),
     State('comp-mass-input', 'value'), State('comp-mass-delta-input', 'value'),
     State('eff-temp-input', 'value'), State('eff-temp-delta-input', 'value'),
+    State('nova-samples-input', 'value'),
+    background=True,
+    running=[(Output('estimate-nova-button', 'disabled'), True, False), (Output('cancel-nova-button', 'disabled'), False, True)],
+    cancel=[Input('cancel-nova-button', 'n_clicks')],
+    progress=[Output('last-nova-progress', 'children')],
     prevent_initial_call=True
 )
-def estimate_last_nova_callback(n_clicks, wd_mass, wd_mass_delta, comp_mass, comp_mass_delta, eff_temp, eff_temp_delta):
+@jobs.publishing_metrics
+@metrics.timed(name="callback.estimate_last_nova_callback")
+def estimate_last_nova_callback(set_progress, n_clicks, wd_mass, wd_mass_delta, comp_mass, comp_mass_delta, eff_temp, eff_temp_delta, n_samples):
     # Ensure all inputs are present
     if any(v is None for v in [wd_mass, wd_mass_delta, comp_mass, comp_mass_delta, eff_temp, eff_temp_delta]):
         return html.P("Please fill in all input fields (including deltas).", className='error-message')
@@ -436,26 +677,60 @@ def estimate_last_nova_callback(n_clicks, wd_mass, wd_mass_delta, comp_mass, com
     # Make margin dict from user inputs
     margins = {'MWD': [wd_mass, wd_mass_delta], 'MRD': [comp_mass, comp_mass_delta], 'effective temperature': [eff_temp, eff_temp_delta]}
 
-    dfs = estimators_calls.retrieve_systems_with_companion_mass(systems_db, "masses_data", data_folder_path)
-    time = estimators.estimate_nova(dfs, margins)
+    if n_samples:
+        set_progress(f"Matching {n_samples} sampled observations...")
+        distribution = jobs.run_deduplicated(
+            estimators_calls.estimation_cache_key("estimate_nova_time_distribution", estimators_calls.ESTIMATION_DATASET, margins, n_samples),
+            lambda: estimators_calls.cached_estimate_nova_time_distribution(
+                load_estimation_systems(), estimators_calls.ESTIMATION_DATASET, margins, n_samples
+            )
+        )
+        set_progress("")
+        if distribution is None:
+            return html.P("No match found.", className='error-message')
+
+        low, high = distribution['percentiles'][5], distribution['percentiles'][95]
+        return html.Div([
+            html.P(f"Last nova estimated {distribution['median']:.3f} years ago (median)", className='success-message'),
+            html.P(f"90% interval: {low:.3f} - {high:.3f} years, "
+                   f"from {distribution['n_matched']} of {distribution['n_samples']} sampled observations")
+        ])
 
-    if time == -1:
+    set_progress("Searching the systems...")
+    estimates = jobs.run_deduplicated(
+        estimators_calls.estimation_cache_key("estimate_nova_times", estimators_calls.ESTIMATION_DATASET, margins, top_k_matches),
+        lambda: estimators_calls.cached_estimate_nova_times(
+            load_estimation_systems(), estimators_calls.ESTIMATION_DATASET, margins, k=top_k_matches
+        )
+    )
+    set_progress("")
+
+    if not estimates:
         return html.P("No match found.", className='error-message')
 
+    times = [est['time'] for est in estimates]
     return html.Div([
-        html.P(f"Last nova estimated {time:.3f} years ago", className='success-message')
+        html.P(f"Last nova estimated {times[0]:.3f} years ago", className='success-message'),
+        html.P(f"Range over the {len(times)} closest matches: {min(times):.3f} - {max(times):.3f} years")
     ])
 
 
 @app.callback(
     Output('fourth-param-output', 'children'),
-    Input('estimte-fourth-param-button', 'n_clicks'),
+    Input('estimate-fourth-param-button', 'n_clicks'),
     State('param1-dropdown', 'value'), State('param1-value', 'value'), State('param1-delta', 'value'),
     State('param2-dropdown', 'value'), State('param2-value', 'value'), State('param2-delta', 'value'),
     State('param3-dropdown', 'value'), State('param3-value', 'value'), State('param3-delta', 'value'),
+    State('missing-param-mode', 'value'),
+    background=True,
+    running=[(Output('estimate-fourth-param-button', 'disabled'), True, False), (Output('cancel-fourth-param-button', 'disabled'), False, True)],
+    cancel=[Input('cancel-fourth-param-button', 'n_clicks')],
+    progress=[Output('fourth-param-progress', 'children')],
     prevent_initial_call=True
 )
-def estimate_one_missing_parameter_callback(n_clicks, p1n, p1v, p1d, p2n, p2v, p2d, p3n, p3v, p3d):
+@jobs.publishing_metrics
+@metrics.timed(name="callback.estimate_one_missing_parameter_callback")
+def estimate_one_missing_parameter_callback(set_progress, n_clicks, p1n, p1v, p1d, p2n, p2v, p2d, p3n, p3v, p3d, mode):
     # Ensure three selections with values/deltas
     inputs = [(p1n, p1v, p1d), (p2n, p2v, p2d), (p3n, p3v, p3d)]
     if any(name is None or val is None or delta is None for name, val, delta in inputs):
@@ -472,19 +747,34 @@ def estimate_one_missing_parameter_callback(n_clicks, p1n, p1v, p1d, p2n, p2v, p
     # Determine the missing 4th parameter
     all_params = {"MWD", "MRD", "time", "effective temperature"}
     missing = (all_params - names)
-    print(missing)
     if len(missing) != 1:
         return html.P("Internal error: could not identify missing parameter.", className='error-message')
     missing_param = missing.pop()
 
+    if mode == 'surrogate':
+        set_progress("Building the interpolated model...")
+        surrogate = jobs.run_deduplicated(
+            ("surrogate", estimators_calls.ESTIMATION_DATASET, db_calls.get_db_version()),
+            lambda: estimators_calls.cached_surrogate(load_estimation_systems(), estimators_calls.ESTIMATION_DATASET)
+        )
+        set_progress("")
+        estimate = estimators.estimate_missing_with_surrogate(surrogate, {name: val for name, val, _ in inputs}, missing_param)
+        if estimate is None:
+            return html.P("The given masses are outside the simulated grid.", className='error-message')
+        return html.P(f"Interpolated {missing_param}: {estimate:.3f}", className='success-message')
+
     # Call estimation logic
-    dfs = estimators_calls.retrieve_systems_with_companion_mass(systems_db, "masses_data", data_folder_path)
-    estimate = estimators.find_closest_system_parallel(dfs, margins, max_workers)
-    closest_row = estimate[2]
-    if closest_row.empty:
+    set_progress("Searching the systems...")
+    matches = find_matches_job(margins)
+    set_progress("")
+    if not matches:
         return html.P("No system found within the given tolerances.", className='error-message')
-    estimated_value = closest_row[missing_param]
-    return html.P(f"Estimated {missing_param}: {estimated_value:.3f}", className='success-message')
+
+    values = [match['row'][missing_param] for match in matches]
+    return html.Div([
+        html.P(f"Estimated {missing_param}: {values[0]:.3f}", className='success-message'),
+        html.P(f"Range over the {len(values)} closest matches: {min(values):.3f} - {max(values):.3f}")
+    ])
 
 
 @app.callback(
@@ -492,9 +782,15 @@ def estimate_one_missing_parameter_callback(n_clicks, p1n, p1v, p1d, p2n, p2v, p
     Input('estimate-two-params-button', 'n_clicks'),
     State('param1-two-dropdown', 'value'), State('param1-two-value', 'value'), State('param1-two-delta', 'value'),
     State('param2-two-dropdown', 'value'), State('param2-two-value', 'value'), State('param2-two-delta', 'value'),
+    background=True,
+    running=[(Output('estimate-two-params-button', 'disabled'), True, False), (Output('cancel-two-params-button', 'disabled'), False, True)],
+    cancel=[Input('cancel-two-params-button', 'n_clicks')],
+    progress=[Output('two-params-progress', 'children')],
     prevent_initial_call=True
 )
-def estimate_two_parameters_callback(n_clicks, p1n, p1v, p1d, p2n, p2v, p2d):
+@jobs.publishing_metrics
+@metrics.timed(name="callback.estimate_two_parameters_callback")
+def estimate_two_parameters_callback(set_progress, n_clicks, p1n, p1v, p1d, p2n, p2v, p2d):
     try:
         # Validate input presence
         inputs = [(p1n, p1v, p1d), (p2n, p2v, p2d)]
@@ -509,19 +805,25 @@ def estimate_two_parameters_callback(n_clicks, p1n, p1v, p1d, p2n, p2v, p2d):
         # Build margins dictionary
         margins = {p1n: [p1v, p1d], p2n: [p2v, p2d]}
 
-        # Load system data
-        dfs = estimators_calls.retrieve_systems_with_companion_mass(systems_db, "masses_data", data_folder_path)
-        if dfs is None or dfs.empty:
+        # Check for system data
+        if not systems_db:
             return html.P("No system data found. Please check the data source.", className='error-message')
 
         # Run filtering logic
-        matching_systems = estimators.find_closest_system_parallel(dfs, margins, max_workers=4)
-        if matching_systems.empty:
+        set_progress("Searching the systems...")
+        matches = find_matches_job(margins)
+        set_progress("")
+        if not matches:
             return html.P("No systems found within the given parameter tolerances.", className='error-message')
 
         # Build result output
+        matching_systems = {match['system'] for match in matches}
         return html.Div([
             html.P(f"{len(matching_systems)} systems match.", className='success-message'),
+            html.Ul([
+                html.Li(f"System {match['system']}, row {match['orig_idx']}: distance {match['dist']:.4g}")
+                for match in matches
+            ])
         ])
     except Exception as e:
         import traceback
@@ -530,8 +832,76 @@ def estimate_two_parameters_callback(n_clicks, p1n, p1v, p1d, p2n, p2v, p2d):
         return html.P("Internal error during system matching.", className='error-message')
 
 
+#############################   Serving   #######################
+# Version of the database that `systems_db` was read at
+systems_db_version = None
+
+
+@app.server.before_request
+def sync_systems_db():
+    """Re-reads the systems catalog when another server process changed the database."""
+    global systems_db, systems_db_version
+    version = db_calls.get_db_version()
+    if data_folder_path and version != systems_db_version:
+        systems_db = db_calls.inspect_db(data_folder_path)
+        systems_db_version = version
+
+
+# REST API for pipelines, served from the same caches as the pages
+app.server.register_blueprint(api.create_api(
+    get_systems_db=lambda: systems_db,
+    get_frame=lambda system_name, file_type: get_df_type(file_type, {'system': system_name, 'key': system_frames_key(system_name)}),
+    load_estimation_systems=load_estimation_systems,
+    estimation_dataset=estimators_calls.ESTIMATION_DATASET,
+))
+
+
+# Callbacks raise PreventUpdate to leave their outputs unchanged, which is not an error
+metrics.normal_exits(PreventUpdate)
+
+
+@app.server.after_request
+def publish_request_metrics(response):
+    jobs.publish_metrics(min_interval=jobs.PUBLISH_INTERVAL)
+    return response
+
+
+@app.server.route('/metrics')
+def metrics_route():
+    """Call statistics of all the server processes and background jobs, in the Prometheus text format."""
+    jobs.publish_metrics()
+    return Response(metrics.render_prometheus(jobs.published_metrics()), mimetype='text/plain; version=0.0.4')
+
+
+def create_app(db_path=None, preload=True):
+    """
+    Configure the app to serve a systems database; `create_app().server` is the WSGI application.
+
+    Args:
+        db_path (str, optional): Path to the database. Defaults to the BINARY_SYSTEMS_DB
+            environment variable, then to ./systems_database.
+        preload (bool): Load the estimation dataset and build its indexes now, so that
+            server processes forked afterwards share them copy-on-write.
+
+    Returns:
+        dash.Dash: The app.
+    """
+    global data_folder_path, systems_db, systems_db_version
+    data_folder_path = db_path or os.environ.get("BINARY_SYSTEMS_DB", os.path.join(os.path.abspath(os.getcwd()), "systems_database"))
+    db_calls.share_db_version(os.path.join(jobs.JOBS_CACHE_DIR, "db_version"))
+    systems_db = db_calls.inspect_db(data_folder_path)
+    systems_db_version = db_calls.get_db_version()
+
+    if preload and systems_db:
+        estimators_calls.warm_up(load_estimation_systems(), estimators_calls.ESTIMATION_DATASET)
+    # Publish the statistics of the preloading, rather than in every forked worker
+    jobs.publish_metrics()
+    return app
+
+
 ##############################    Run App   #############################
 if __name__ == '__main__':
-    data_folder_path = os.path.join(os.path.abspath(os.getcwd()), "systems_database")
-    systems_db = db_calls.inspect_db(data_folder_path)
+    # Preload in the serving process only, not in the reloader watching the files, so that
+    # the background jobs it forks start from warm indexes
+    create_app(preload=os.environ.get("WERKZEUG_RUN_MAIN") == "true")
     app.run(debug=True)
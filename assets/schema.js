@@ -0,0 +1,44 @@
+// Dropdown options filled in the browser from the schema stores, without a server round trip:
+// 'systems-schema-store' holds the system names, 'loaded-system-store' the columns of the
+// loaded system per file type ('L', 'MAT' and 'MERGED').
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    schema: {
+        toOptions: function(names) {
+            return (names || []).map(function(name) {
+                return {label: name, value: name};
+            });
+        },
+
+        columnsOf: function(fileType, loadedSystem) {
+            if (!loadedSystem || !loadedSystem.columns) {
+                throw window.dash_clientside.PreventUpdate;
+            }
+            if (!fileType) {
+                return [];
+            }
+            var key = fileType.toUpperCase();
+            return loadedSystem.columns[key === 'L' || key === 'MAT' ? key : 'MERGED'];
+        },
+
+        systemOptions: function(pathname, systemsSchema) {
+            return window.dash_clientside.schema.toOptions(systemsSchema && systemsSchema.systems);
+        },
+
+        columnOptions: function(fileType, loadedSystem) {
+            var schema = window.dash_clientside.schema;
+            return schema.toOptions(schema.columnsOf(fileType, loadedSystem));
+        },
+
+        plotColumnOptions: function(fileType, loadedSystem) {
+            var options = window.dash_clientside.schema.columnOptions(fileType, loadedSystem);
+            return [options, options];
+        },
+
+        matColumnOptions: function(loadedSystem) {
+            if (!loadedSystem) {
+                return [];
+            }
+            return window.dash_clientside.schema.columnOptions('MAT', loadedSystem);
+        }
+    }
+});
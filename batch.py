@@ -0,0 +1,139 @@
+"""
+Offline batch processing of the systems database, without the web app.
+
+    python batch.py ingest [--db PATH] [--workers N] [--summaries-dir DIR]
+        Reads every system in parallel, builds the estimation dataset cache used by the
+        app and writes a per-cycle summary CSV per system.
+
+    python batch.py estimate INPUT.csv OUTPUT.csv [--db PATH] [--workers N]
+        Estimates the time since the last nova eruption for every row of INPUT.csv.
+        For each parameter (e.g. 'MWD', 'MRD', 'effective temperature') the input has a
+        value column and a '<parameter> delta' column. The output adds the columns
+        'nova_time', 'system' and 'dist' of the closest match (empty when none matches).
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from callbacks_helpers import db_calls, estimators_calls
+from files_utils import system_functions
+
+
+DEFAULT_DB_PATH = os.environ.get("BINARY_SYSTEMS_DB", os.path.join(os.getcwd(), "systems_database"))
+
+SUMMARY_L_COLUMNS = ["cycle", "time", "effective temperature", "accumulated mass"]
+SUMMARY_MAT_COLUMNS = ["cycle", "MWD", "companion_mass", "t3", "Mej"]
+
+# Estimation dataset of the batch, inherited by the forked worker processes
+_batch_dfs = None
+
+
+# ---------- INGEST ----------
+
+def summarize_system(db_path, system_name, system_files, summaries_dir):
+    """Write the per-cycle summary of a system to `<summaries_dir>/<system_name>.csv` and return its number of cycles."""
+    l_df, mat_df = db_calls.load_system(db_path, system_name, system_files, SUMMARY_L_COLUMNS, SUMMARY_MAT_COLUMNS)
+    summary = system_functions.cycles_summary(l_df, mat_df)
+    summary.to_csv(os.path.join(summaries_dir, f"{system_name}.csv"))
+    return len(summary)
+
+
+def ingest(db_path, workers, summaries_dir):
+    systems_db = {name: files for name, files in db_calls.inspect_db(db_path).items() if files[0] and files[1]}
+    print(f"{len(systems_db)} systems in {db_path}")
+
+    start = time.perf_counter()
+    dfs = estimators_calls.retrieve_systems_with_companion_mass(systems_db, estimators_calls.ESTIMATION_DATASET, db_path, max_workers=workers)
+    print(f"Estimation dataset: {len(dfs)} systems, {sum(len(df) for df in dfs.values())} rows ({time.perf_counter() - start:.1f} s)")
+
+    start = time.perf_counter()
+    os.makedirs(summaries_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            name: executor.submit(summarize_system, db_path, name, files, summaries_dir)
+            for name, files in systems_db.items()
+        }
+        for name, future in futures.items():
+            try:
+                print(f"  {name}: {future.result()} cycles")
+            except Exception as e:
+                print(f"  {name}: failed ({e})", file=sys.stderr)
+    print(f"Cycle summaries written to {summaries_dir} ({time.perf_counter() - start:.1f} s)")
+
+
+# ---------- ESTIMATE ----------
+
+def _init_estimation_worker():
+    # Queries are already spread over the processes
+    from numba import set_num_threads
+    set_num_threads(1)
+
+
+def _estimate_row(margins):
+    """Closest match of one query, searched in this process."""
+    matches = estimators_calls.estimators.estimate_nova_times(_batch_dfs, margins, k=1, max_workers=1)
+    if not matches:
+        return np.nan, None, np.nan
+    return matches[0]['time'], matches[0]['system'], matches[0]['dist']
+
+
+def read_queries(input_path):
+    """The input rows and the margins of each, from the '<parameter>' and '<parameter> delta' columns."""
+    queries = pd.read_csv(input_path)
+    features = [col for col in queries.columns if f"{col} delta" in queries.columns]
+    if not features:
+        raise ValueError("The input needs '<parameter>' and '<parameter> delta' columns, e.g. 'MWD' and 'MWD delta'.")
+    margins = [
+        {feat: [float(row[feat]), float(row[f"{feat} delta"])] for feat in features}
+        for _, row in queries.iterrows()
+    ]
+    return queries, features, margins
+
+
+def estimate(db_path, input_path, output_path, workers):
+    global _batch_dfs
+    queries, features, margins = read_queries(input_path)
+    systems_db = db_calls.inspect_db(db_path)
+    _batch_dfs = estimators_calls.retrieve_systems_with_companion_mass(systems_db, estimators_calls.ESTIMATION_DATASET, db_path, max_workers=workers)
+
+    # Build the search indexes once, before the workers fork
+    for df in _batch_dfs.values():
+        estimators_calls.estimators.get_range_index(df, [feat for feat in features if feat in df.columns])
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_estimation_worker) as executor:
+        results = list(executor.map(_estimate_row, margins, chunksize=max(len(margins) // (workers * 8), 1)))
+
+    queries["nova_time"], queries["system"], queries["dist"] = zip(*results) if results else ([], [], [])
+    queries.to_csv(output_path, index=False)
+    n_matched = int(queries["system"].notna().sum())
+    print(f"{n_matched}/{len(queries)} queries matched ({time.perf_counter() - start:.1f} s), written to {output_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="path to the systems database")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = commands.add_parser("ingest", help="build the caches and per-cycle summaries")
+    ingest_parser.add_argument("--summaries-dir", default="cycle_summaries", help="output directory of the summaries")
+
+    estimate_parser = commands.add_parser("estimate", help="estimate the nova time of every row of a CSV")
+    estimate_parser.add_argument("input", help="input CSV")
+    estimate_parser.add_argument("output", help="output CSV")
+
+    args = parser.parse_args()
+    if args.command == "ingest":
+        ingest(args.db, args.workers, args.summaries_dir)
+    else:
+        estimate(args.db, args.input, args.output, args.workers)
+
+
+if __name__ == "__main__":
+    main()
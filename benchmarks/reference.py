@@ -0,0 +1,106 @@
+"""
+Reference implementations: straightforward pandas versions of the optimized functions of
+`files_utils`, kept to check that the optimized ones return the same results.
+
+They favour obviousness over speed and must not be optimized themselves.
+"""
+import numpy as np
+import pandas as pd
+
+
+def demarcate_decay_phases(df):
+    """Reference of `demarcators.demarcate_decay_phases`: a scan of every cycle."""
+    result = {}
+    max_cycle = df["cycle"].max()
+    n = len(df)
+
+    for cycle in range(1, max_cycle):
+        cycle_df = df[df["cycle"] == cycle]
+        if cycle_df.empty:
+            continue
+
+        first_idx = cycle_df.index[0]
+        last_idx = cycle_df.index[-1]
+
+        # Find delimiter_1: last negative value of accumulated mass, end of eruption
+        delimiter_1 = first_idx
+        subset = df.loc[first_idx:last_idx]
+        ejecta_phase = subset[subset["accumulated mass"] < 0]
+        if not ejecta_phase.empty:
+            delimiter_1 = int(ejecta_phase.index[-1])
+
+        # Find delimiter_2: first increase in effective temperature (located in the next cycle)
+        delimiter_2 = last_idx
+        for idx in range(last_idx + 1, n):
+            if df.loc[idx, "effective temperature"] > df.loc[idx - 1, "effective temperature"]:
+                delimiter_2 = idx
+                break
+
+        result[cycle] = [delimiter_1, delimiter_2]
+
+    return result
+
+
+def demarcate_eruption_times(df):
+    """Reference of `demarcators.demarcate_eruption_times`: one boolean mask per cycle."""
+    rows = []
+    for cycle in df["cycle"].dropna().unique():
+        cycle_df = df[df["cycle"] == cycle]
+        ejecta = cycle_df[cycle_df["accumulated mass"] < 0]
+        if ejecta.empty:
+            continue
+        rows.append({
+            "cycle": cycle,
+            "first_idx": ejecta.index[0],
+            "last_idx": ejecta.index[-1],
+            "start_time": ejecta["time"].iloc[0],
+            "end_time": ejecta["time"].iloc[-1],
+        })
+    table = pd.DataFrame(rows, columns=["cycle", "first_idx", "last_idx", "start_time", "end_time"])
+    return table.set_index("cycle").sort_values("first_idx")
+
+
+def filter_dataframe(df, margins):
+    """Reference of `estimators.filter_dataframe`: a pandas boolean mask."""
+    mask = pd.Series(True, index=df.index)
+    for col, (center, delta) in margins.items():
+        mask &= (df[col] >= center - delta) & (df[col] <= center + delta)
+    return df[mask].copy()
+
+
+def find_closest_matches(dfs, margins, k=1):
+    """
+    Reference of `estimators.find_closest_matches`: the distances of all the rows within
+    the margins of every system, sorted.
+
+    Returns
+    -------
+    list[dict]
+        Up to k matches sorted by distance, with keys 'system', 'dist' and 'orig_idx'.
+    """
+    features = list(margins)
+    center = np.array([margins[feat][0] for feat in features], dtype=float)
+    matches = []
+    for system_id, df in (dfs.items() if isinstance(dfs, dict) else enumerate(dfs)):
+        filtered = filter_dataframe(df, margins)[features].dropna()
+        dists = np.sqrt(((filtered.to_numpy(dtype=float) - center) ** 2).sum(axis=1))
+        matches.extend({'system': system_id, 'dist': float(dist), 'orig_idx': idx}
+                       for dist, idx in zip(dists, filtered.index))
+    return sorted(matches, key=lambda match: match['dist'])[:k]
+
+
+def estimate_nova_time(dfs, margins):
+    """
+    Reference of `estimators.estimate_nova_time`: time between the start of the last
+    eruption before the closest match and the match, or -1.
+    """
+    matches = find_closest_matches(dfs, margins)
+    if not matches:
+        return -1
+    df = dfs[matches[0]['system']]
+    idx = matches[0]['orig_idx']
+    eruptions = demarcate_eruption_times(df)
+    before = eruptions[eruptions["first_idx"] <= idx]
+    if before.empty:
+        return -1
+    return df.loc[idx, "time"] - before["start_time"].iloc[-1]
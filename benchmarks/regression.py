@@ -0,0 +1,287 @@
+"""
+Performance regression gate: checks that the optimized functions of `files_utils` return
+the same results as their pandas references (benchmarks/reference.py), are not slower
+than them, and are not slower than their stored baseline.
+
+Results are compared on the synthetic database of the preset and, if given, on a real
+database. Timings are taken on the synthetic database only and compared, for each case,
+with benchmarks/baselines/<preset>.json; a case fails when its best time exceeds the
+baseline by more than the allowed slowdown. Baselines depend on the machine: update them
+with --update-baselines after an intended change, or when moving to another machine.
+
+Usage:
+    python benchmarks/regression.py [--preset small] [--db PATH] [--allowed-slowdown 0.5]
+        [--rounds N] [-k PATTERN] [--update-baselines]
+
+Exits with status 1 if any case fails.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import reference, suite
+from files_utils import demarcators, estimators
+
+
+BASELINES_DIR = os.path.join(REPO_ROOT, "benchmarks", "baselines")
+
+# Relative tolerance of the compared values
+RTOL = 1e-9
+
+# Shortest duration of a timing measurement, in seconds
+MIN_MEASUREMENT_TIME = 0.05
+
+# Estimation queries per database
+N_QUERIES = 8
+
+# Cases by name: setup(data) returns (reference callable, optimized callable, check)
+CASES = {}
+
+
+def case(setup):
+    """Register `setup` as a regression case."""
+    CASES[setup.__name__] = setup
+    return setup
+
+
+class Mismatch(AssertionError):
+    pass
+
+
+# ---------- CHECKS ----------
+
+def check_equal(expected, actual):
+    if expected != actual:
+        different = [key for key in set(expected) | set(actual) if expected.get(key) != actual.get(key)]
+        raise Mismatch(f"{len(different)} different entries, e.g. {sorted(different)[:5]}")
+
+
+def check_frames(expected, actual):
+    try:
+        pd.testing.assert_frame_equal(expected, actual, check_dtype=False, check_index_type=False,
+                                      check_names=False, rtol=RTOL)
+    except AssertionError as e:
+        raise Mismatch(str(e)) from None
+
+
+def check_matches(expected, actual):
+    """Same distances for every query, and the same rows up to ties at the last distance."""
+    for i, (ref, opt) in enumerate(zip(expected, actual)):
+        ref_dists = np.array([m['dist'] for m in ref])
+        if len(ref) != len(opt) or not np.allclose(ref_dists, [m['dist'] for m in opt], rtol=RTOL, atol=0):
+            raise Mismatch(f"query {i}: distances {ref_dists.tolist()} != {[m['dist'] for m in opt]}")
+        if not len(ref):
+            continue
+        # Rows tied at the last distance may be cut off differently
+        closer = ref_dists < ref_dists[-1] * (1 - RTOL)
+        ref_rows = {(m['system'], m['orig_idx']) for m, keep in zip(ref, closer) if keep}
+        opt_rows = {(m['system'], m['orig_idx']) for m, keep in zip(opt, closer) if keep}
+        if ref_rows != opt_rows:
+            raise Mismatch(f"query {i}: rows {sorted(ref_rows)} != {sorted(opt_rows)}")
+
+
+def check_close(expected, actual):
+    if not np.allclose(expected, actual, rtol=RTOL, atol=0, equal_nan=True):
+        raise Mismatch(f"{expected} != {actual}")
+
+
+# ---------- CASES ----------
+
+def queries(dfs, n=N_QUERIES):
+    """Margins around `n` rows spread over the systems, most of them in a decay phase."""
+    names = sorted(dfs)
+    margins = []
+    for i in range(n):
+        df = dfs[names[i % len(names)]]
+        row = df.iloc[(i + 1) * len(df) // (n + 1)]
+        margins.append({
+            "MWD": [float(row["MWD"]), 0.01],
+            "MRD": [float(row["MRD"]), 0.01],
+            "effective temperature": [float(row["effective temperature"]), 0.05],
+        })
+    return margins
+
+
+@case
+def demarcate_decay_phases(data):
+    l_df, _ = data.frames
+    return (lambda: reference.demarcate_decay_phases(l_df),
+            lambda: demarcators.demarcate_decay_phases(l_df),
+            check_equal)
+
+
+@case
+def demarcate_eruption_times(data):
+    l_df, _ = data.frames
+    return (lambda: reference.demarcate_eruption_times(l_df),
+            lambda: demarcators.demarcate_eruption_times(l_df),
+            check_frames)
+
+
+@case
+def filter_dataframe(data):
+    df = data.estimation_dfs[data.system_name]
+    margins = queries({data.system_name: df}, 1)[0]
+    return (lambda: reference.filter_dataframe(df, margins),
+            lambda: estimators.filter_dataframe(df, margins),
+            check_frames)
+
+
+@case
+def filter_dataframe_range_index(data):
+    df = data.estimation_dfs[data.system_name]
+    margins = queries({data.system_name: df}, 1)[0]
+    range_index = estimators.get_range_index(df, list(margins))
+    return (lambda: reference.filter_dataframe(df, margins),
+            lambda: estimators.filter_dataframe(df, margins, range_index),
+            check_frames)
+
+
+@case
+def find_closest_matches(data):
+    dfs, all_margins = data.estimation_dfs, queries(data.estimation_dfs)
+    return (lambda: [reference.find_closest_matches(dfs, margins, k=5) for margins in all_margins],
+            lambda: [estimators.find_closest_matches(dfs, margins, k=5, max_workers=1) for margins in all_margins],
+            check_matches)
+
+
+@case
+def estimate_nova_time(data):
+    dfs, all_margins = data.estimation_dfs, queries(data.estimation_dfs)
+    return (lambda: [reference.estimate_nova_time(dfs, margins) for margins in all_margins],
+            lambda: [estimators.estimate_nova_time(dfs, margins, max_workers=1) for margins in all_margins],
+            check_close)
+
+
+@case
+def find_closest_matches_default_workers(data):
+    dfs, all_margins = data.estimation_dfs, queries(data.estimation_dfs)
+    return (lambda: [reference.find_closest_matches(dfs, margins, k=5) for margins in all_margins],
+            lambda: [estimators.find_closest_matches(dfs, margins, k=5) for margins in all_margins],
+            check_matches)
+
+
+@case
+def estimate_nova_time_default_workers(data):
+    dfs, all_margins = data.estimation_dfs, queries(data.estimation_dfs)
+    return (lambda: [reference.estimate_nova_time(dfs, margins) for margins in all_margins],
+            lambda: [estimators.estimate_nova_time(dfs, margins) for margins in all_margins],
+            check_close)
+
+
+# ---------- RUNNER ----------
+
+def best_time(func, rounds):
+    """
+    Fastest time of `func`, in seconds, over `rounds` measurements after a warm-up call.
+
+    Fast functions are called repeatedly within each measurement, so that a measurement
+    lasts at least MIN_MEASUREMENT_TIME and short scheduling hiccups average out.
+    """
+    start = time.perf_counter()
+    func()
+    loops = max(int(MIN_MEASUREMENT_TIME / max(time.perf_counter() - start, 1e-6)), 1)
+
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        times.append((time.perf_counter() - start) / loops)
+    return min(times)
+
+
+def check_results(data, names):
+    """Names of the cases whose optimized results differ from the reference, with the reason."""
+    failures = []
+    for name in names:
+        run_reference, run_optimized, check = CASES[name](data)
+        try:
+            check(run_reference(), run_optimized())
+        except Mismatch as e:
+            failures.append(f"{name}: results differ on {data.db_path}: {e}")
+    return failures
+
+
+def check_timings(data, names, baselines, rounds, allowed_slowdown):
+    """Best times of the optimized cases, and the failures against the references and baselines."""
+    timings, failures = {}, []
+    for name in names:
+        run_reference, run_optimized, _ = CASES[name](data)
+        ref_time = best_time(run_reference, rounds)
+        opt_time = best_time(run_optimized, rounds)
+        baseline = baselines.get(name)
+        if opt_time > min(ref_time, baseline or np.inf) * (1 + allowed_slowdown):
+            # Measure again before reporting, to rule out a noisy neighbour
+            opt_time = min(opt_time, best_time(run_optimized, rounds * 2))
+        timings[name] = opt_time
+
+        status = "ok"
+        if opt_time > ref_time * (1 + allowed_slowdown):
+            status = "SLOWER THAN REFERENCE"
+            failures.append(f"{name}: {opt_time * 1000:.2f} ms, slower than the reference ({ref_time * 1000:.2f} ms)")
+        elif baseline is not None and opt_time > baseline * (1 + allowed_slowdown):
+            status = "REGRESSION"
+            failures.append(f"{name}: {opt_time * 1000:.2f} ms, {opt_time / baseline:.2f}x the baseline ({baseline * 1000:.2f} ms)")
+        elif baseline is None:
+            status = "no baseline"
+
+        baseline_text = f"{baseline * 1000:10.2f}" if baseline is not None else f"{'-':>10}"
+        print(f"{name:<40} reference {ref_time * 1000:10.2f} ms   optimized {opt_time * 1000:10.2f} ms   "
+              f"baseline {baseline_text} ms   {ref_time / opt_time:7.1f}x   {status}")
+    return timings, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--preset", choices=sorted(suite.PRESETS), default="small", help="size of the synthetic database")
+    parser.add_argument("--db", default=os.environ.get("BINARY_SYSTEMS_DB"),
+                        help="real database whose results are also checked (default: $BINARY_SYSTEMS_DB)")
+    parser.add_argument("--allowed-slowdown", type=float, default=0.5,
+                        help="allowed relative slowdown over the baseline and the reference (default: 0.5)")
+    parser.add_argument("--rounds", type=int, default=7, help="timed calls per case")
+    parser.add_argument("-k", dest="pattern", help="only run the cases whose name contains PATTERN")
+    parser.add_argument("--update-baselines", action="store_true", help="store the measured times as the new baselines")
+    args = parser.parse_args()
+
+    names = [name for name in CASES if not args.pattern or args.pattern in name]
+    synthetic = suite.BenchmarkData(suite.prepare_database(args.preset))
+
+    failures = check_results(synthetic, names)
+    if args.db:
+        failures += check_results(suite.BenchmarkData(args.db), names)
+
+    baselines_path = os.path.join(BASELINES_DIR, f"{args.preset}.json")
+    try:
+        with open(baselines_path) as f:
+            baselines = json.load(f)
+    except OSError:
+        baselines = {}
+
+    timings, timing_failures = check_timings(synthetic, names, baselines, args.rounds, args.allowed_slowdown)
+    failures += timing_failures
+
+    if args.update_baselines:
+        os.makedirs(BASELINES_DIR, exist_ok=True)
+        with open(baselines_path, "w") as f:
+            json.dump(dict(baselines, **timings), f, indent=2, sort_keys=True)
+        print(f"Baselines saved to {baselines_path}")
+
+    if failures:
+        print(f"\nFAILED: {len(failures)} regression(s)", file=sys.stderr)
+        for failure in failures:
+            print(f"  {failure}", file=sys.stderr)
+        sys.exit(1)
+    print(f"\nPassed: {len(names)} cases")
+
+
+if __name__ == "__main__":
+    main()
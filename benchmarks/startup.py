@@ -0,0 +1,81 @@
+"""
+Startup benchmark: import time of the app and utilities, and time to first response.
+
+Every measurement runs in a fresh interpreter, so that nothing is already imported.
+
+Usage:
+    python benchmarks/startup.py [--db PATH] [--repeat N]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+FIRST_CALL_SNIPPET = """
+import time
+import numpy as np
+start = time.perf_counter()
+from files_utils import downsampling
+x = np.arange(100000.0)
+y = np.sin(x)
+downsampling.downsample_indices(x, y, 1000, method='lttb')
+downsampling.downsample_indices(x, y, 1000, method='minmax')
+downsampling.density_grid(x, y, False, False)
+print(time.perf_counter() - start)
+"""
+
+FIRST_RESPONSE_SNIPPET = """
+import time
+start = time.perf_counter()
+import app
+client = app.create_app({db!r}, preload=False).server.test_client()
+for path in ('/', '/_dash-layout', '/_dash-dependencies'):
+    assert client.get(path).status_code == 200, path
+print(time.perf_counter() - start)
+"""
+
+
+def run_snippet(snippet):
+    """Run `snippet` in a new interpreter from the repository root and return the seconds it printed."""
+    output = subprocess.run(
+        [sys.executable, "-c", snippet], cwd=REPO_ROOT, check=True, capture_output=True, text=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def measure(snippet, repeat):
+    times = [run_snippet(snippet) for _ in range(repeat)]
+    return {"median": statistics.median(times), "min": min(times), "max": max(times)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=os.path.join(REPO_ROOT, "systems_database"), help="systems database to serve")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement")
+    args = parser.parse_args()
+
+    results = {
+        f"import {module}": measure(IMPORT_SNIPPET.format(module=module), args.repeat)
+        for module in ("app", "files_utils.system_functions", "files_utils.estimators", "callbacks_helpers.estimators_calls")
+    }
+    # The first run may compile the numba kernels; the next ones load them from the on-disk cache
+    results["first plot kernels call"] = measure(FIRST_CALL_SNIPPET, args.repeat)
+    results["time to first response"] = measure(FIRST_RESPONSE_SNIPPET.format(db=args.db), args.repeat)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
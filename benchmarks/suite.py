@@ -0,0 +1,345 @@
+"""
+Benchmark suite of the data pipeline on a synthetic database: parsing, concatenation,
+demarcation, estimation and figure building.
+
+The database of a preset is generated once, under benchmarks/.data/<preset>. Each
+benchmark runs once to warm up (numba compilation, per-DataFrame caches), then `--rounds`
+times. Results are saved to benchmarks/results/<commit>_<preset>.json, so that runs of
+different commits can be compared.
+
+Usage:
+    python benchmarks/suite.py [--preset small|medium|large] [--rounds N] [-k PATTERN]
+    python benchmarks/suite.py --compare OLD.json NEW.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import synthetic_data
+from callbacks_helpers import db_calls, estimators_calls, transport
+from files_utils import read_l, read_mat, demarcators, estimators, system_functions
+
+
+DATA_DIR = os.path.join(REPO_ROOT, "benchmarks", ".data")
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+
+# Synthetic database of each preset, see `synthetic_data.generate_database`
+PRESETS = {
+    "small": {"n_systems": 3, "n_cycles": 40, "rows_per_cycle": 1000, "n_segments": 2},
+    "medium": {"n_systems": 3, "n_cycles": 200, "rows_per_cycle": 2000, "n_segments": 3},
+    "large": {"n_systems": 4, "n_cycles": 500, "rows_per_cycle": 5000, "n_segments": 6},
+}
+
+# Benchmarks by name: (group, setup), where setup(data) returns the callable to time
+BENCHMARKS = {}
+
+
+def benchmark(group):
+    """Register `setup` as the benchmark '<group>.<setup name>'."""
+    def decorator(setup):
+        BENCHMARKS[f"{group}.{setup.__name__}"] = (group, setup)
+        return setup
+    return decorator
+
+
+# ---------- DATA ----------
+
+def prepare_database(preset):
+    """Path of the database of a preset, generated unless it exists with the same parameters."""
+    params = PRESETS[preset]
+    db_path = os.path.join(DATA_DIR, preset)
+    manifest_path = os.path.join(db_path, ".manifest.json")
+    try:
+        with open(manifest_path) as f:
+            if json.load(f) == params:
+                return db_path
+    except (OSError, ValueError):
+        pass
+
+    shutil.rmtree(db_path, ignore_errors=True)
+    print(f"Generating the '{preset}' database in {db_path}...")
+    synthetic_data.generate_database(db_path, **params)
+    with open(manifest_path, "w") as f:
+        json.dump(params, f)
+    return db_path
+
+
+class BenchmarkData:
+    """The database of a run, with its DataFrames loaded on first use."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.systems_db = db_calls.inspect_db(db_path)
+        self.system_name = sorted(self.systems_db)[0]
+        self.system_path = os.path.join(db_path, self.system_name)
+        l_files, mat_files = self.systems_db[self.system_name]
+        self.l_paths = [os.path.join(self.system_path, f) for f in l_files]
+        self.mat_paths = [os.path.join(self.system_path, f) for f in mat_files]
+        self._frames = None
+        self._estimation_dfs = None
+
+    @property
+    def frames(self):
+        """The `l` and `mat` DataFrames of the first system."""
+        if self._frames is None:
+            self._frames = db_calls.load_system(self.db_path, self.system_name, self.systems_db[self.system_name])
+        return self._frames
+
+    @property
+    def estimation_dfs(self):
+        """The estimation DataFrames of all the systems, by name."""
+        if self._estimation_dfs is None:
+            self._estimation_dfs = {
+                name: estimators_calls.load_estimation_df(os.path.join(self.db_path, name), *files)
+                .rename(columns={"companion_mass": "MRD"})
+                for name, files in self.systems_db.items()
+            }
+        return self._estimation_dfs
+
+    def margins(self):
+        """Estimation margins around a row in the decay phase of a cycle in the middle of the first system."""
+        df = self.estimation_dfs[self.system_name]
+        table = estimators.get_eruption_times(df)
+        row = df.iloc[int(table["last_idx"].iloc[len(table) // 2]) + 10]
+        return {
+            "MWD": [float(row["MWD"]), 0.01],
+            "MRD": [float(row["MRD"]), 0.01],
+            "effective temperature": [float(row["effective temperature"]), 0.05],
+        }
+
+    @property
+    def n_rows(self):
+        return len(self.frames[0])
+
+
+# ---------- BENCHMARKS ----------
+
+@benchmark("parse")
+def read_l_file(data):
+    return lambda: read_l.read_l_file(data.l_paths[0])
+
+
+@benchmark("parse")
+def read_l_file_columns(data):
+    return lambda: read_l.read_l_file(data.l_paths[0], estimators_calls.L_ESTIMATION_COLUMNS)
+
+
+@benchmark("parse")
+def read_mat_file(data):
+    return lambda: read_mat.read_mat_file(data.mat_paths[0])
+
+
+@benchmark("concatenate")
+def concatenate_l_files(data):
+    return lambda: read_l.concatenate_files(data.l_paths)
+
+
+@benchmark("concatenate")
+def concatenate_mat_files(data):
+    return lambda: read_mat.concatenate_files(data.mat_paths)
+
+
+@benchmark("concatenate")
+def load_estimation_df(data):
+    l_files, mat_files = data.systems_db[data.system_name]
+    return lambda: estimators_calls.load_estimation_df(data.system_path, l_files, mat_files)
+
+
+@benchmark("demarcate")
+def demarcate_decay_phases(data):
+    l_df, _ = data.frames
+    return lambda: demarcators.demarcate_decay_phases(l_df)
+
+
+@benchmark("demarcate")
+def demarcate_eruption_times(data):
+    l_df, _ = data.frames
+    return lambda: demarcators.demarcate_eruption_times(l_df)
+
+
+@benchmark("demarcate")
+def cycles_summary(data):
+    l_df, mat_df = data.frames
+    return lambda: system_functions.cycles_summary(l_df, mat_df)
+
+
+@benchmark("estimate")
+def filter_dataframe(data):
+    df, margins = data.estimation_dfs[data.system_name], data.margins()
+    return lambda: estimators.filter_dataframe(df, margins)
+
+
+@benchmark("estimate")
+def find_closest_matches(data):
+    dfs, margins = data.estimation_dfs, data.margins()
+    return lambda: estimators.find_closest_matches(dfs, margins, k=5, max_workers=1)
+
+
+@benchmark("estimate")
+def estimate_nova_time(data):
+    dfs, margins = data.estimation_dfs, data.margins()
+    return lambda: estimators.estimate_nova_time(dfs, margins, max_workers=1)
+
+
+@benchmark("estimate")
+def estimate_nova_times(data):
+    dfs, margins = data.estimation_dfs, data.margins()
+    return lambda: estimators.estimate_nova_times(dfs, margins, k=10, max_workers=1)
+
+
+@benchmark("estimate")
+def estimate_nova_time_distribution(data):
+    dfs, margins = data.estimation_dfs, data.margins()
+    return lambda: estimators.estimate_nova_time_distribution(dfs, margins, n_samples=200, seed=0, max_workers=1)
+
+
+@benchmark("estimate")
+def build_surrogate(data):
+    dfs = data.estimation_dfs
+    return lambda: estimators.build_surrogate(dfs)
+
+
+@benchmark("figure")
+def plot_x_vs_y(data):
+    l_df, _ = data.frames
+    return lambda: transport.figure_to_json(
+        system_functions.plot_x_vs_y(l_df, "time", "effective temperature", log_x=True))
+
+
+@benchmark("figure")
+def plot_x_vs_y_density(data):
+    l_df, _ = data.frames
+    return lambda: transport.figure_to_json(
+        system_functions.plot_x_vs_y_density(l_df, "time", "effective temperature", log_x=True))
+
+
+@benchmark("figure")
+def plot_cycles_lengths_vs_param(data):
+    l_df, mat_df = data.frames
+    return lambda: transport.figure_to_json(system_functions.plot_cycles_lengths_vs_param(l_df, mat_df, "t3"))
+
+
+@benchmark("figure")
+def plot_decay_phases(data):
+    l_df, mat_df = data.frames
+    cycles = list(range(1, int(l_df["cycle"].max()), 5))
+    phases = system_functions.decay_phases(l_df, mat_df.set_index("cycle"), cycles, demarcators.demarcate_decay_phases)
+    return lambda: transport.figure_to_json(system_functions.plot_decay_phases([(data.system_name, phases)]))
+
+
+# ---------- RUNNER ----------
+
+def time_benchmark(func, rounds):
+    """Seconds of each of `rounds` calls of `func`, after a warm-up call."""
+    func()
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run(preset, rounds, pattern=None):
+    """Run the benchmarks whose name contains `pattern`, and return the results document."""
+    data = BenchmarkData(prepare_database(preset))
+    results = {}
+    for name, (group, setup) in BENCHMARKS.items():
+        if pattern and pattern not in name:
+            continue
+        times = time_benchmark(setup(data), rounds)
+        results[name] = {
+            "group": group,
+            "min": min(times),
+            "median": statistics.median(times),
+            "mean": statistics.mean(times),
+            "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+            "rounds": len(times),
+        }
+        print(f"{name:<48} median {results[name]['median'] * 1000:10.2f} ms   min {results[name]['min'] * 1000:10.2f} ms")
+
+    return {
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "preset": preset,
+        "dataset": dict(PRESETS[preset], rows_first_system=data.n_rows),
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+        },
+        "benchmarks": results,
+    }
+
+
+def save(document, output=None):
+    """Write a results document, by default to benchmarks/results/<commit>[-dirty]_<preset>.json."""
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        commit = (document["commit"] or "unknown") + ("-dirty" if document["dirty"] else "")
+        output = os.path.join(RESULTS_DIR, f"{commit}_{document['preset']}.json")
+    with open(output, "w") as f:
+        json.dump(document, f, indent=2)
+    return output
+
+
+def compare(old_path, new_path):
+    """Print the median times of two results documents and their ratio."""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    if old["preset"] != new["preset"]:
+        print(f"Warning: comparing the '{old['preset']}' and '{new['preset']}' presets")
+
+    print(f"{'benchmark':<48} {old['commit'] or 'old':>12} {new['commit'] or 'new':>12}   ratio")
+    for name in sorted(set(old["benchmarks"]) | set(new["benchmarks"])):
+        before = old["benchmarks"].get(name, {}).get("median")
+        after = new["benchmarks"].get(name, {}).get("median")
+        ratio = f"{after / before:6.2f}x" if before and after else "      -"
+        before = f"{before * 1000:10.2f}ms" if before else f"{'-':>12}"
+        after = f"{after * 1000:10.2f}ms" if after else f"{'-':>12}"
+        print(f"{name:<48} {before} {after}   {ratio}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="small", help="size of the synthetic database")
+    parser.add_argument("--rounds", type=int, default=5, help="timed calls per benchmark")
+    parser.add_argument("-k", dest="pattern", help="only run the benchmarks whose name contains PATTERN")
+    parser.add_argument("--output", help="results file, instead of benchmarks/results/<commit>_<preset>.json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two results files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    document = run(args.preset, args.rounds, args.pattern)
+    print(f"Results saved to {save(document, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""
+Synthetic systems database: realistic `l` and `mat` files of any size, for benchmarks.
+
+Every cycle of a system is an accretion phase, with a rising accumulated mass and a
+slowly rising effective temperature, followed by an eruption, where the accumulated
+mass is negative and the temperature peaks. The temperature then decays, into the first
+rows of the next cycle, before rising again. The cycles of a system are split into
+consecutive file segments A, B, ... (at most F), each numbering its cycles and time from
+the start, like the files written by the simulations.
+
+Usage:
+    python benchmarks/synthetic_data.py DB_PATH [--systems N] [--cycles N | --size SIZE]
+        [--rows-per-cycle N] [--segments N] [--seed N] [--no-companion-mass]
+
+SIZE is the size of the `l` files of each system, e.g. 50MB, 2GB or 20GB; the files are
+written a block of cycles at a time, so memory use does not depend on it.
+"""
+import argparse
+import io
+import os
+import re
+import string
+
+import numpy as np
+
+
+L_FIELDS = 17  # Row number and the columns of `read_l.COLUMN_NAMES`
+
+L_FORMAT = " ".join(["%d"] * 7 + ["%.10g", "%.6g", "%.6g", "%.6g", "%.6g", "%.6g", "%.6g", "%.6g", "%.6g", "%.6g"])
+
+MAT_COLUMNS = [
+    "cycle", "Macc", "Menv", "Mej", "Yenv", "Yej", "Zenv", "Zej",
+    "Tmax", "Tc", "RHOc", "time", "t3", "t-ML", "C12", "C13",
+    "N14", "N15", "O16", "O17", "O18", "Ne", "Na", "Mg",
+    "Al26", "Al27", "Si", "P", "Vej_avg", "Mdot_ej",
+    "MWD", "Iacc", "Iej", "Press"
+]
+
+MAX_SEGMENTS = 6
+
+# Rows formatted and written at once
+BLOCK_ROWS = 500000
+
+# Fractions of a cycle's rows spent in the decay and the eruption phases
+DECAY_FRACTION = 0.3
+ERUPTION_FRACTION = 0.05
+
+_SIZE_UNITS = {"": 1, "B": 1, "KB": 1e3, "MB": 1e6, "GB": 1e9, "TB": 1e12}
+
+
+def parse_size(size):
+    """Number of bytes of a size such as '500MB', '2.5GB' or '1000000'."""
+    match = re.fullmatch(r"\s*([\d.]+)\s*([KMGT]?B?)\s*", size.upper())
+    if match is None:
+        raise ValueError(f"Invalid size: {size!r}")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2)])
+
+
+def _cycle_rows(rng, rows_per_cycle, jitter):
+    """Number of rows of a cycle, within ±jitter of `rows_per_cycle`."""
+    low = max(int(rows_per_cycle * (1 - jitter)), 20)
+    high = max(int(rows_per_cycle * (1 + jitter)), low + 1)
+    return int(rng.integers(low, high))
+
+
+def _cycle_block(rng, cycle, n_rows, t_start, teff_start, params):
+    """
+    The `l` columns (without row numbers) of one cycle.
+
+    Returns
+    -------
+    tuple
+        (block of shape (n_rows, 16), end time, last effective temperature, mat row values).
+    """
+    n_decay = max(int(n_rows * DECAY_FRACTION), 2)
+    n_eruption = max(int(n_rows * ERUPTION_FRACTION), 2)
+    n_accretion = n_rows - n_decay - n_eruption
+
+    base_teff = params["base_teff"] + rng.normal(0, 0.02)
+    peak_teff = params["peak_teff"] + rng.normal(0, 0.05)
+    recurrence = params["recurrence"] * rng.lognormal(0, 0.1)
+    m_acc = params["m_acc"] * rng.lognormal(0, 0.1)
+    m_ej = m_acc * rng.uniform(0.5, 1.2)
+
+    # Time steps: geometric during the decay, even during accretion, short in the eruption
+    dt = np.concatenate([
+        np.geomspace(1e-6, recurrence * 0.02, n_decay),
+        np.full(n_accretion, recurrence * 0.9 / n_accretion),
+        np.geomspace(1e-3, 1e-5, n_eruption),
+    ])
+    time = t_start + np.cumsum(dt)
+    phase_time = time - t_start
+
+    # Strictly decreasing decay from the previous cycle's last value, then a noisy rise to the peak
+    decay = base_teff + (teff_start - base_teff) * np.exp(-5 * phase_time[:n_decay] / phase_time[n_decay - 1])
+    rise = np.linspace(base_teff, base_teff + 0.3, n_accretion) + rng.normal(0, 0.002, n_accretion)
+    eruption = np.linspace(base_teff + 0.3, peak_teff, n_eruption)
+    teff = np.concatenate([decay, rise, eruption])
+
+    accumulated = np.concatenate([
+        np.linspace(0, m_acc * DECAY_FRACTION, n_decay),
+        np.linspace(m_acc * DECAY_FRACTION, m_acc, n_accretion),
+        -np.linspace(m_ej / n_eruption, m_ej, n_eruption),
+    ])
+    velocity = np.zeros(n_rows)
+    velocity[-n_eruption:] = rng.uniform(1e3, 5e3) * np.linspace(0.2, 1, n_eruption)
+
+    convection = (rng.random((n_rows, 4)) < 0.1).astype(float)
+    luminosity = teff * 0.8 - 1.2
+    block = np.column_stack([
+        np.full(n_rows, cycle),
+        rng.integers(80, 160, n_rows),
+        convection,
+        time,
+        teff,
+        luminosity + rng.normal(0, 0.01, n_rows),
+        luminosity - 0.3,
+        luminosity + np.where(np.arange(n_rows) >= n_rows - n_eruption, 3.0, -1.0),
+        luminosity - 2.0,
+        7.0 + (teff - base_teff) * 2,
+        accumulated,
+        velocity,
+        dt,
+    ])
+
+    t3 = rng.lognormal(np.log(30), 0.3)
+    abundances = rng.dirichlet(np.ones(14)) * 0.02
+    mat_row = [
+        cycle, m_acc, m_acc * 1.1, m_ej,
+        rng.uniform(0.25, 0.3), rng.uniform(0.25, 0.35), rng.uniform(0.01, 0.03), rng.uniform(0.02, 0.2),
+        rng.uniform(1.5e8, 3e8), rng.uniform(1e7, 5e7), rng.uniform(1e3, 1e5), time[-1],
+        t3, t3 * rng.uniform(2, 5), *abundances,
+        velocity[-n_eruption:].mean(), m_ej / dt[-n_eruption:].sum(),
+        params["mwd"] + rng.normal(0, 1e-4), rng.uniform(0.5, 1.5), rng.uniform(0.5, 1.5), rng.uniform(1e18, 1e19),
+    ]
+    if params["companion_mass"] is not None:
+        mat_row.append(params["companion_mass"])
+    return block, time[-1], teff[-1], mat_row
+
+
+def estimate_row_bytes(rows_per_cycle=2000, seed=0):
+    """Average size, in bytes, of an `l` row as written by `generate_system`."""
+    rng = np.random.default_rng(seed)
+    params = _system_params(rng, 0.7, 0.45)
+    block, _, _, _ = _cycle_block(rng, 1, rows_per_cycle, 0.0, params["peak_teff"], params)
+    buffer = io.StringIO()
+    np.savetxt(buffer, np.column_stack([np.arange(1, len(block) + 1), block]), fmt=L_FORMAT)
+    return len(buffer.getvalue()) / len(block)
+
+
+def _system_params(rng, mwd, companion_mass):
+    return {
+        "mwd": mwd,
+        "companion_mass": companion_mass,
+        "base_teff": rng.uniform(4.2, 4.5),
+        "peak_teff": rng.uniform(5.2, 5.6),
+        "recurrence": 10 ** rng.uniform(2, 5) * (1.4 - mwd),
+        "m_acc": 10 ** rng.uniform(-6, -4),
+    }
+
+
+def generate_system(system_path, n_cycles, rows_per_cycle=2000, n_segments=2, mwd=0.7,
+                    companion_mass=0.45, rate_code=45, jitter=0.1, seed=None):
+    """
+    Write the `l` and `mat` files of a synthetic system.
+
+    Parameters
+    ----------
+    system_path : str
+        Directory of the system, created if needed.
+    n_cycles : int
+        Number of cycles of the system.
+    rows_per_cycle : int
+        Average number of `l` rows per cycle.
+    n_segments : int
+        Number of file segments (1 to 6), named A to F; cycles are split evenly between them.
+    mwd : float
+        White dwarf mass, in solar masses.
+    companion_mass : float or None
+        Companion mass, written as an extra `mat` column; None for no companion mass column.
+    rate_code : int
+        Second number of the file names, e.g. 45 for `l_070_045_A`.
+    jitter : float
+        Relative variation of the number of rows of each cycle.
+    seed : int or None
+        Seed of the random generator.
+
+    Returns
+    -------
+    tuple
+        (list of `l` file paths, list of `mat` file paths, total number of `l` rows).
+    """
+    if not 1 <= n_segments <= MAX_SEGMENTS:
+        raise ValueError(f"The number of segments must be between 1 and {MAX_SEGMENTS}.")
+    if n_cycles < n_segments:
+        raise ValueError("Every segment needs at least one cycle.")
+
+    os.makedirs(system_path, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    params = _system_params(rng, mwd, companion_mass)
+    mat_header = MAT_COLUMNS + (["companion_mass"] if companion_mass is not None else [])
+    prefix = f"{round(mwd * 100):03d}_{rate_code:03d}"
+
+    l_paths, mat_paths = [], []
+    total_rows = 0
+    teff = params["peak_teff"]
+    for segment, cycles in zip(string.ascii_uppercase, np.array_split(np.arange(n_cycles), n_segments)):
+        l_path = os.path.join(system_path, f"l_{prefix}_{segment}")
+        mat_path = os.path.join(system_path, f"mat_{prefix}_mt_{segment}")
+        t_end = 0.0
+        row = 0
+        mat_rows = []
+
+        with open(l_path, "w") as l_file:
+            blocks, n_block_rows = [], 0
+            for local_cycle in range(1, len(cycles) + 1):
+                n_rows = _cycle_rows(rng, rows_per_cycle, jitter)
+                block, t_end, teff, mat_row = _cycle_block(rng, local_cycle, n_rows, t_end, teff, params)
+                blocks.append(block)
+                n_block_rows += n_rows
+                mat_rows.append(mat_row)
+                if n_block_rows >= BLOCK_ROWS or local_cycle == len(cycles):
+                    data = np.concatenate(blocks)
+                    np.savetxt(l_file, np.column_stack([np.arange(row + 1, row + len(data) + 1), data]), fmt=L_FORMAT)
+                    row += len(data)
+                    blocks, n_block_rows = [], 0
+
+        with open(mat_path, "w") as mat_file:
+            mat_file.write(" ".join(mat_header) + "\n")
+            np.savetxt(mat_file, np.array(mat_rows), fmt=["%d"] + ["%.6g"] * (len(mat_header) - 1))
+
+        l_paths.append(l_path)
+        mat_paths.append(mat_path)
+        total_rows += row
+
+    return l_paths, mat_paths, total_rows
+
+
+def generate_database(db_path, n_systems=3, n_cycles=None, size=None, rows_per_cycle=2000, n_segments=2,
+                      companion_mass=True, seed=0):
+    """
+    Write a synthetic systems database, one subdirectory per system.
+
+    Parameters
+    ----------
+    db_path : str
+        Directory of the database.
+    n_systems : int
+        Number of systems.
+    n_cycles : int or None
+        Number of cycles per system; derived from `size` if None.
+    size : int or None
+        Approximate size, in bytes, of the `l` files of each system.
+    rows_per_cycle : int
+        Average number of `l` rows per cycle.
+    n_segments : int
+        Number of file segments per system.
+    companion_mass : bool
+        Whether the `mat` files have a companion mass column.
+    seed : int
+        Seed; each system uses `seed + its number`.
+
+    Returns
+    -------
+    dict
+        Number of `l` rows by system name.
+    """
+    if n_cycles is None:
+        if size is None:
+            raise ValueError("Either the number of cycles or the size is needed.")
+        n_cycles = max(int(size / (estimate_row_bytes(rows_per_cycle) * rows_per_cycle)), n_segments)
+
+    rows = {}
+    for i in range(n_systems):
+        rng = np.random.default_rng(seed + i)
+        mwd = round(float(rng.uniform(0.6, 1.35)), 2)
+        name = f"synthetic_{i:02d}"
+        _, _, rows[name] = generate_system(
+            os.path.join(db_path, name), n_cycles, rows_per_cycle, n_segments, mwd,
+            round(float(rng.uniform(0.1, 1.0)), 2) if companion_mass else None,
+            rate_code=int(rng.integers(10, 100)), seed=seed + i,
+        )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("db_path", help="directory of the generated database")
+    parser.add_argument("--systems", type=int, default=3, help="number of systems")
+    amount = parser.add_mutually_exclusive_group()
+    amount.add_argument("--cycles", type=int, help="number of cycles per system")
+    amount.add_argument("--size", type=parse_size, help="size of the l files of each system, e.g. 500MB")
+    parser.add_argument("--rows-per-cycle", type=int, default=2000, help="average l rows per cycle")
+    parser.add_argument("--segments", type=int, default=2, help="file segments per system (1 to 6)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--no-companion-mass", action="store_true", help="omit the companion_mass mat column")
+    args = parser.parse_args()
+
+    rows = generate_database(
+        args.db_path, args.systems, args.cycles if args.cycles or args.size else 100, args.size,
+        args.rows_per_cycle, args.segments, not args.no_companion_mass, args.seed,
+    )
+    for name, n_rows in rows.items():
+        print(f"{name}: {n_rows} rows")
+
+
+if __name__ == "__main__":
+    main()
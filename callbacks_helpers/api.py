@@ -0,0 +1,191 @@
+import numpy as np
+import pandas as pd
+from flask import Blueprint, Response, request, stream_with_context
+
+from callbacks_helpers import db_calls, estimators_calls, transport
+from callbacks_helpers.lru_cache import LRUCache
+from files_utils import system_functions, demarcators
+from files_utils.lazy import lazy_import
+
+# numba and scipy are only imported once an estimation is run
+estimators = lazy_import("files_utils.estimators")
+
+
+# Rows per chunk of streamed responses
+CHUNK_ROWS = 10000
+
+# Decay demarcations, keyed on the database version and the system
+_decay_demarcations = LRUCache(maxsize=16)
+
+
+def _json_response(payload, status=200):
+    return Response(transport.dumps(payload), status=status, mimetype='application/json')
+
+
+def _error(message, status=400):
+    return _json_response({'error': message}, status)
+
+
+def _ndjson_response(lines):
+    """Streams an iterable of encoded lines as newline-delimited JSON."""
+    return Response(stream_with_context(lines), mimetype='application/x-ndjson')
+
+
+def _stream_records(df, chunk_rows=CHUNK_ROWS):
+    """Encodes the rows of a DataFrame as NDJSON, one chunk of rows at a time."""
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows].to_json(orient='records', lines=True)
+        yield chunk if chunk.endswith('\n') else chunk + '\n'
+
+
+def _cycle_slice(df, cycle_start, cycle_end):
+    """The rows of `df` with cycle_start <= cycle <= cycle_end, sliced without a scan when cycles are sorted."""
+    if cycle_start is None and cycle_end is None:
+        return df
+    cycles = df['cycle'].to_numpy()
+    if df['cycle'].is_monotonic_increasing:
+        start = 0 if cycle_start is None else np.searchsorted(cycles, cycle_start, side='left')
+        end = len(cycles) if cycle_end is None else np.searchsorted(cycles, cycle_end, side='right')
+        return df.iloc[start:end]
+    mask = np.ones(len(df), dtype=bool)
+    if cycle_start is not None:
+        mask &= cycles >= cycle_start
+    if cycle_end is not None:
+        mask &= cycles <= cycle_end
+    return df[mask]
+
+
+def _queries():
+    """The estimation queries of a request: {'queries': [...]} for a batch, or a single query object."""
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        raise ValueError("The body must be a JSON object.")
+    queries = body['queries'] if 'queries' in body else [body]
+    for query in queries:
+        margins = query.get('margins') if isinstance(query, dict) else None
+        if not isinstance(margins, dict) or not margins:
+            raise ValueError("Each query needs non-empty 'margins': {parameter: [value, delta]}.")
+    return queries
+
+
+def create_api(get_systems_db, get_frame, load_estimation_systems, estimation_dataset):
+    """
+    Create the blueprint of the REST API, which serves from the same caches as the app.
+
+    Large responses are streamed as newline-delimited JSON (application/x-ndjson).
+
+    Args:
+        get_systems_db (callable): Returns the systems catalog, as listed by `db_calls.inspect_db`.
+        get_frame (callable): get_frame(system_name, file_type) returns the 'L', 'MAT' or
+            'MERGED' DataFrame of a system.
+        load_estimation_systems (callable): Returns the estimation DataFrames by system name.
+        estimation_dataset (str): Name the estimation DataFrames were loaded under, which
+            keys their cached estimations.
+
+    Returns:
+        flask.Blueprint: The API, to register on `app.server`.
+    """
+    api = Blueprint('api', __name__, url_prefix='/api')
+
+    def frame_or_error(system_name, file_type='L'):
+        if system_name not in get_systems_db():
+            return None, _error(f"System '{system_name}' not found.", 404)
+        if file_type not in ('L', 'MAT', 'MERGED'):
+            return None, _error("The file type must be one of 'L', 'MAT' and 'MERGED'.")
+        return get_frame(system_name, file_type), None
+
+    @api.route('/systems')
+    def list_systems():
+        systems = {name: {'l_files': files[0], 'mat_files': files[1]} for name, files in get_systems_db().items()}
+        return _json_response({'db_version': db_calls.get_db_version(), 'systems': systems})
+
+    @api.route('/systems/<system_name>')
+    def system_info(system_name):
+        df, error = frame_or_error(system_name, request.args.get('type', 'MERGED').upper())
+        if error:
+            return error
+        return _json_response(system_functions.system_info(df))
+
+    @api.route('/systems/<system_name>/rows')
+    def system_rows(system_name):
+        """Columns (comma separated) of a cycle range and/or row range, streamed as NDJSON records."""
+        df, error = frame_or_error(system_name, request.args.get('type', 'L').upper())
+        if error:
+            return error
+
+        columns = request.args.get('columns')
+        if columns:
+            columns = columns.split(',')
+            unknown = [col for col in columns if col not in df.columns]
+            if unknown:
+                return _error(f"Unknown columns: {', '.join(unknown)}")
+
+        df = _cycle_slice(df, request.args.get('cycle_start', type=int), request.args.get('cycle_end', type=int))
+        df = df.iloc[request.args.get('row_start', type=int):request.args.get('row_end', type=int)]
+        if columns:
+            df = df[columns]
+        return _ndjson_response(_stream_records(df))
+
+    @api.route('/systems/<system_name>/cycle_lengths')
+    def cycle_lengths(system_name):
+        df, error = frame_or_error(system_name)
+        if error:
+            return error
+        lengths = pd.Series(system_functions.calculate_cycles_length(df), name='cycle length').rename_axis('cycle').reset_index()
+        return _ndjson_response(_stream_records(lengths))
+
+    @api.route('/systems/<system_name>/demarcations')
+    def demarcations(system_name):
+        """Decay phases ('kind=decay', the default) or eruptions ('kind=eruption') of each cycle, as NDJSON."""
+        df, error = frame_or_error(system_name)
+        if error:
+            return error
+
+        kind = request.args.get('kind', 'decay')
+        if kind == 'decay':
+            phases = _decay_demarcations.get_or_compute(
+                (db_calls.get_db_version(), system_name), lambda: demarcators.demarcate_decay_phases(df))
+            lines = (transport.dumps({'cycle': cycle, 'start_idx': start, 'end_idx': end}).decode() + '\n'
+                     for cycle, (start, end) in phases.items())
+            return _ndjson_response(lines)
+        if kind == 'eruption':
+            eruptions = estimators.get_eruption_times(df).reset_index()
+            return _ndjson_response(_stream_records(eruptions))
+        return _error("The kind must be 'decay' or 'eruption'.")
+
+    def estimation_route(estimate):
+        """Streams one NDJSON line per query, as soon as its estimation is done."""
+        try:
+            queries = _queries()
+        except (ValueError, KeyError) as e:
+            return _error(str(e))
+        dfs = load_estimation_systems()
+
+        def lines():
+            for i, query in enumerate(queries):
+                try:
+                    result = {'index': i, 'result': estimate(dfs, query)}
+                except KeyError as e:
+                    result = {'index': i, 'error': f"Unknown parameter: {e}"}
+                except Exception as e:
+                    result = {'index': i, 'error': str(e)}
+                yield transport.dumps(result).decode() + '\n'
+
+        return _ndjson_response(lines())
+
+    @api.route('/estimate/nova_time', methods=['POST'])
+    def estimate_nova_time():
+        """Body: {'margins': {...}, 'k': optional} or {'queries': [...]}."""
+        return estimation_route(
+            lambda dfs, query: estimators_calls.cached_estimate_nova_times(
+                dfs, estimation_dataset, query['margins'], k=query.get('k', 1)))
+
+    @api.route('/estimate/closest_match', methods=['POST'])
+    def closest_match():
+        """Body: {'margins': {...}, 'k': optional} or {'queries': [...]}."""
+        def estimate(dfs, query):
+            matches = estimators_calls.cached_find_closest_matches(dfs, estimation_dataset, query['margins'], k=query.get('k', 1))
+            return [dict(match, row=match['row'].to_dict()) for match in matches]
+        return estimation_route(estimate)
+
+    return api
@@ -1,8 +1,62 @@
 import os
+import pickle
 import re
+import shutil
 import pandas as pd
 import string
 
+from files_utils import memory, read_l, read_mat
+
+
+# Load systems with compact dtypes, see `memory.compact_frame`
+COMPACT_FRAMES = os.environ.get("BINARY_SYSTEMS_COMPACT", "") not in ("", "0")
+
+# Incremented on every change made to the database, used to invalidate caches
+_db_version = 0
+
+# When set, the version is the size of this file instead, so that it is shared
+# by all the server processes: every change appends one byte to it
+_db_version_file = None
+
+
+def share_db_version(version_file):
+    """
+    Share the database version between processes through a file.
+
+    The version is also bumped, so that results cached by a previous run of the
+    server are not reused.
+
+    Args:
+        version_file (str): Path of the file holding the version.
+    """
+    global _db_version_file
+    os.makedirs(os.path.dirname(version_file), exist_ok=True)
+    _db_version_file = version_file
+    _bump_db_version()
+
+
+def get_db_version():
+    """
+    Returns the current version of the database; it changes whenever a function
+    of this module modifies the database.
+    """
+    if _db_version_file is not None:
+        try:
+            return os.stat(_db_version_file).st_size
+        except FileNotFoundError:
+            return 0
+    return _db_version
+
+
+def _bump_db_version():
+    global _db_version
+    if _db_version_file is not None:
+        # Appends are atomic, so concurrent bumps from several processes are all counted
+        with open(_db_version_file, 'ab') as f:
+            f.write(b'.')
+    else:
+        _db_version += 1
+
 
 def inspect_db(db_path):
     """
@@ -56,25 +110,30 @@ def add_system(db_path, new_system_name, files_info):
     # Create the full path for the new subfolder
     new_system_path = os.path.join(db_path, new_system_name)
     
-    # Check if the subfolder already exists
-    if not os.path.exists(new_system_path):
-        os.makedirs(new_system_path)  # Create the folder
-
-    # Loop through the list of files and save them in the new folder
-    for file in files_info:
-        # Validate the filename format using regex
-        file_name = file["filename"]
-        if not re.match(l_file_pattern, file_name) and not re.match(mat_file_pattern, file_name):
-            return f"Error: File '{file_name}' must be of the format 'l_num_num_letter' or 'mat_num_num_mt_letter'."
-
-        # Save the file if the format is valid
-        file_path = os.path.join(new_system_path, file_name)
-        
-        try:
-            with open(file_path, 'wb') as f:
-                f.write(file["content"])
-        except Exception as e:
-            return f"Error saving file '{file_name}': {str(e)}"
+    # The version is bumped once the files are written, even after an error, so that
+    # nothing loaded while they were being written outlives the change
+    try:
+        # Check if the subfolder already exists
+        if not os.path.exists(new_system_path):
+            os.makedirs(new_system_path)  # Create the folder
+
+        # Loop through the list of files and save them in the new folder
+        for file in files_info:
+            # Validate the filename format using regex
+            file_name = file["filename"]
+            if not re.match(l_file_pattern, file_name) and not re.match(mat_file_pattern, file_name):
+                return f"Error: File '{file_name}' must be of the format 'l_num_num_letter' or 'mat_num_num_mt_letter'."
+
+            # Save the file if the format is valid
+            file_path = os.path.join(new_system_path, file_name)
+
+            try:
+                with open(file_path, 'wb') as f:
+                    f.write(file["content"])
+            except Exception as e:
+                return f"Error saving file '{file_name}': {str(e)}"
+    finally:
+        _bump_db_version()
 
     return f"New system successfully saved in the database '{new_system_name}'."
 
@@ -102,8 +161,11 @@ def add_file_to_system(db_path, system_name, filename, content_bytes):
         raise FileNotFoundError(f"System '{system_name}' not found in '{db_path}'.")
     # Write the bytes to file
     file_path = os.path.join(system_path, filename)
-    with open(file_path, 'wb') as f:
-        f.write(content_bytes)
+    try:
+        with open(file_path, 'wb') as f:
+            f.write(content_bytes)
+    finally:
+        _bump_db_version()
 
 
 def delete_file_from_system(db_path, system_name, filename):
@@ -122,3 +184,126 @@ def delete_file_from_system(db_path, system_name, filename):
         os.remove(file_path)
     except FileNotFoundError:
         raise FileNotFoundError(f"File '{filename}' not found in system '{system_name}'.")
+    _bump_db_version()
+
+
+def delete_system(db_path, system_name):
+    """
+    Delete a system's directory and all of its files.
+
+    Raises:
+        FileNotFoundError: If the system directory doesn’t exist.
+        OSError: If deletion fails (e.g. due to permissions).
+    """
+    system_path = os.path.join(db_path, system_name)
+    if not os.path.isdir(system_path):
+        raise FileNotFoundError(f"System '{system_name}' not found in '{db_path}'.")
+    try:
+        shutil.rmtree(system_path)
+        # Its saved frames, see `save_system`
+        artifact_path = system_artifact_path(db_path, system_name)
+        if os.path.exists(artifact_path):
+            os.remove(artifact_path)
+    finally:
+        _bump_db_version()
+
+
+def load_system(db_path, system_name, system_files, l_columns=None, mat_columns=None, compact=None):
+    """
+    Read and concatenate all the `l` and `mat` files of a system.
+
+    The peak memory allocated while loading each frame is kept in its
+    `attrs['load_peak_bytes']`.
+
+    Args:
+        db_path (str): Path to the top-level data storage directory.
+        system_name (str): Name of the system.
+        system_files (list): [l files, mat files], as listed by `inspect_db`.
+        l_columns (list, optional): Columns to read from the `l` files, all if None.
+        mat_columns (list, optional): Columns to read from the `mat` files, all if None.
+        compact (bool, optional): Downcast the frames with `memory.compact_frame`;
+            defaults to the `BINARY_SYSTEMS_COMPACT` environment variable.
+
+    Returns:
+        tuple: The system's `l` DataFrame and `mat` DataFrame.
+    """
+    if compact is None:
+        compact = COMPACT_FRAMES
+    system_path = os.path.join(db_path, system_name)
+
+    frames = []
+    for read, files, columns in ((read_l.concatenate_files, system_files[0], l_columns),
+                                 (read_mat.concatenate_files, system_files[1], mat_columns)):
+        with memory.peak_memory() as peak:
+            df = read([os.path.join(system_path, f) for f in files], columns)
+            if compact:
+                df = memory.compact_frame(df)
+        df.attrs['load_peak_bytes'] = peak['peak_bytes']
+        frames.append(df)
+    return tuple(frames)
+
+
+def system_fingerprint(db_path, system_name, system_files):
+    """Names, sizes and modification times of a system's files."""
+    fingerprint = []
+    for f in sum(system_files, []):
+        stat = os.stat(os.path.join(db_path, system_name, f))
+        fingerprint.append((system_name, f, stat.st_size, stat.st_mtime_ns))
+    return fingerprint
+
+
+def system_artifact_path(db_path, system_name):
+    """Path of the saved frames of a system, next to the system directories."""
+    return os.path.join(db_path, f".{system_name}.frames.pkl")
+
+
+def save_system(db_path, system_name, system_files, compact=None):
+    """
+    Load a system with `load_system` and save its frames as `.<system_name>.frames.pkl`
+    in the database directory, with a fingerprint of the files they were read from.
+
+    Args:
+        db_path (str): Path to the top-level data storage directory.
+        system_name (str): Name of the system.
+        system_files (list): [l files, mat files], as listed by `inspect_db`.
+        compact (bool, optional): See `load_system`.
+
+    Returns:
+        tuple: The system's `l` DataFrame and `mat` DataFrame.
+    """
+    if compact is None:
+        compact = COMPACT_FRAMES
+    fingerprint = system_fingerprint(db_path, system_name, system_files)
+    frames = load_system(db_path, system_name, system_files, compact=compact)
+
+    # Write atomically, concurrent readers see either the old or the new frames
+    artifact_path = system_artifact_path(db_path, system_name)
+    tmp_path = f"{artifact_path}.{os.getpid()}.tmp"
+    pd.to_pickle({'fingerprint': fingerprint, 'compact': compact, 'frames': frames}, tmp_path)
+    os.replace(tmp_path, artifact_path)
+    return frames
+
+
+def read_saved_system(db_path, system_name, system_files, compact=None):
+    """
+    Read the frames saved by `save_system`, if the system's files have not changed since.
+
+    Args:
+        db_path (str): Path to the top-level data storage directory.
+        system_name (str): Name of the system.
+        system_files (list): [l files, mat files], as listed by `inspect_db`.
+        compact (bool, optional): See `load_system`.
+
+    Returns:
+        tuple or None: The system's `l` DataFrame and `mat` DataFrame, or None if they
+        were not saved or are out of date.
+    """
+    if compact is None:
+        compact = COMPACT_FRAMES
+    try:
+        stored = pd.read_pickle(system_artifact_path(db_path, system_name))
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+    if stored['compact'] != compact or stored['fingerprint'] != system_fingerprint(db_path, system_name, system_files):
+        return None
+    return stored['frames']
@@ -1,43 +1,248 @@
 import pandas as pd
+import numpy as np
 import os
-import sys
-sys.path.insert(0, os.path.abspath('..'))
-from files_utils import read_l, read_mat, estimators
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from files_utils import read_l, read_mat
+from files_utils.lazy import lazy_import
+from callbacks_helpers import db_calls
+from callbacks_helpers.lru_cache import LRUCache
+
+# numba and scipy are only imported once an estimation is run
+estimators = lazy_import("files_utils.estimators")
+
+
+# Estimation results, keyed on the dataset, the database version and the quantized margins
+estimation_cache = LRUCache(maxsize=256)
+
+# Loaded estimation datasets: name -> (database version, {system name: DataFrame})
+_systems_cache = {}
+
+
+# Columns of the estimation dataset, by source file type
+L_ESTIMATION_COLUMNS = ["cycle", "time", "accumulated mass", "effective temperature"]
+MAT_ESTIMATION_COLUMNS = ["cycle", "MWD", "companion_mass"]
+
+# Columns the estimators search on
+ESTIMATION_FEATURES = ["MWD", "MRD", "time", "effective temperature"]
+
+# Name under which the app and the batch tools load the estimation dataset
+ESTIMATION_DATASET = "masses_data"
 
 
 def build_df_for_estimations(l_df, mat_df, system_path):
     """
-    Construct two DataFrames for 'l' and 'mat' files.
+    Construct the estimation DataFrame of a system from its 'l' and 'mat' DataFrames.
+
+    The per-cycle 'mat' values are broadcast to the 'l' rows through the cycle index,
+    so only the relevant columns are ever copied.
 
     Parameters
     ----------
-    l_file : str
-        Filename (relative to `system_path`) for the 'l' dataset.
-    mat_file : str
-        Filename (relative to `system_path`) for the 'mat' dataset.
+    l_df : pandas.DataFrame
+        The system's 'l' data, with at least the columns of `L_ESTIMATION_COLUMNS`.
+    mat_df : pandas.DataFrame
+        The system's 'mat' data, with a 'cycle' column.
     system_path : str
-        Directory path where the data files are located. This path will be prepended to each
-        filename in `l_file` and `mat_file`.
+        Directory path where the data files are located, used in error messages.
 
     Returns
     -------
     pandas.DataFrame
-        A DataFrame containing the merged data from 'l' and 'mat', with only the relevant columns for the temp decay analysis.
+        A DataFrame with only the relevant columns for the temp decay analysis.
+    """
+    missing = [c for c in L_ESTIMATION_COLUMNS if c not in l_df.columns]
+    if missing or "cycle" not in mat_df.columns:
+        raise ValueError(f"The relevant columns for the estimation are not all present in '{system_path}': {missing or ['cycle']}")
+
+    df = l_df.loc[:, L_ESTIMATION_COLUMNS].copy()
+
+    # Row of the 'mat' cycle of each 'l' row, -1 when the cycle is missing
+    per_cycle = mat_df.drop_duplicates("cycle").set_index("cycle")
+    rows = per_cycle.index.get_indexer(df["cycle"])
+    for col in MAT_ESTIMATION_COLUMNS[1:]:
+        if col in per_cycle.columns:
+            values = per_cycle[col].to_numpy(dtype=float)
+            df[col] = np.where(rows >= 0, values[rows], np.nan)
+
+    return df
+
+
+def load_estimation_df(system_path, l_files, mat_files):
+    """
+    Read only the estimation columns of a system's files.
+
+    Returns
+    -------
+    pandas.DataFrame or None
+        The estimation DataFrame, or None if the system has no companion mass column.
     """
+    l_df = read_l.concatenate_files([os.path.join(system_path, f) for f in l_files], L_ESTIMATION_COLUMNS)
+    mat_df = read_mat.concatenate_files([os.path.join(system_path, f) for f in mat_files], MAT_ESTIMATION_COLUMNS)
+    if "companion_mass" not in mat_df.columns:
+        return None
+    return build_df_for_estimations(l_df, mat_df, system_path)
+
+
+def _db_fingerprint(systems_db, db_path):
+    """Names, sizes and modification times of all the database files."""
+    fingerprint = []
+    for system_name, system_files in sorted(systems_db.items()):
+        fingerprint.extend(db_calls.system_fingerprint(db_path, system_name, system_files))
+    return fingerprint
+
+
+def retrieve_systems_with_companion_mass(systems_db, cache_name, db_path, max_workers=1):
+    """
+    Load the estimation DataFrame of every system that has a companion mass column.
+
+    The dataset is kept in memory until the database changes, and saved in the database
+    directory as `.<cache_name>.pkl` together with a fingerprint of the files it was built
+    from, so that other processes and later runs only rebuild it when the files change.
+
+    Parameters
+    ----------
+    systems_db : dict
+        Mapping of system name to [l files, mat files], as returned by `db_calls.inspect_db`.
+    cache_name : str
+        Name under which the loaded dataset is cached.
+    db_path : str
+        Path to the database directory.
+    max_workers : int
+        Number of processes reading the systems when the dataset is rebuilt.
+
+    Returns
+    -------
+    dict[str, pandas.DataFrame]
+        Mapping of system name to its estimation DataFrame, with the companion mass
+        in an 'MRD' column.
+    """
+    version = db_calls.get_db_version()
+    cached = _systems_cache.get(cache_name)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    fingerprint = _db_fingerprint(systems_db, db_path)
+    artifact_path = os.path.join(db_path, f".{cache_name}.pkl")
     try:
-        # Merge 'l_df' and 'mat_df' on 'cycle' column
-        merged = pd.merge(l_df, mat_df, on='cycle', how='left')
-    except KeyError as e:
-        raise KeyError(f"Merge key error: {e}")
-    except ValueError as e:
-        raise ValueError(f"Value error during merge: {e}")
-    except Exception as e:
-        raise RuntimeError(f"Error merging DataFrames: {e}")
-
-    # Select only the relevant columns
-    relevant_columns = ["cycle", "time", "accumulated mass", "effective temperature",  "MWD", "companion_mass"]
-    selected = [c for c in relevant_columns if c in merged.columns]
-    if not selected:
-        raise ValueError("The relevant columns for the estimation are not all present in the DataFrame.")
-
-    return merged.loc[:, selected].copy()
+        stored = pd.read_pickle(artifact_path)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        stored = None
+
+    if stored is not None and stored['fingerprint'] == fingerprint:
+        dfs = stored['systems']
+    else:
+        names = [name for name, (l_files, mat_files) in systems_db.items() if l_files and mat_files]
+        args = ([os.path.join(db_path, name) for name in names],
+                [systems_db[name][0] for name in names],
+                [systems_db[name][1] for name in names])
+        if max_workers > 1 and len(names) > 1:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                loaded = list(executor.map(load_estimation_df, *args))
+        else:
+            loaded = list(map(load_estimation_df, *args))
+
+        dfs = {}
+        for system_name, df in zip(names, loaded):
+            if df is not None:
+                dfs[system_name] = df.rename(columns={"companion_mass": "MRD"})
+
+        # Write atomically, concurrent readers see either the old or the new dataset
+        tmp_path = f"{artifact_path}.{os.getpid()}.tmp"
+        pd.to_pickle({'fingerprint': fingerprint, 'systems': dfs}, tmp_path)
+        os.replace(tmp_path, artifact_path)
+
+    _systems_cache[cache_name] = (version, dfs)
+    return dfs
+
+
+def _quantize(value, digits=6):
+    """Round a value to `digits` significant digits."""
+    return float(f"{float(value):.{digits}g}")
+
+
+def _quantize_margins(margins):
+    """Return the margins with quantized centers and deltas, in a canonical order."""
+    return {name: [_quantize(val), _quantize(delta)] for name, (val, delta) in sorted(margins.items())}
+
+
+def estimation_cache_key(func_name, dataset, margins, k):
+    """
+    Key identifying an estimation: function, dataset, database version, quantized margins and k.
+
+    `dataset` is the name the systems were loaded under (see
+    `retrieve_systems_with_companion_mass`), so that estimations on different
+    systems never share a result.
+    """
+    quantized = _quantize_margins(margins)
+    return (func_name, dataset, db_calls.get_db_version(), tuple((name, *vals) for name, vals in quantized.items()), k)
+
+
+def cached_estimate_nova_times(dfs, dataset, margins, k=1, max_workers=4):
+    """
+    Memoized `estimators.estimate_nova_times`, evaluated on quantized margins.
+
+    Results are invalidated when the database changes.
+    """
+    quantized = _quantize_margins(margins)
+    return estimation_cache.get_or_compute(
+        estimation_cache_key("estimate_nova_times", dataset, margins, k),
+        lambda: estimators.estimate_nova_times(dfs, quantized, k, max_workers)
+    )
+
+
+def cached_find_closest_matches(dfs, dataset, margins, k=1, max_workers=4):
+    """
+    Memoized `estimators.find_closest_matches`, evaluated on quantized margins.
+
+    The matches are stored as `summarize_matches` returns them, without the system
+    DataFrames. Results are invalidated when the database changes.
+    """
+    quantized = _quantize_margins(margins)
+    return estimation_cache.get_or_compute(
+        estimation_cache_key("find_closest_matches", dataset, margins, k),
+        lambda: summarize_matches(estimators.find_closest_matches(dfs, quantized, k=k, max_workers=max_workers))
+    )
+
+
+def cached_estimate_nova_time_distribution(dfs, dataset, margins, n_samples, max_workers=4):
+    """
+    Memoized `estimators.estimate_nova_time_distribution`, evaluated on quantized margins
+    with a fixed seed so that repeated queries give the same distribution.
+
+    Results are invalidated when the database changes.
+    """
+    quantized = _quantize_margins(margins)
+    return estimation_cache.get_or_compute(
+        estimation_cache_key("estimate_nova_time_distribution", dataset, margins, n_samples),
+        lambda: estimators.estimate_nova_time_distribution(dfs, quantized, n_samples=n_samples, seed=0, max_workers=max_workers)
+    )
+
+
+def cached_surrogate(dfs, dataset):
+    """
+    The `estimators.build_surrogate` model of the systems, rebuilt when the database changes.
+    """
+    return estimation_cache.get_or_compute(
+        ("surrogate", dataset, db_calls.get_db_version()),
+        lambda: estimators.build_surrogate(dfs)
+    )
+
+
+def warm_up(dfs, dataset):
+    """
+    Build the search indexes, the eruption tables and the surrogate model of the
+    estimation systems ahead of the first request, e.g. before the server forks its
+    worker processes.
+    """
+    for df in dfs.values():
+        estimators.get_range_index(df, [col for col in ESTIMATION_FEATURES if col in df.columns])
+        estimators.get_eruption_times(df)
+    cached_surrogate(dfs, dataset)
+
+
+def summarize_matches(matches):
+    """
+    Strip the system DataFrames from matches, keeping 'system', 'dist', 'orig_idx' and 'row'.
+    """
+    return [{key: match[key] for key in ('system', 'dist', 'orig_idx', 'row')} for match in matches]
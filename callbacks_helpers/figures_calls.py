@@ -0,0 +1,84 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from callbacks_helpers import db_calls, transport
+from callbacks_helpers.lru_cache import LRUCache
+from files_utils import system_functions, demarcators
+
+
+# Figures as (dict, JSON size) pairs, bounded by their total JSON size
+figure_cache = LRUCache(maxsize=128, maxbytes=256 * 1024 ** 2, sizeof=lambda entry: entry[1])
+
+
+def cached_figure(key, build_figure):
+    """
+    Returns the figure for `key` as a dict ready for `dcc.Graph`, building it on a miss.
+
+    Parameters
+    ----------
+    key : tuple
+        Identifies the figure; must include the version of the data (e.g. the loaded
+        system's key, which changes with the database), the plotting function and its
+        parameters.
+    build_figure : callable
+        Zero-argument function returning a `plotly.graph_objects.Figure`.
+
+    Returns
+    -------
+    dict
+        The figure, with its arrays already encoded as base64 typed arrays, so that
+        a hit costs no decoding. It is shared between calls and must not be modified.
+    """
+    def build():
+        figure_json = transport.figure_to_json(build_figure())
+        return transport.loads(figure_json), len(figure_json)
+
+    figure, _ = figure_cache.get_or_compute(key, build)
+    return figure
+
+
+def _system_decay_phases(db_path, system_name, system_files, cycles_list):
+    """Reads the columns needed for a system's decay phases and extracts the requested cycles."""
+    l_df, mat_df = db_calls.load_system(
+        db_path, system_name, system_files,
+        l_columns=system_functions.DECAY_L_COLUMNS, mat_columns=system_functions.DECAY_MAT_COLUMNS
+    )
+    mat_df = mat_df.drop_duplicates('cycle').set_index('cycle')
+    return system_functions.decay_phases(l_df, mat_df, cycles_list, demarcators.demarcate_decay_phases)
+
+
+def plot_systems_decay(db_path, systems_db, selections, max_workers=4):
+    """
+    Overlays the decay phases of cycles from several systems.
+
+    The systems are read and demarcated in parallel worker processes, which only
+    send back the requested phases.
+
+    Parameters
+    ----------
+    db_path : str
+        Path to the top-level data storage directory.
+    systems_db : dict
+        Files of each system, as listed by `db_calls.inspect_db`.
+    selections : list of tuple
+        (system name, list of cycles) pairs to plot.
+    max_workers : int
+        Maximum number of systems processed at once.
+
+    Returns
+    -------
+    plotly.graph_objects.Figure
+        The overlaid decay phases.
+    """
+    if len(selections) == 1:
+        system_name, cycles_list = selections[0]
+        phases = [_system_decay_phases(db_path, system_name, systems_db[system_name], cycles_list)]
+    else:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(selections))) as executor:
+            futures = [
+                executor.submit(_system_decay_phases, db_path, system_name, systems_db[system_name], cycles_list)
+                for system_name, cycles_list in selections
+            ]
+            phases = [future.result() for future in futures]
+
+    systems_phases = [(system_name, system_phases) for (system_name, _), system_phases in zip(selections, phases)]
+    return system_functions.plot_decay_phases(systems_phases)
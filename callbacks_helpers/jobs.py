@@ -0,0 +1,99 @@
+import os
+import time
+import functools
+import diskcache
+from dash import DiskcacheManager
+
+from callbacks_helpers import db_calls
+from files_utils import metrics
+
+
+# Directory of the on-disk store shared by the web server and its background jobs
+JOBS_CACHE_DIR = os.environ.get("BINARY_SYSTEMS_JOBS_DIR", os.path.join(os.getcwd(), ".jobs_cache"))
+
+# Seconds a job result is kept after its last access
+JOBS_EXPIRE = 60 * 60
+
+cache = diskcache.Cache(JOBS_CACHE_DIR)
+
+# Runs background callbacks in separate processes; results of identical
+# callback inputs are reused as long as the database has not changed
+background_callback_manager = DiskcacheManager(cache, cache_by=[db_calls.get_db_version], expire=JOBS_EXPIRE)
+
+# Seconds between two publications of the statistics of a server process, which
+# would otherwise lock and rewrite the shared totals on every request
+PUBLISH_INTERVAL = 10.0
+
+_last_published = 0.0
+
+# Returned by the store for a missing result, which a stored None must not be mistaken for
+_MISSING = object()
+
+
+def run_deduplicated(key, func):
+    """
+    Run `func` once per key across all background jobs.
+
+    Identical jobs started while one is still running wait for it to finish
+    and reuse its result instead of repeating the work. Results are pickled into
+    the shared store, so they should be small payloads (figures, estimates)
+    rather than DataFrames.
+
+    Parameters
+    ----------
+    key : tuple
+        Identifies the work; must include everything the result depends on.
+    func : callable
+        Zero-argument function computing the result.
+
+    Returns
+    -------
+    object
+        The result of `func`, possibly computed by another job.
+    """
+    result_key = ("result",) + tuple(key)
+    with diskcache.Lock(cache, ("lock",) + tuple(key), expire=JOBS_EXPIRE):
+        result = cache.get(result_key, default=_MISSING)
+        if result is _MISSING:
+            result = func()
+            cache.set(result_key, result, expire=JOBS_EXPIRE)
+    return result
+
+
+def publish_metrics(min_interval=0.0):
+    """
+    Add the call statistics of this process to the totals shared by all the processes
+    (server workers and background jobs), and clear them locally.
+
+    Parameters
+    ----------
+    min_interval : float
+        Skip the publication if this process published less than this many seconds ago.
+    """
+    global _last_published
+    now = time.monotonic()
+    if now - _last_published < min_interval:
+        return
+    _last_published = now
+
+    local = metrics.snapshot(reset=True)
+    if not local:
+        return
+    with diskcache.Lock(cache, ("lock", "metrics")):
+        cache.set(("metrics",), metrics.merge(cache.get(("metrics",), default=None), local))
+
+
+def published_metrics():
+    """The call statistics published by all the processes."""
+    return cache.get(("metrics",), default={})
+
+
+def publishing_metrics(func):
+    """Decorator publishing the call statistics at the end of a background callback, whose process then exits."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            publish_metrics()
+    return wrapper
@@ -0,0 +1,97 @@
+from collections import OrderedDict
+from threading import Lock
+
+
+# Marks a miss, so that None can be cached
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    A thread-safe, size-bounded mapping that evicts the least recently used entry.
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximum number of entries kept in the cache.
+    maxbytes : int or None
+        Maximum total size of the entries, as measured by `sizeof`.
+    sizeof : callable or None
+        Returns the size in bytes of a value; required with `maxbytes`.
+    """
+
+    def __init__(self, maxsize=128, maxbytes=None, sizeof=None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._nbytes = 0
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value for `key` and marks it as recently used, or `default` on a miss.
+        """
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        """
+        Stores `value` under `key`, evicting the least recently used entries beyond the limits.
+        """
+        with self._lock:
+            if key in self._data:
+                self._nbytes -= self._sizes.pop(key, 0)
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if self.sizeof is not None:
+                self._sizes[key] = self.sizeof(value)
+                self._nbytes += self._sizes[key]
+            while len(self._data) > self.maxsize or (self.maxbytes is not None and self._nbytes > self.maxbytes and len(self._data) > 1):
+                evicted, _ = self._data.popitem(last=False)
+                self._nbytes -= self._sizes.pop(evicted, 0)
+
+    def pop(self, key, default=None):
+        """
+        Removes `key` from the cache and returns its value, or `default` if it is not cached.
+        """
+        with self._lock:
+            self._nbytes -= self._sizes.pop(key, 0)
+            return self._data.pop(key, default)
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the cached value for `key`, calling `compute()` and storing its result on a miss.
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        """Removes all entries and resets the hit/miss counters."""
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self._nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        """
+        Returns
+        -------
+        dict
+            'hits', 'misses', 'size', 'maxsize' and 'nbytes' of the cache.
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data), 'maxsize': self.maxsize, 'nbytes': self._nbytes}
@@ -0,0 +1,129 @@
+import re
+import operator
+
+import numpy as np
+
+from callbacks_helpers.lru_cache import LRUCache
+
+
+# Row order of filtered and sorted table views, keyed on the view and its query
+table_order_cache = LRUCache(maxsize=32, maxbytes=512 * 1024 ** 2, sizeof=lambda positions: positions.nbytes)
+
+# Operators of the DataTable filter query syntax
+_FILTER_OPERATORS = {
+    '>=': operator.ge, 'ge': operator.ge,
+    '<=': operator.le, 'le': operator.le,
+    '<': operator.lt, 'lt': operator.lt,
+    '>': operator.gt, 'gt': operator.gt,
+    '!=': operator.ne, 'ne': operator.ne,
+    '=': operator.eq, 'eq': operator.eq,
+    'contains': None,
+}
+
+_FILTER_PART = re.compile(r'^\{(?P<column>[^}]+)\}\s*s?(?P<op>>=|<=|!=|<|>|=|(?:ge|le|lt|gt|ne|eq|contains)\b)\s*(?P<value>.*)$')
+
+
+def parse_filter_query(filter_query):
+    """
+    Splits a DataTable filter query into (column, operator, value) conditions.
+
+    Args:
+        filter_query (str): The query, e.g. '{time} > 10 && {cycle} = 3'.
+
+    Returns:
+        list: The conditions; numeric values are converted to float.
+
+    Raises:
+        ValueError: If a part of the query is not understood.
+    """
+    conditions = []
+    for part in (filter_query or '').split(' && '):
+        part = part.strip()
+        if not part:
+            continue
+        match = _FILTER_PART.match(part)
+        if match is None:
+            raise ValueError(f"Invalid filter: {part}")
+        column, op, value = match.group('column'), match.group('op'), match.group('value').strip()
+
+        if value[:1] == value[-1:] and value[:1] in ('"', "'", '`') and len(value) > 1:
+            value = value[1:-1]
+        elif op != 'contains':
+            try:
+                value = float(value)
+            except ValueError:
+                pass
+        conditions.append((column, op, value))
+    return conditions
+
+
+def _filter_mask(df, conditions):
+    """
+    Boolean mask of the rows of `df` satisfying all the conditions.
+
+    Raises:
+        ValueError: If a column is unknown, or its values cannot be compared with
+            the condition's value (e.g. '{MWD} > "abc"').
+    """
+    mask = np.ones(len(df), dtype=bool)
+    for column, op, value in conditions:
+        if column not in df.columns:
+            raise ValueError(f"Unknown column: {column}")
+        series = df[column]
+        if op == 'contains':
+            mask &= series.astype(str).str.contains(str(value), regex=False).to_numpy()
+        else:
+            try:
+                mask &= _FILTER_OPERATORS[op](series, value).to_numpy(dtype=bool)
+            except TypeError:
+                raise ValueError(f"Cannot compare {column} with {value!r}") from None
+    return mask
+
+
+def _row_order(df, conditions, sort_by):
+    """Positions of the rows of `df` passing the filter, in the requested order."""
+    positions = np.flatnonzero(_filter_mask(df, conditions)) if conditions else np.arange(len(df))
+    if sort_by:
+        columns = [s['column_id'] for s in sort_by if s['column_id'] in df.columns]
+        ascending = [s['direction'] == 'asc' for s in sort_by if s['column_id'] in df.columns]
+        if columns:
+            selected = df[columns].iloc[positions].reset_index(drop=True)
+            order = selected.sort_values(columns, ascending=ascending, kind='stable', na_position='last').index
+            positions = positions[order.to_numpy()]
+    return positions
+
+
+def query_page(df, view_key, columns, page_current, page_size, sort_by=None, filter_query=''):
+    """
+    Returns one page of a DataFrame after server-side filtering and sorting.
+
+    The row order of each (view, filter, sort) combination is computed once and cached,
+    so that moving between pages only slices the rows of the page.
+
+    Args:
+        df (pandas.DataFrame): The rows shown in the table.
+        view_key (tuple): Identifies `df`; must change when its content changes.
+        columns (list): The columns shown in the table; filters and sorting apply to these.
+        page_current (int): Index of the page, starting at 0.
+        page_size (int): Number of rows per page.
+        sort_by (list, optional): The DataTable sort_by property.
+        filter_query (str, optional): The DataTable filter_query property.
+
+    Returns:
+        tuple: The records of the page and the number of pages.
+
+    Raises:
+        ValueError: If the filter query is invalid or does not fit the type of its column.
+    """
+    conditions = [c for c in parse_filter_query(filter_query) if c[0] in columns]
+    sort_by = [s for s in sort_by or [] if s['column_id'] in columns]
+    page_current = page_current or 0
+    page = slice(page_current * page_size, (page_current + 1) * page_size)
+
+    if not conditions and not sort_by:
+        return df.iloc[page][columns].to_dict('records'), max(-(-len(df) // page_size), 1)
+
+    sort_key = tuple((s['column_id'], s['direction']) for s in sort_by)
+    key = (view_key, tuple(conditions), sort_key)
+    positions = table_order_cache.get_or_compute(key, lambda: _row_order(df, conditions, sort_by))
+    return df.iloc[positions[page]][columns].to_dict('records'), max(-(-len(positions) // page_size), 1)
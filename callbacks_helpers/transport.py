@@ -0,0 +1,91 @@
+import gzip
+import json
+
+import plotly.io as pio
+from flask import request
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Plotly encodes numpy arrays as base64 typed arrays; orjson makes the
+# surrounding JSON (figures and callback responses, via plotly's encoder) faster
+pio.json.config.default_engine = 'orjson' if orjson is not None else 'json'
+
+# Responses smaller than this are sent uncompressed
+COMPRESS_MIN_SIZE = 1024
+
+COMPRESS_LEVEL = 5
+
+
+def figure_to_json(fig):
+    """
+    Serialize a figure, with its numeric arrays as base64 typed arrays.
+
+    Args:
+        fig (plotly.graph_objects.Figure): The figure.
+
+    Returns:
+        str: The figure JSON.
+    """
+    return pio.to_json(fig, validate=False)
+
+
+def loads(data):
+    """Parse JSON produced by `figure_to_json`."""
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def _json_default(value):
+    """Fallback encoder for numpy scalars and arrays."""
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(obj):
+    """
+    Serialize API payloads, including numpy scalars and arrays, to JSON bytes.
+
+    Args:
+        obj: The payload.
+
+    Returns:
+        bytes: The JSON; with orjson, NaN is written as null.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_json_default).encode()
+
+
+def enable_compression(server, min_size=COMPRESS_MIN_SIZE, level=COMPRESS_LEVEL):
+    """
+    Gzip the JSON responses of a Flask server (callback outputs, REST payloads)
+    for clients that accept it.
+
+    Args:
+        server (flask.Flask): The server, e.g. `app.server`.
+        min_size (int): Smallest response body, in bytes, worth compressing.
+        level (int): Gzip compression level.
+    """
+    @server.after_request
+    def compress_response(response):
+        if (response.status_code != 200 or response.direct_passthrough
+                or response.mimetype != 'application/json'
+                or 'Content-Encoding' in response.headers
+                or 'gzip' not in request.headers.get('Accept-Encoding', '')):
+            return response
+
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+
+        response.set_data(gzip.compress(data, compresslevel=level))
+        response.headers['Content-Encoding'] = 'gzip'
+        response.headers['Content-Length'] = str(len(response.get_data()))
+        response.vary.add('Accept-Encoding')
+        return response
+
+    return compress_response
@@ -1,10 +1,19 @@
+import numpy as np
 import pandas as pd
 
+from files_utils import metrics
 
+
+@metrics.timed(rows=metrics.rows_of_first_arg)
 def demarcate_decay_phases(df):
     """
     Identifies the start and end indices of the decay phase for each cycle.
 
+    The decay phase of a cycle starts at its last negative accumulated mass (the end of
+    the eruption) and ends at the first increase of the effective temperature after the
+    cycle, located in the next cycle. Rows are expected to be labelled by position, as
+    returned by `read_l.concatenate_files`.
+
     Parameters
     ----------
     df : pd.DataFrame
@@ -16,36 +25,37 @@ def demarcate_decay_phases(df):
         A dictionary where keys are cycle numbers and values are lists containing
         the start and end indices of the decay phase for each cycle.
     """
-    result = {}
-    max_cycle = df["cycle"].max()
-    n = len(df)
-
-    for cycle in range(1, max_cycle):
-        cycle_df = df[df["cycle"] == cycle]
-        if cycle_df.empty:
-            continue
-
-        first_idx = cycle_df.index[0]
-        last_idx = cycle_df.index[-1]
-
-        # Find delimiter_1: last negative value of accumulated mass, end of eruption
-        delimiter_1 = first_idx
-        subset = df.loc[first_idx:last_idx]
-        ejecta_phase = subset[subset["accumulated mass"] < 0]
-        if not ejecta_phase.empty:
-            delimiter_1 = int(ejecta_phase.index[-1])
-            
-
-        # Find delimiter_2: first increase in effective temperature (located in the next cycle)
-        delimiter_2 = last_idx
-        for idx in range(last_idx + 1, n):
-            if df.loc[idx, "effective temperature"] > df.loc[idx - 1, "effective temperature"]:
-                delimiter_2 = idx
-                break
-
-        result[cycle] = [delimiter_1, delimiter_2]
-
-    return result
+    cycles = df["cycle"].to_numpy()
+    n = len(cycles)
+    if n == 0:
+        return {}
+
+    # First and last position of every cycle
+    values, first = np.unique(cycles, return_index=True)
+    _, last_reversed = np.unique(cycles[::-1], return_index=True)
+    last = n - 1 - last_reversed
+
+    negative = np.flatnonzero(df["accumulated mass"].to_numpy() < 0)
+    temperature = df["effective temperature"].to_numpy(dtype=float)
+    increases = np.flatnonzero(temperature[1:] > temperature[:-1]) + 1
+
+    # delimiter_1: last negative accumulated mass between the cycle's first and last rows
+    pos = np.searchsorted(negative, last, side="right") - 1
+    ejecta_end = negative[np.maximum(pos, 0)] if len(negative) else first
+    delimiter_1 = np.where((pos >= 0) & (ejecta_end >= first), ejecta_end, first)
+
+    # delimiter_2: first increase in effective temperature after the cycle
+    pos = np.searchsorted(increases, last + 1, side="left")
+    next_increase = increases[np.minimum(pos, len(increases) - 1)] if len(increases) else last
+    delimiter_2 = np.where(pos < len(increases), next_increase, last)
+
+    labels = df.index.to_numpy()
+    max_cycle = np.nanmax(cycles)
+    return {
+        int(cycle): [int(labels[start]), int(labels[end])]
+        for cycle, start, end in zip(values, delimiter_1, delimiter_2)
+        if 1 <= cycle < max_cycle and cycle == int(cycle)
+    }
 
 
 def demarcate_nova_eruptions(df):
@@ -94,3 +104,36 @@ def demarcate_cycles(df):
         delimiter_2 = cycle_df.index[-1]
         result[cycle] = [delimiter_1, delimiter_2]
     return result
+
+
+@metrics.timed(rows=metrics.rows_of_first_arg)
+def demarcate_eruption_times(df):
+    """
+    Builds a per-cycle table of the eruption (ejection) phase of each cycle.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        A DataFrame containing the system's data, with 'cycle', 'time' and 'accumulated mass' columns.
+
+    Returns
+    -------
+    pd.DataFrame
+        A DataFrame indexed by cycle number, sorted by row index, with columns:
+            - 'first_idx': Row index of the first negative accumulated mass of the cycle.
+            - 'last_idx': Row index of the last negative accumulated mass of the cycle.
+            - 'start_time': Time at 'first_idx'.
+            - 'end_time': Time at 'last_idx'.
+        Cycles without an ejection phase are omitted.
+    """
+    ejecta = df.loc[df["accumulated mass"] < 0, ["cycle", "time"]]
+    ejecta = ejecta.rename_axis("row").reset_index()
+
+    grp = ejecta.groupby("cycle", sort=False)
+    table = pd.DataFrame({
+        "first_idx": grp["row"].first(),
+        "last_idx": grp["row"].last(),
+        "start_time": grp["time"].first(),
+        "end_time": grp["time"].last(),
+    })
+    return table.sort_values("first_idx")
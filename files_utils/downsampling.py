@@ -0,0 +1,375 @@
+import numpy as np
+import plotly.graph_objects as go
+
+from files_utils import metrics
+from files_utils.lazy import lazy_njit
+
+
+# Default number of points sent to the browser per figure
+DEFAULT_MAX_POINTS = 20000
+
+# Traces with more points than this are drawn with WebGL
+WEBGL_THRESHOLD = 5000
+
+
+# ---------- NUMBA KERNELS ----------
+
+@lazy_njit(cache=True)
+def _lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets selection of `n_out` points of an ordered series.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        Ordered x values.
+    y : np.ndarray
+        The y values.
+    n_out : int
+        Number of points to keep, at least 3.
+
+    Returns
+    -------
+    np.ndarray
+        Sorted positions of the kept points.
+    """
+    n = len(x)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0] = 0
+    out[n_out - 1] = n - 1
+    every = (n - 2) / (n_out - 2)
+    a = 0
+
+    for i in range(n_out - 2):
+        # Average of the next bucket
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_x = 0.0
+        avg_y = 0.0
+        for j in range(avg_start, avg_end):
+            avg_x += x[j]
+            avg_y += y[j]
+        count = max(avg_end - avg_start, 1)
+        avg_x /= count
+        avg_y /= count
+
+        # Point of the current bucket forming the largest triangle
+        range_start = int(i * every) + 1
+        range_end = int((i + 1) * every) + 1
+        max_area = -1.0
+        next_a = range_start
+        for j in range(range_start, range_end):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > max_area:
+                max_area = area
+                next_a = j
+        out[i + 1] = next_a
+        a = next_a
+
+    return out
+
+
+@lazy_njit(cache=True)
+def _minmax_indices(arrays, n_buckets):
+    """
+    Positions of the minimum and maximum of each array within consecutive row buckets.
+
+    Parameters
+    ----------
+    arrays : np.ndarray, shape (n_arrays, n_samples)
+    n_buckets : int
+
+    Returns
+    -------
+    np.ndarray
+        Sorted positions of the kept points, including the first and the last.
+    """
+    n_arrays, n = arrays.shape
+    keep = np.zeros(n, dtype=np.bool_)
+    keep[0] = True
+    keep[n - 1] = True
+
+    for b in range(n_buckets):
+        start = b * n // n_buckets
+        end = (b + 1) * n // n_buckets
+        if end <= start:
+            continue
+        for r in range(n_arrays):
+            lo = start
+            hi = start
+            for j in range(start + 1, end):
+                if arrays[r, j] < arrays[r, lo]:
+                    lo = j
+                if arrays[r, j] > arrays[r, hi]:
+                    hi = j
+            keep[lo] = True
+            keep[hi] = True
+
+    return np.flatnonzero(keep)
+
+
+@lazy_njit(cache=True)
+def _density_counts(x, y, log_x, log_y, nx, ny):
+    """
+    2D histogram of the finite (x, y) points, optionally in log10 space.
+
+    Points with non-positive values on a log axis are skipped.
+
+    Returns
+    -------
+    tuple
+        counts of shape (ny, nx), and x_min, x_max, y_min, y_max of the binned values.
+    """
+    n = len(x)
+    x_min, x_max = np.inf, -np.inf
+    y_min, y_max = np.inf, -np.inf
+
+    # Range of the valid points
+    for i in range(n):
+        xv, yv = x[i], y[i]
+        if log_x:
+            xv = np.log10(xv) if xv > 0 else np.nan
+        if log_y:
+            yv = np.log10(yv) if yv > 0 else np.nan
+        if not (np.isfinite(xv) and np.isfinite(yv)):
+            continue
+        x_min, x_max = min(x_min, xv), max(x_max, xv)
+        y_min, y_max = min(y_min, yv), max(y_max, yv)
+
+    counts = np.zeros((ny, nx), dtype=np.int64)
+    if x_min > x_max:
+        return counts, x_min, x_max, y_min, y_max
+    x_scale = nx / (x_max - x_min) if x_max > x_min else 0.0
+    y_scale = ny / (y_max - y_min) if y_max > y_min else 0.0
+
+    for i in range(n):
+        xv, yv = x[i], y[i]
+        if log_x:
+            xv = np.log10(xv) if xv > 0 else np.nan
+        if log_y:
+            yv = np.log10(yv) if yv > 0 else np.nan
+        if not (np.isfinite(xv) and np.isfinite(yv)):
+            continue
+        ix = min(int((xv - x_min) * x_scale), nx - 1)
+        iy = min(int((yv - y_min) * y_scale), ny - 1)
+        counts[iy, ix] += 1
+
+    return counts, x_min, x_max, y_min, y_max
+
+
+# ---------- DOWNSAMPLING ----------
+
+@metrics.timed(rows=metrics.rows_of_first_arg)
+def downsample_indices(x, y, max_points=DEFAULT_MAX_POINTS, method='minmax', seed=0):
+    """
+    Selects at most about `max_points` of the (x, y) points to plot.
+
+    Parameters
+    ----------
+    x : array-like
+        The x values; for 'lttb' they must be ordered.
+    y : array-like
+        The y values.
+    max_points : int or None
+        The point budget. If None, or if there are fewer points, all points are kept.
+    method : {'minmax', 'lttb', 'random'}
+        - 'minmax': the extrema of both x and y within consecutive row buckets,
+          preserving the visual envelope of the data.
+        - 'lttb': Largest-Triangle-Three-Buckets, for time series.
+        - 'random': one random point per row bucket.
+    seed : int
+        Seed of the 'random' method.
+
+    Returns
+    -------
+    np.ndarray
+        Sorted positions of the points to keep.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if max_points is None or n <= max_points:
+        return np.arange(n)
+
+    if method == 'lttb':
+        return _lttb_indices(x, y, max(max_points, 3))
+    if method == 'minmax':
+        # Up to four points per bucket: the extrema of x and of y
+        n_buckets = max(max_points // 4, 1)
+        return _minmax_indices(np.vstack([x, y]), n_buckets)
+    if method == 'random':
+        edges = np.arange(max_points + 1) * n // max_points
+        rng = np.random.default_rng(seed)
+        return edges[:-1] + (rng.random(max_points) * np.diff(edges)).astype(np.int64)
+    raise ValueError(f"Unknown downsampling method '{method}'.")
+
+
+def scatter_trace(x, y, **kwargs):
+    """
+    Creates a scatter trace, using WebGL (`go.Scattergl`) when there are many points.
+    """
+    trace_type = go.Scattergl if len(x) > WEBGL_THRESHOLD else go.Scatter
+    return trace_type(x=x, y=y, **kwargs)
+
+
+@metrics.timed(rows=metrics.rows_of_first_arg)
+def density_grid(x, y, log_x=False, log_y=False, bins=(400, 300)):
+    """
+    Bins (x, y) points into a 2D histogram, with a payload independent of the number of points.
+
+    Parameters
+    ----------
+    x : array-like
+    y : array-like
+    log_x : bool, default False
+        If True, bin log10 of the x values, skipping non-positive ones.
+    log_y : bool, default False
+        If True, bin log10 of the y values, skipping non-positive ones.
+    bins : tuple[int, int]
+        Number of bins along x and y.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray, np.ndarray]
+        The bin centers along x and y, and the counts of shape (len(y centers), len(x centers)).
+    """
+    nx, ny = bins
+    counts, x_min, x_max, y_min, y_max = _density_counts(
+        np.asarray(x, dtype=float), np.asarray(y, dtype=float), log_x, log_y, nx, ny
+    )
+    if x_min > x_max:
+        return np.array([]), np.array([]), np.zeros((0, 0), dtype=np.int64)
+
+    x_edges = np.linspace(x_min, x_max if x_max > x_min else x_min + 1, nx + 1)
+    y_edges = np.linspace(y_min, y_max if y_max > y_min else y_min + 1, ny + 1)
+    return (x_edges[:-1] + x_edges[1:]) / 2, (y_edges[:-1] + y_edges[1:]) / 2, counts
+
+
+# ---------- MULTI-RESOLUTION PYRAMID ----------
+
+def _block_sums(values, factor):
+    """Sums of consecutive groups of `factor` values, the last group being zero-padded."""
+    pad = (-len(values)) % factor
+    return np.concatenate([values, np.zeros(pad)]).reshape(-1, factor).sum(axis=1)
+
+
+def build_pyramid(x, y, factor=4, min_blocks=256):
+    """
+    Precomputes the y extrema and the means of an x-sorted series at several decimation levels.
+
+    Level i groups the rows in blocks of factor**(i + 1) and stores the positions of
+    the minimum and maximum y of each block and the mean x and y of the block, each
+    level being computed from the previous one.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        Sorted, finite x values.
+    y : np.ndarray
+        Finite y values.
+    factor : int
+        Decimation factor between two levels.
+    min_blocks : int
+        No coarser level is built once a level has at most this many blocks.
+
+    Returns
+    -------
+    dict
+        'x', 'y' and 'levels', a list (fine to coarse) of dicts with 'block' (rows per block),
+        'argmin' and 'argmax' (row positions of the extrema of each block), and 'mean_x'
+        and 'mean_y' (means of each block).
+    """
+    levels = []
+    argmin = argmax = np.arange(len(y))
+    sum_x, sum_y, count = x, y, np.ones(len(y))
+    block = 1
+    while len(argmin) > min_blocks:
+        pad = (-len(argmin)) % factor
+        # Pad with the last position so that every group has `factor` members
+        groups_min = np.concatenate([argmin, np.repeat(argmin[-1:], pad)]).reshape(-1, factor)
+        groups_max = np.concatenate([argmax, np.repeat(argmax[-1:], pad)]).reshape(-1, factor)
+        rows = np.arange(len(groups_min))
+        argmin = groups_min[rows, np.argmin(y[groups_min], axis=1)]
+        argmax = groups_max[rows, np.argmax(y[groups_max], axis=1)]
+        sum_x, sum_y, count = _block_sums(sum_x, factor), _block_sums(sum_y, factor), _block_sums(count, factor)
+        block *= factor
+        levels.append({'block': block, 'argmin': argmin, 'argmax': argmax,
+                       'mean_x': sum_x / count, 'mean_y': sum_y / count})
+
+    return {'x': x, 'y': y, 'levels': levels}
+
+
+def _visible_rows(pyramid, x_range):
+    """First and past-the-end row positions within the x range."""
+    x = pyramid['x']
+    if x_range is None:
+        return 0, len(x)
+    return np.searchsorted(x, x_range[0], side='left'), np.searchsorted(x, x_range[1], side='right')
+
+
+def _pyramid_level(pyramid, start, stop, max_points):
+    """
+    The finest level whose blocks over rows [start, stop) fit the budget (two points
+    per block), the coarsest one if none does, or None when no aggregation is needed
+    or the pyramid has no level.
+    """
+    if max_points is None or stop - start <= max_points:
+        return None
+    levels = pyramid['levels']
+    for level in levels:
+        n_blocks = -(-stop // level['block']) - start // level['block']
+        if 2 * n_blocks <= max_points or level is levels[-1]:
+            return level
+    return None
+
+
+def query_pyramid(pyramid, x_range=None, max_points=DEFAULT_MAX_POINTS):
+    """
+    Selects the points to plot for a visible x range, at the finest resolution within the budget.
+
+    Parameters
+    ----------
+    pyramid : dict
+        As returned by `build_pyramid`.
+    x_range : tuple[float, float] or None
+        The visible x range. If None, the whole series.
+    max_points : int or None
+        The point budget. If None, all the points in range are returned.
+
+    Returns
+    -------
+    np.ndarray
+        Sorted positions of the points to plot.
+    """
+    start, stop = _visible_rows(pyramid, x_range)
+    if max_points is None or stop - start <= max_points:
+        return np.arange(start, stop)
+
+    level = _pyramid_level(pyramid, start, stop, max_points)
+    if level is None:
+        # The series has no level (too few rows), yet more rows than the budget
+        x, y = pyramid['x'], pyramid['y']
+        return start + downsample_indices(x[start:stop], y[start:stop], max_points, method='minmax')
+
+    block_start, block_stop = start // level['block'], -(-stop // level['block'])
+    positions = np.concatenate([level['argmin'][block_start:block_stop], level['argmax'][block_start:block_stop]])
+    positions = np.unique(positions)
+    return positions[(positions >= start) & (positions < stop)]
+
+
+def query_pyramid_means(pyramid, x_range=None, max_points=DEFAULT_MAX_POINTS):
+    """
+    The block means at the level `query_pyramid` selects for the same range and budget.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray] or None
+        Mean x and mean y of the blocks overlapping the range, or None when the
+        points are plotted without aggregation.
+    """
+    start, stop = _visible_rows(pyramid, x_range)
+    level = _pyramid_level(pyramid, start, stop, max_points)
+    if level is None:
+        return None
+    block_start, block_stop = start // level['block'], -(-stop // level['block'])
+    return level['mean_x'][block_start:block_stop], level['mean_y'][block_start:block_stop]
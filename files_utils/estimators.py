@@ -1,13 +1,20 @@
+import heapq
+import weakref
 import numpy as np
 import pandas as pd
-from numba import njit, prange
-from scipy.spatial import cKDTree
-from concurrent.futures import ProcessPoolExecutor
+from scipy.spatial import cKDTree, Delaunay, QhullError
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from files_utils import demarcators, metrics
+from files_utils.lazy import lazy_import, lazy_njit
+
+# numba is only imported once a kernel is first called
+numba = lazy_import("numba")
 
 
 # ---------- NUMBA FILTERING ----------
 
-@njit(parallel=True)
+@lazy_njit(parallel=True, cache=True)
 def _numba_mask_optimized(arrays, lower_bounds, upper_bounds):
     """
     Fast boolean mask computation using precomputed bounds.
@@ -29,7 +36,7 @@ def _numba_mask_optimized(arrays, lower_bounds, upper_bounds):
     n_features, n_samples = arrays.shape
     mask = np.ones(n_samples, dtype=np.bool_)
 
-    for j in prange(n_samples):
+    for j in numba.prange(n_samples):
         for i in range(n_features):
             val = arrays[i, j]
             if val < lower_bounds[i] or val > upper_bounds[i]:
@@ -38,9 +45,112 @@ def _numba_mask_optimized(arrays, lower_bounds, upper_bounds):
     return mask
 
 
+# ---------- RANGE INDEX ----------
+
+def build_range_index(df, features):
+    """
+    Builds a sorted index of the given columns of a DataFrame.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+    features : list[str]
+
+    Returns
+    -------
+    dict[str, tuple[np.ndarray, np.ndarray]]
+        For each feature, its non-NaN values sorted ascending and the row positions
+        of these values.
+    """
+    index = {}
+    for col in features:
+        values = df[col].to_numpy(dtype=float)
+        order = np.argsort(values, kind='stable')
+        sorted_values = values[order]
+        # NaNs are sorted last and can never fall within bounds
+        n_valid = len(values) - np.count_nonzero(np.isnan(values))
+        index[col] = (sorted_values[:n_valid], order[:n_valid])
+    return index
+
+
+# Range indexes are built once per system DataFrame and dropped with it
+_range_indexes = {}
+
+
+def get_range_index(df, features):
+    """
+    Returns the range index of a system for the given features, building missing ones on first use.
+    """
+    key = id(df)
+    index = _range_indexes.get(key)
+    if index is None:
+        index = {}
+        _range_indexes[key] = index
+        weakref.finalize(df, _range_indexes.pop, key, None)
+
+    missing = [col for col in features if col not in index]
+    if missing:
+        index.update(build_range_index(df, missing))
+    return {col: index[col] for col in features}
+
+
 # ---------- DATA FILTERING ----------
 
-def filter_dataframe(df, margins):
+def _margin_bounds(margins):
+    """Features of the margins with their lower and upper bounds."""
+    features = list(margins.keys())
+    centers = np.array([margins[col][0] for col in features], dtype=float)
+    errors = np.array([margins[col][1] for col in features], dtype=float)
+    return features, centers - errors, centers + errors
+
+
+def filter_positions(df, margins, range_index=None):
+    """
+    Finds the positions of the rows within per-feature center ± margin bounds.
+
+    With a range index, only the rows within the bounds of the most selective
+    feature are checked against the other bounds; otherwise all rows are scanned.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Input DataFrame.
+    margins : dict[str, tuple[float, float]]
+        Dictionary mapping column name to (center, margin).
+    range_index : dict or None
+        Range index of `df` covering the margins' features (see `get_range_index`).
+
+    Returns
+    -------
+    np.ndarray
+        Sorted row positions of the matching rows.
+    """
+    features, lowers, uppers = _margin_bounds(margins)
+
+    if range_index is None:
+        # Shape: (n_features, n_samples)
+        arr = np.asfortranarray([df[col].to_numpy() for col in features])
+        return np.flatnonzero(_numba_mask_optimized(arr, lowers, uppers))
+
+    # Narrowest candidate range among the features
+    ranges = []
+    for i, col in enumerate(features):
+        sorted_values, _ = range_index[col]
+        start = np.searchsorted(sorted_values, lowers[i], side='left')
+        stop = np.searchsorted(sorted_values, uppers[i], side='right')
+        ranges.append((stop - start, i, start, stop))
+    _, best, start, stop = min(ranges)
+
+    candidates = range_index[features[best]][1][start:stop]
+    others = [i for i in range(len(features)) if i != best]
+    if others and len(candidates):
+        arr = np.asfortranarray([df[features[i]].to_numpy(dtype=float)[candidates] for i in others])
+        candidates = candidates[_numba_mask_optimized(arr, lowers[others], uppers[others])]
+    return np.sort(candidates)
+
+
+@metrics.timed(rows=metrics.rows_of_first_arg)
+def filter_dataframe(df, margins, range_index=None):
     """
     Filters DataFrame rows using per-feature center ± margin bounds.
 
@@ -50,122 +160,371 @@ def filter_dataframe(df, margins):
         Input DataFrame.
     margins : dict[str, tuple[float, float]]
         Dictionary mapping column name to (center, margin).
+    range_index : dict or None
+        Range index of `df`, see `filter_positions`.
 
     Returns
     -------
     pd.DataFrame
         Filtered DataFrame.
     """
-    features = list(margins.keys())
-    centers = np.array([margins[col][0] for col in features], dtype=float)
-    errors = np.array([margins[col][1] for col in features], dtype=float)
-    lowers = centers - errors
-    uppers = centers + errors
-
-    # Shape: (n_features, n_samples)
-    arr = np.asfortranarray([df[col].to_numpy() for col in features])
-    mask = _numba_mask_optimized(arr, lowers, uppers)
-    return df.loc[mask].copy()
+    return df.iloc[filter_positions(df, margins, range_index)].copy()
 
 
 # ---------- SINGLE-DATAFRAME SEARCH ----------
 
-def search_dataframe(df, margins, center_vec, features):
+def candidate_points(df, margins, features, range_index=None):
     """
-    Search for closest matching row in a single DataFrame.
+    Finds the rows within the margins whose features are all finite.
 
     Parameters
     ----------
     df : pd.DataFrame
     margins : dict[str, tuple[float, float]]
-    center_vec : np.ndarray
     features : list[str]
+    range_index : dict or None
+        Range index of `df`, see `filter_positions`.
 
     Returns
     -------
-    dict or None
+    tuple[np.ndarray, np.ndarray]
+        Row positions of the candidates, and their feature values, shape (n_rows, n_features).
     """
-    filtered = filter_dataframe(df, margins)
-    if filtered.empty:
-        return None
-
-    points = filtered[features].to_numpy()
+    positions = filter_positions(df, margins, range_index)
+    points = np.column_stack([df[col].to_numpy(dtype=float)[positions] for col in features])
     mask = np.isfinite(points).all(axis=1)
+    return positions[mask], points[mask]
 
-    if not mask.any():
-        return None
 
-    points = points[mask]
-    filtered = filtered.iloc[mask]
+def nearest_points(points, center_vec, k=1, distance_upper_bound=np.inf):
+    """
+    Finds the k points closest to the center.
+
+    Only arrays go in and out, so that the query can run on a worker thread
+    while the next system is filtered.
 
+    Parameters
+    ----------
+    points : np.ndarray, shape (n_points, n_features)
+    center_vec : np.ndarray
+    k : int
+    distance_upper_bound : float
+        Points farther than this distance are ignored.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        Distances, sorted, and positions in `points` of the points found.
+    """
+    k = min(k, len(points))
+    if k == 0:
+        return np.empty(0), np.empty(0, dtype=int)
     if len(points) == 1:
-        dist = np.linalg.norm(center_vec - points[0])
-        idx = 0
+        dists = np.array([np.linalg.norm(center_vec - points[0])])
+        idxs = np.array([0])
     else:
         tree = cKDTree(points)
-        dist, idx = tree.query(center_vec)
+        dists, idxs = tree.query(center_vec, k=k, distance_upper_bound=distance_upper_bound)
+        dists, idxs = np.atleast_1d(dists), np.atleast_1d(idxs)
+
+    # Points beyond the upper bound are reported with an infinite distance
+    found = np.isfinite(dists) & (dists <= distance_upper_bound)
+    return dists[found], idxs[found]
+
 
-    orig_idx = filtered.index[idx]
+def search_dataframe(df, margins, center_vec, features, k=1, distance_upper_bound=np.inf, range_index=None):
+    """
+    Search for the k closest matching rows in a single DataFrame.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+    margins : dict[str, tuple[float, float]]
+    center_vec : np.ndarray
+    features : list[str]
+    k : int
+        Number of nearest rows to return.
+    distance_upper_bound : float
+        Rows farther than this distance are ignored.
+    range_index : dict or None
+        Range index of `df`, see `filter_positions`.
+
+    Returns
+    -------
+    dict or None
+        The best match ('row', 'dist', 'orig_idx') along with the distances
+        and indices of all k matches ('dists', 'orig_idxs'), sorted by distance.
+    """
+    positions, points = candidate_points(df, margins, features, range_index)
+    dists, idxs = nearest_points(points, center_vec, k, distance_upper_bound)
+    if not len(dists):
+        return None
+
+    orig_idxs = df.index[positions[idxs]]
     return {
-        'df': df,
-        'filtered': filtered,
-        'row': df.loc[orig_idx],
-        'dist': dist,
-        'orig_idx': orig_idx
+        'row': df.loc[orig_idxs[0]],
+        'dist': dists[0],
+        'orig_idx': orig_idxs[0],
+        'dists': dists,
+        'orig_idxs': orig_idxs
     }
 
 
+def _lower_bound_distance(range_index, features, center_vec, lowers, uppers):
+    """
+    Lower bound on the distance from the center to any row that passes the margins filter.
+
+    The bounding box of the system's features is clipped to the margins box; the distance
+    from the center to the clipped box bounds the distance to every candidate row.
+
+    Returns
+    -------
+    float
+        The lower bound, or np.inf if no row of the system can pass the filter.
+    """
+    sorted_columns = [range_index[col][0] for col in features]
+    if any(len(values) == 0 for values in sorted_columns):
+        return np.inf
+    lo = np.maximum([values[0] for values in sorted_columns], lowers)
+    hi = np.minimum([values[-1] for values in sorted_columns], uppers)
+    if (lo > hi).any():
+        return np.inf
+    return float(np.linalg.norm(center_vec - np.clip(center_vec, lo, hi)))
+
+
 # ---------- PARALLEL SEARCH ----------
 
+class _InlineExecutor:
+    """
+    Runs submitted calls immediately in the calling thread, for callers that already
+    parallelize at a higher level (e.g. one query per worker in a batch).
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+def _executor(max_workers):
+    """
+    A thread pool of `max_workers`, or an inline executor when max_workers is 1.
+
+    The rows are filtered in the calling thread, with its range indexes, and only the
+    nearest-point queries, which release the GIL, run on the pool: no DataFrame is
+    copied, and the parallel numba kernels are not run from the pool's threads.
+    """
+    return ThreadPoolExecutor(max_workers=max_workers) if max_workers > 1 else _InlineExecutor()
+
+
+@metrics.timed()
+def find_closest_matches(dfs, margins, k=1, max_workers=4):
+    """
+    Search all systems in parallel for the k best matches.
+
+    Systems are visited in order of their bounding-box lower bound, in waves of
+    `max_workers`. A bounded heap keeps the current k best rows, and systems whose
+    filtered bounding box cannot beat the current k-th distance are skipped.
+
+    Parameters
+    ----------
+    dfs : list[pd.DataFrame] or dict[str, pd.DataFrame]
+        The systems to search. For a dict the keys are used as system ids,
+        otherwise the position in the list.
+    margins : dict[str, tuple[float, float]]
+    k : int
+    max_workers : int
+        Number of threads running the nearest-point queries (see `_executor`);
+        1 searches in the calling thread.
+
+    Returns
+    -------
+    list[dict]
+        Up to k matches sorted by distance, each with keys 'system', 'dist',
+        'orig_idx', 'row' and 'df', the DataFrame of the system in `dfs`.
+    """
+    if k < 1:
+        raise ValueError("k must be a positive integer.")
+
+    features = list(margins.keys())
+    center_vec = np.array([margins[feat][0] for feat in features], dtype=float)
+    errors = np.array([margins[feat][1] for feat in features], dtype=float)
+    lowers, uppers = center_vec - errors, center_vec + errors
+
+    systems = dfs.items() if isinstance(dfs, dict) else enumerate(dfs)
+    candidates = []
+    for system_id, df in systems:
+        range_index = get_range_index(df, features)
+        bound = _lower_bound_distance(range_index, features, center_vec, lowers, uppers)
+        if np.isfinite(bound):
+            candidates.append((bound, system_id, df, range_index))
+    candidates.sort(key=lambda c: c[0])
+
+    # Max-heap of the k best rows: (-dist, tie breaker, match)
+    heap = []
+    counter = 0
+
+    def kth_distance():
+        return -heap[0][0] if len(heap) == k else np.inf
+
+    with _executor(max_workers) as executor:
+        for start in range(0, len(candidates), max_workers):
+            wave = [c for c in candidates[start:start + max_workers] if c[0] <= kth_distance()]
+            if not wave:
+                break
+
+            upper_bound = kth_distance()
+            futures = []
+            for _, system_id, df, range_index in wave:
+                positions, points = candidate_points(df, margins, features, range_index)
+                future = executor.submit(nearest_points, points, center_vec, k, upper_bound)
+                futures.append((system_id, df, positions, future))
+
+            for system_id, df, positions, future in futures:
+                dists, idxs = future.result()
+                for dist, orig_idx in zip(dists, df.index[positions[idxs]]):
+                    if dist >= kth_distance():
+                        break
+                    match = {'system': system_id, 'dist': float(dist), 'orig_idx': orig_idx, 'df': df}
+                    item = (-dist, counter, match)
+                    counter += 1
+                    if len(heap) < k:
+                        heapq.heappush(heap, item)
+                    else:
+                        heapq.heapreplace(heap, item)
+
+    matches = [item[2] for item in sorted(heap, key=lambda item: -item[0])]
+    for match in matches:
+        match['row'] = match['df'].loc[match['orig_idx']]
+    return matches
+
+
 def find_closest_match(dfs, margins, max_workers=4):
     """
     Search all systems in parallel for the best match.
 
     Parameters
     ----------
-    dfs : list[pd.DataFrame]
+    dfs : list[pd.DataFrame] or dict[str, pd.DataFrame]
     margins : dict[str, tuple[float, float]]
     max_workers : int
 
     Returns
     -------
     tuple[pd.DataFrame, pd.DataFrame, pd.Series]
+        The DataFrame of the best system, its rows within the margins and the closest row.
 
     Raises
     ------
     ValueError
         If no match is found.
     """
-    features = list(margins.keys())
-    center_vec = np.array([margins[feat][0] for feat in features], dtype=float)
-
-    results = []
-    with ProcessPoolExecutor(max_workers=max_workers) as executor:
-        futures = [
-            executor.submit(search_dataframe, df, margins, center_vec, features)
-            for df in dfs
-        ]
-        for future in futures:
-            res = future.result()
-            if res is not None:
-                results.append(res)
-
-    if not results:
+    matches = find_closest_matches(dfs, margins, k=1, max_workers=max_workers)
+    if not matches:
         raise ValueError("No match found across any system.")
 
-    best = min(results, key=lambda r: r['dist'])
-    return best['df'], best['filtered'], best['row']
+    best = matches[0]
+    filtered = filter_dataframe(best['df'], margins, get_range_index(best['df'], list(margins)))
+    return best['df'], filtered, best['row']
 
 
 # ---------- NOVA ESTIMATION ----------
 
+# Eruption tables are computed once per system DataFrame and dropped with it
+_eruption_tables = {}
+
+
+def get_eruption_times(df):
+    """
+    Returns the per-cycle eruption table of a system, computing it on first use.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+
+    Returns
+    -------
+    pd.DataFrame
+        See `demarcators.demarcate_eruption_times`.
+    """
+    key = id(df)
+    table = _eruption_tables.get(key)
+    if table is None:
+        table = demarcators.demarcate_eruption_times(df)
+        _eruption_tables[key] = table
+        weakref.finalize(df, _eruption_tables.pop, key, None)
+    return table
+
+
+def _times_since_eruption(df, orig_idxs):
+    """
+    Time elapsed between the start of the eruption preceding each given row and the row.
+
+    Returns
+    -------
+    np.ndarray
+        Elapsed times, NaN for rows that are not preceded by an eruption.
+    """
+    table = get_eruption_times(df)
+    orig_idxs = np.asarray(orig_idxs)
+    pos = np.searchsorted(table["first_idx"].to_numpy(), orig_idxs, side="right") - 1
+
+    row_times = df["time"].to_numpy(dtype=float)[df.index.get_indexer(orig_idxs)]
+    start_times = table["start_time"].to_numpy(dtype=float)
+    return np.where(pos >= 0, row_times - start_times[np.maximum(pos, 0)], np.nan)
+
+
+def _time_since_eruption(df, orig_idx):
+    """
+    Time elapsed between the start of the eruption preceding the given row and the row, or -1.
+    """
+    time = _times_since_eruption(df, [orig_idx])[0]
+    return -1 if np.isnan(time) else time
+
+
+@metrics.timed()
+def estimate_nova_times(dfs, margins, k=1, max_workers=4):
+    """
+    Estimate time since start of nova eruption cycle from each of the k best matches.
+
+    Parameters
+    ----------
+    dfs : list[pd.DataFrame] or dict[str, pd.DataFrame]
+    margins : dict[str, tuple[float, float]]
+    k : int
+    max_workers : int
+
+    Returns
+    -------
+    list[dict]
+        Dicts with keys 'system', 'dist' and 'time', sorted by distance. Matches that
+        are not preceded by an eruption are left out; empty if no match is found.
+    """
+    estimates = []
+    for match in find_closest_matches(dfs, margins, k=k, max_workers=max_workers):
+        time = _time_since_eruption(dfs[match['system']], match['orig_idx'])
+        if time != -1:
+            estimates.append({'system': match['system'], 'dist': match['dist'], 'time': time})
+    return estimates
+
+
+@metrics.timed()
 def estimate_nova_time(dfs, margins, max_workers=4):
     """
     Estimate time since start of nova eruption cycle.
 
     Parameters
     ----------
-    dfs : list[pd.DataFrame]
+    dfs : list[pd.DataFrame] or dict[str, pd.DataFrame]
     margins : dict[str, tuple[float, float]]
     max_workers : int
 
@@ -174,18 +533,336 @@ def estimate_nova_time(dfs, margins, max_workers=4):
     float
         Time since eruption start. Returns -1 if no match is found.
     """
+    estimates = estimate_nova_times(dfs, margins, k=1, max_workers=max_workers)
+    return estimates[0]['time'] if estimates else -1
+
+
+# ---------- MONTE-CARLO ESTIMATION ----------
+
+def nearest_points_batch(points, samples):
+    """
+    Finds the point closest to each sample.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        Distance and position in `points` of the closest point for each sample.
+    """
+    return cKDTree(points).query(samples)
+
+
+def search_dataframe_batch(df, margins, samples, features, range_index=None):
+    """
+    Find the closest matching row in a single DataFrame for each of many observations.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+    margins : dict[str, tuple[float, float]]
+    samples : np.ndarray, shape (n_samples, n_features)
+        Observations, all within the margins.
+    features : list[str]
+    range_index : dict or None
+        Range index of `df`, see `filter_positions`.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray] or None
+        Distance and row index of the closest row for each sample.
+    """
+    positions, points = candidate_points(df, margins, features, range_index)
+    if not len(points):
+        return None
+
+    dists, idxs = nearest_points_batch(points, samples)
+    return dists, df.index.to_numpy()[positions[idxs]]
+
+
+@metrics.timed()
+def estimate_nova_time_distribution(dfs, margins, n_samples=1000, percentiles=(5, 25, 75, 95), seed=None, max_workers=4):
+    """
+    Propagate the observation tolerances to the time since the nova eruption.
+
+    Draws `n_samples` observations uniformly from the (value ± delta) ranges and matches
+    all of them in one batch per system, then estimates the time since eruption for each.
+
+    Parameters
+    ----------
+    dfs : list[pd.DataFrame] or dict[str, pd.DataFrame]
+    margins : dict[str, tuple[float, float]]
+    n_samples : int
+    percentiles : tuple[float]
+        Percentiles of the time distribution to report.
+    seed : int or None
+        Seed of the random generator, for reproducible estimates.
+    max_workers : int
+
+    Returns
+    -------
+    dict or None
+        'median', 'percentiles' (dict mapping percentile to time), 'times' (the estimate
+        of every matched sample), 'n_samples' and 'n_matched'. None if no sample matches.
+    """
+    features = list(margins.keys())
+    centers = np.array([margins[feat][0] for feat in features], dtype=float)
+    errors = np.array([margins[feat][1] for feat in features], dtype=float)
+    lowers, uppers = centers - errors, centers + errors
+
+    rng = np.random.default_rng(seed)
+    samples = rng.uniform(lowers, uppers, size=(n_samples, len(features)))
+
+    systems = dfs.items() if isinstance(dfs, dict) else enumerate(dfs)
+    candidates = []
+    for _, df in systems:
+        range_index = get_range_index(df, features)
+        if np.isfinite(_lower_bound_distance(range_index, features, centers, lowers, uppers)):
+            candidates.append((df, range_index))
+
+    results = []
+    with _executor(max_workers) as executor:
+        futures = []
+        for df, range_index in candidates:
+            positions, points = candidate_points(df, margins, features, range_index)
+            if len(points):
+                futures.append((df, positions, executor.submit(nearest_points_batch, points, samples)))
+
+        for df, positions, future in futures:
+            dists, idxs = future.result()
+            results.append((df, dists, df.index.to_numpy()[positions[idxs]]))
+
+    if not results:
+        return None
+
+    # Closest system for each sample
+    all_dists = np.vstack([dists for _, dists, _ in results])
+    best_system = np.argmin(all_dists, axis=0)
+
+    times = np.full(n_samples, np.nan)
+    for j, (df, _, orig_idxs) in enumerate(results):
+        selected = best_system == j
+        if selected.any():
+            times[selected] = _times_since_eruption(df, orig_idxs[selected])
+
+    times = times[np.isfinite(times)]
+    if times.size == 0:
+        return None
+
+    return {
+        'median': float(np.median(times)),
+        'percentiles': dict(zip(percentiles, np.percentile(times, percentiles).tolist())),
+        'times': times,
+        'n_samples': n_samples,
+        'n_matched': int(times.size)
+    }
+
+
+# ---------- SURROGATE MODEL ----------
+
+def _system_decay_curve(df, log_time_grid):
+    """
+    Mean effective temperature of a system over bins of log10(time since eruption start).
+
+    Returns
+    -------
+    np.ndarray or None
+        The curve on `log_time_grid`, with empty bins interpolated, or None if the
+        system has no row after an eruption.
+    """
+    times = _times_since_eruption(df, df.index)
+    temps = df["effective temperature"].to_numpy(dtype=float)
+    valid = np.isfinite(times) & (times > 0) & np.isfinite(temps)
+    if not valid.any():
+        return None
+
+    log_times = np.log10(times[valid])
+    bins = np.clip(np.searchsorted(log_time_grid, log_times), 0, len(log_time_grid) - 1)
+    counts = np.bincount(bins, minlength=len(log_time_grid))
+    sums = np.bincount(bins, weights=temps[valid], minlength=len(log_time_grid))
+
+    filled = counts > 0
+    return np.interp(log_time_grid, log_time_grid[filled], sums[filled] / counts[filled])
+
+
+def _longest_eruption_span(df):
+    """
+    Longest time elapsed since the start of an eruption in a system: the longest interval
+    between two eruption starts, or from the last one to the end of the simulation.
+    0 if the system has no eruption.
+    """
+    start_times = get_eruption_times(df)["start_time"].to_numpy(dtype=float)
+    if not len(start_times):
+        return 0
+    return float(np.max(np.diff(np.append(start_times, df["time"].max()))))
+
+
+@metrics.timed()
+def build_surrogate(dfs, n_bins=200):
+    """
+    Precompute an interpolating surrogate of the simulations over
+    (MWD, companion mass, time since eruption) -> effective temperature, cycle length.
+
+    Each system contributes its mean decay curve on a shared log10(time) grid, which
+    spans up to the longest time since an eruption, and its median cycle length; queries are interpolated between the systems of the mass grid
+    with barycentric weights of a Delaunay triangulation.
+
+    Parameters
+    ----------
+    dfs : list[pd.DataFrame] or dict[str, pd.DataFrame]
+        Estimation DataFrames, with 'cycle', 'time', 'accumulated mass',
+        'effective temperature', 'MWD' and 'MRD' columns.
+    n_bins : int
+        Number of log10(time) bins of the decay curves.
+
+    Returns
+    -------
+    dict
+        The surrogate, to be evaluated with `evaluate_surrogate`.
+
+    Raises
+    ------
+    ValueError
+        If no system has a usable decay phase.
+    """
+    frames = list(dfs.values()) if isinstance(dfs, dict) else list(dfs)
+
+    max_span = max((_longest_eruption_span(df) for df in frames), default=0)
+    if not max_span > 0:
+        raise ValueError("No system with an eruption to build the surrogate from.")
+    log_time_grid = np.linspace(-3, np.log10(max_span), n_bins)
+
+    points, curves, cycle_lengths = [], [], []
+    for df in frames:
+        curve = _system_decay_curve(df, log_time_grid)
+        if curve is None:
+            continue
+        grp = df.groupby("cycle")["time"]
+        points.append([df["MWD"].median(), df["MRD"].median()])
+        curves.append(curve)
+        cycle_lengths.append((grp.max() - grp.min()).median())
+
+    if not points:
+        raise ValueError("No system with an eruption to build the surrogate from.")
+
+    points = np.array(points, dtype=float)
     try:
-        df, _, row = find_closest_match(dfs, margins, max_workers)
-    except ValueError:
-        return -1
+        triangulation = Delaunay(points)
+    except (QhullError, ValueError):
+        # Fewer than three systems, or all on one line
+        triangulation = None
+
+    return {
+        'points': points,
+        'triangulation': triangulation,
+        'log_time_grid': log_time_grid,
+        'temperature': np.array(curves),
+        'cycle_length': np.array(cycle_lengths, dtype=float),
+    }
+
+
+def _surrogate_weights(surrogate, mwd, mrd):
+    """
+    Interpolation weights of the systems for the given masses.
+
+    Barycentric weights of the enclosing triangle, or inverse distance weights when
+    there is no triangulation. None if the masses are outside the simulated grid.
+    """
+    query = np.array([mwd, mrd], dtype=float)
+    points = surrogate['points']
+    triangulation = surrogate['triangulation']
+
+    if triangulation is None:
+        dists = np.linalg.norm(points - query, axis=1)
+        if (dists == 0).any():
+            return np.where(dists == 0, 1.0, 0.0) / (dists == 0).sum()
+        weights = 1 / dists
+        return weights / weights.sum()
+
+    simplex = int(triangulation.find_simplex(query))
+    if simplex < 0:
+        return None
+    transform = triangulation.transform[simplex]
+    bary = transform[:2].dot(query - transform[2])
+    weights = np.zeros(len(points))
+    weights[triangulation.simplices[simplex]] = np.append(bary, 1 - bary.sum())
+    return weights
+
+
+def evaluate_surrogate(surrogate, mwd, mrd, time_since_eruption):
+    """
+    Evaluate the surrogate model at the given masses and times since eruption.
+
+    Parameters
+    ----------
+    surrogate : dict
+        As returned by `build_surrogate`.
+    mwd : float
+    mrd : float
+    time_since_eruption : float or np.ndarray
+        Time since the start of the eruption, in years.
 
-    time = row["time"]
+    Returns
+    -------
+    dict or None
+        'effective temperature' (float or np.ndarray) and 'cycle length'.
+        None if the masses are outside the simulated grid.
+    """
+    weights = _surrogate_weights(surrogate, mwd, mrd)
+    if weights is None:
+        return None
 
-    mask_ejection = df["accumulated mass"] < 0
-    if not mask_ejection.any():
-        return -1
+    curve = weights @ surrogate['temperature']
+    log_time = np.log10(np.maximum(time_since_eruption, 1e-10))
+    return {
+        'effective temperature': np.interp(log_time, surrogate['log_time_grid'], curve),
+        'cycle length': float(weights @ surrogate['cycle_length']),
+    }
 
-    eruption_idx = df.loc[mask_ejection].index[0]
-    eruption_time = df.loc[eruption_idx, "time"]
 
-    return time - eruption_time
+def estimate_missing_with_surrogate(surrogate, known, missing, n_candidates=400):
+    """
+    Estimate a missing parameter from three known ones with the surrogate model.
+
+    The missing parameter is searched over a grid of candidate values for the one whose
+    surrogate effective temperature is closest to the known (or, when the temperature
+    is missing, evaluated directly).
+
+    Parameters
+    ----------
+    surrogate : dict
+        As returned by `build_surrogate`.
+    known : dict[str, float]
+        Values of three of 'MWD', 'MRD', 'time' (since eruption) and 'effective temperature'.
+    missing : str
+        The parameter to estimate.
+    n_candidates : int
+        Number of candidate values searched for a missing mass or time.
+
+    Returns
+    -------
+    float or None
+        The estimate, or None if the inputs are outside the simulated grid.
+    """
+    if missing == "effective temperature":
+        result = evaluate_surrogate(surrogate, known["MWD"], known["MRD"], known["time"])
+        return None if result is None else float(result['effective temperature'])
+
+    if missing == "time":
+        times = 10 ** surrogate['log_time_grid']
+        result = evaluate_surrogate(surrogate, known["MWD"], known["MRD"], times)
+        if result is None:
+            return None
+        curve = result['effective temperature']
+        return float(times[np.argmin(np.abs(curve - known["effective temperature"]))])
+
+    axis = 0 if missing == "MWD" else 1
+    low, high = surrogate['points'][:, axis].min(), surrogate['points'][:, axis].max()
+    best, best_err = None, np.inf
+    for candidate in np.linspace(low, high, n_candidates):
+        masses = {"MWD": known.get("MWD"), "MRD": known.get("MRD"), missing: candidate}
+        result = evaluate_surrogate(surrogate, masses["MWD"], masses["MRD"], known["time"])
+        if result is None:
+            continue
+        err = abs(float(result['effective temperature']) - known["effective temperature"])
+        if err < best_err:
+            best, best_err = float(candidate), err
+    return best
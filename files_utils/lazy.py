@@ -0,0 +1,66 @@
+import functools
+import importlib
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    """
+    Imports a module on first attribute access instead of now.
+
+    Parameters
+    ----------
+    name : str
+        The full module name, e.g. 'files_utils.estimators'.
+
+    Returns
+    -------
+    module
+        The module, already imported or to be executed when first used.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+
+    # Let `from package import module` find it like a regular import would
+    parent, _, child = name.rpartition('.')
+    if parent:
+        setattr(importlib.import_module(parent), child, module)
+    return module
+
+
+def lazy_njit(**options):
+    """
+    Like `numba.njit(**options)`, but numba is only imported, and the function compiled,
+    on the first call. Decorated functions can't be called from other numba functions.
+
+    Parameters
+    ----------
+    **options
+        Options of `numba.njit`, e.g. cache=True.
+
+    Returns
+    -------
+    callable
+        The decorator.
+    """
+    def decorator(func):
+        compiled = None
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            nonlocal compiled
+            if compiled is None:
+                from numba import njit
+                compiled = njit(**options)(func)
+            return compiled(*args)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,134 @@
+import re
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+
+# Largest relative error of a float column stored as float32
+FLOAT32_RTOL = 1e-6
+
+
+def _status_bytes(field):
+    """A memory field of /proc/self/status (e.g. 'VmRSS'), in bytes."""
+    with open("/proc/self/status") as f:
+        return int(re.search(rf"^{field}:\s+(\d+) kB", f.read(), re.MULTILINE).group(1)) * 1024
+
+
+@contextmanager
+def peak_memory():
+    """
+    Context manager measuring how much the resident memory of the process grew, at
+    its peak, within its block.
+
+    Yields a dict whose 'peak_bytes' is set on exit. The measure resets the peak
+    resident memory of the process (Linux only); elsewhere 'peak_bytes' stays None.
+    Unlike tracemalloc it costs nothing while the block runs, and it includes the
+    buffers of the CSV parser, but also the allocations of other threads.
+    """
+    result = {'peak_bytes': None}
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        start = _status_bytes("VmRSS")
+    except (OSError, AttributeError):
+        start = None
+    try:
+        yield result
+    finally:
+        if start is not None:
+            result['peak_bytes'] = max(_status_bytes("VmHWM") - start, 0)
+
+
+def memory_report(df, load_peak_bytes=None):
+    """
+    Memory used by a DataFrame, per column.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        The input DataFrame.
+    load_peak_bytes : int or None
+        Peak memory allocated while loading it, if measured.
+
+    Returns
+    -------
+    dict
+        A dictionary containing:
+            - 'columns': {column: {'dtype': str, 'bytes': int}}, largest first.
+            - 'index_bytes': Bytes of the index.
+            - 'total_bytes': Bytes of the columns and the index.
+            - 'load_peak_bytes': `load_peak_bytes`.
+    """
+    usage = df.memory_usage(index=True, deep=True)
+    columns = {
+        col: {'dtype': str(df[col].dtype), 'bytes': int(usage[col])}
+        for col in usage.drop('Index').sort_values(ascending=False).index
+    }
+    return {
+        'columns': columns,
+        'index_bytes': int(usage['Index']),
+        'total_bytes': int(usage.sum()),
+        'load_peak_bytes': load_peak_bytes,
+    }
+
+
+def _float32_preserves(values, rtol):
+    """Whether storing `values` as float32 keeps them within `rtol` and keeps distinct values distinct."""
+    compact = values.astype(np.float32)
+    finite = np.isfinite(values)
+    if not np.array_equal(np.isfinite(compact), finite):
+        return False
+    values, compact = values[finite], compact[finite]
+    if np.any(np.abs(compact - values) > rtol * np.abs(values)):
+        return False
+    # e.g. a cumulative time with small steps, whose steps float32 would erase
+    return len(np.unique(compact)) == len(np.unique(values))
+
+
+def compact_frame(df, float32=True, rtol=FLOAT32_RTOL):
+    """
+    Returns a copy of a DataFrame with smaller dtypes.
+
+    Numeric object columns are converted, integer columns and float columns holding
+    only integers are downcast to the smallest integer type, and other float columns
+    are stored as float32 where the precision check passes.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        The input DataFrame.
+    float32 : bool
+        Whether to store float columns as float32 when the check passes.
+    rtol : float
+        Largest relative error allowed by the float32 check.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The compact DataFrame, with the same columns, index and attrs.
+    """
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if series.dtype == object:
+            try:
+                series = pd.to_numeric(series)
+            except (ValueError, TypeError):
+                columns[col] = series
+                continue
+
+        if pd.api.types.is_integer_dtype(series.dtype):
+            series = pd.to_numeric(series, downcast='integer')
+        elif pd.api.types.is_float_dtype(series.dtype) and series.dtype != np.float32:
+            values = series.to_numpy()
+            if (np.isfinite(values).all() and np.array_equal(values, np.round(values))
+                    and np.abs(values).max(initial=0) < 2 ** 53):
+                series = pd.to_numeric(series.astype(np.int64), downcast='integer')
+            elif float32 and _float32_preserves(values, rtol):
+                series = series.astype(np.float32)
+        columns[col] = series
+
+    compact = pd.DataFrame(columns, index=df.index)
+    compact.attrs = dict(df.attrs)
+    return compact
@@ -0,0 +1,215 @@
+import functools
+import json
+import logging
+import os
+import time
+from threading import Lock
+
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Log every timed call as a JSON line when set
+LOG_CALLS = os.environ.get("BINARY_SYSTEMS_METRICS_LOG", "") not in ("", "0")
+
+logger = logging.getLogger("binary_systems.metrics")
+
+# Per-function statistics of this process: name -> dict
+_registry = {}
+_lock = Lock()
+
+# Exception types that end a call normally rather than failing it, see `normal_exits`
+_normal_exits = ()
+
+
+def _new_stats():
+    return {'count': 0, 'errors': 0, 'seconds': 0.0, 'buckets': [0] * len(LATENCY_BUCKETS), 'rows': 0, 'bytes': 0}
+
+
+def record(name, seconds, rows=0, n_bytes=0, error=False):
+    """
+    Add one call of `name` to the statistics of this process.
+
+    Parameters
+    ----------
+    name : str
+        The function name, e.g. 'read_l.read_l_file'.
+    seconds : float
+        Duration of the call.
+    rows : int
+        Rows processed by the call.
+    n_bytes : int
+        Bytes read by the call.
+    error : bool
+        Whether the call raised.
+    """
+    with _lock:
+        stats = _registry.get(name)
+        if stats is None:
+            stats = _registry[name] = _new_stats()
+        stats['count'] += 1
+        stats['errors'] += int(error)
+        stats['seconds'] += seconds
+        stats['rows'] += rows
+        stats['bytes'] += n_bytes
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                stats['buckets'][i] += 1
+                break
+
+    if LOG_CALLS:
+        logger.info(json.dumps({'event': 'call', 'function': name, 'duration_s': round(seconds, 6),
+                                'rows': rows, 'bytes': n_bytes, 'error': error, 'pid': os.getpid()}))
+
+
+def normal_exits(*exception_types):
+    """
+    Do not count calls ending with the given exception types as errors, e.g. Dash's
+    PreventUpdate, which a callback raises to leave its outputs unchanged.
+    """
+    global _normal_exits
+    _normal_exits += exception_types
+
+
+def timed(name=None, rows=None, bytes_read=None):
+    """
+    Decorator recording the latency, calls, errors, rows and bytes of a function.
+
+    Parameters
+    ----------
+    name : str or None
+        Name of the metric; defaults to '<module>.<function>'.
+    rows : callable or None
+        rows(result, *args, **kwargs) returns the number of rows processed by a call.
+    bytes_read : callable or None
+        bytes_read(*args, **kwargs) returns the number of bytes read by a call.
+
+    Returns
+    -------
+    callable
+        The decorator.
+    """
+    def decorator(func):
+        metric_name = name or f"{func.__module__.rpartition('.')[2]}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            error = True
+            result = None
+            try:
+                result = func(*args, **kwargs)
+                error = False
+                return result
+            except _normal_exits:
+                error = False
+                raise
+            finally:
+                seconds = time.perf_counter() - start
+                n_rows = n_bytes = 0
+                try:
+                    if rows is not None and not error:
+                        n_rows = int(rows(result, *args, **kwargs))
+                    if bytes_read is not None:
+                        n_bytes = int(bytes_read(*args, **kwargs))
+                except Exception:
+                    pass
+                record(metric_name, seconds, n_rows, n_bytes, error)
+
+        return wrapper
+
+    return decorator
+
+
+def rows_of_result(result, *args, **kwargs):
+    """`rows` helper for functions returning a DataFrame or an array."""
+    return len(result)
+
+
+def rows_of_first_arg(result, *args, **kwargs):
+    """`rows` helper for functions processing the DataFrame or array passed first."""
+    return len(args[0])
+
+
+def size_of_file_arg(file_name, *args, **kwargs):
+    """`bytes_read` helper for functions reading the file passed first."""
+    return os.path.getsize(file_name)
+
+
+def snapshot(reset=False):
+    """
+    Returns a copy of the statistics of this process, optionally clearing them.
+    """
+    with _lock:
+        stats = {name: dict(s, buckets=list(s['buckets'])) for name, s in _registry.items()}
+        if reset:
+            _registry.clear()
+    return stats
+
+
+def merge(*snapshots):
+    """Sums statistics snapshots, e.g. from several processes."""
+    total = {}
+    for snap in snapshots:
+        for name, stats in (snap or {}).items():
+            acc = total.setdefault(name, _new_stats())
+            for key in ('count', 'errors', 'seconds', 'rows', 'bytes'):
+                acc[key] += stats[key]
+            acc['buckets'] = [a + b for a, b in zip(acc['buckets'], stats['buckets'])]
+    return total
+
+
+def render_prometheus(stats, prefix="binary_systems"):
+    """
+    Formats statistics in the Prometheus text exposition format.
+
+    Parameters
+    ----------
+    stats : dict
+        A snapshot, see `snapshot` and `merge`.
+    prefix : str
+        Prefix of the metric names.
+
+    Returns
+    -------
+    str
+        The metrics text.
+    """
+    lines = [
+        f"# HELP {prefix}_call_duration_seconds Duration of instrumented calls.",
+        f"# TYPE {prefix}_call_duration_seconds histogram",
+    ]
+    for name, s in sorted(stats.items()):
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, s['buckets']):
+            cumulative += count
+            lines.append(f'{prefix}_call_duration_seconds_bucket{{function="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'{prefix}_call_duration_seconds_bucket{{function="{name}",le="+Inf"}} {s["count"]}')
+        lines.append(f'{prefix}_call_duration_seconds_sum{{function="{name}"}} {s["seconds"]}')
+        lines.append(f'{prefix}_call_duration_seconds_count{{function="{name}"}} {s["count"]}')
+
+    for metric, key, help_text in (
+        ("call_errors_total", "errors", "Instrumented calls that raised."),
+        ("rows_processed_total", "rows", "Rows processed by instrumented calls."),
+        ("bytes_read_total", "bytes", "Bytes read by instrumented calls."),
+    ):
+        lines.append(f"# HELP {prefix}_{metric} {help_text}")
+        lines.append(f"# TYPE {prefix}_{metric} counter")
+        for name, s in sorted(stats.items()):
+            lines.append(f'{prefix}_{metric}{{function="{name}"}} {s[key]}')
+    return "\n".join(lines) + "\n"
+
+
+def enable_json_logging(level=logging.INFO):
+    """Log every timed call as a JSON line on stderr."""
+    global LOG_CALLS
+    LOG_CALLS = True
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+    logger.setLevel(level)
+
+
+if LOG_CALLS:
+    enable_json_logging()
@@ -1,7 +1,18 @@
 import pandas as pd
 
+from files_utils import metrics
 
-def read_l_file(file_name):
+
+COLUMN_NAMES = [
+    "cycle", "layers", "convection variable 1", "convection variable 2",
+    "convection variable 3", "convection variable 4", "time", "effective temperature",
+    "mv luminosity", "volumetric luminosity", "nuclear luminosity", "neutrino luminosity",
+    "maximal temperature", "accumulated mass", "ejecta velocity", "time dt"
+]
+
+
+@metrics.timed(rows=metrics.rows_of_result, bytes_read=metrics.size_of_file_arg)
+def read_l_file(file_name, columns=None):
     """
     Reads a tabular data file and returns a DataFrame.
 
@@ -9,6 +20,8 @@ def read_l_file(file_name):
     ----------
     file_name : str
         The path to the data file.
+    columns : list of str, optional
+        Names of the columns to read. If None, all columns are read.
 
     Returns
     -------
@@ -17,24 +30,27 @@ def read_l_file(file_name):
         'cycle', 'layers', 'convection variable 1', 'convection variable 2',
         'convection variable 3', 'convection variable 4', 'time', 'effective temperature',
         'mv luminosity', 'volumetric luminosity', 'nuclear luminosity', 'neutrino luminosity',
-        'maximal temperature', 'accumulated mass', 'ejecta velocity', 'time dt'.
+        'maximal temperature', 'accumulated mass', 'ejecta velocity', 'time dt',
+        or only the requested ones.
     """
+    if columns is not None:
+        column_names = [col for col in COLUMN_NAMES if col in columns]
+        # The first column of the file holds row numbers
+        usecols = [COLUMN_NAMES.index(col) + 1 for col in column_names]
+        df = pd.read_csv(file_name, sep=r"\s+", header=None, usecols=usecols, low_memory=False)
+        df = df.apply(pd.to_numeric, errors='coerce')
+        df.columns = column_names
+        return df
+
     df = pd.read_csv(file_name, sep=r"\s+", header=None, low_memory=False)
     df = df.apply(pd.to_numeric, errors='coerce')
     df = df.iloc[:, 1:]  # Skip the first column (row numbers)
 
-    column_names = [
-        "cycle", "layers", "convection variable 1", "convection variable 2",
-        "convection variable 3", "convection variable 4", "time", "effective temperature",
-        "mv luminosity", "volumetric luminosity", "nuclear luminosity", "neutrino luminosity",
-        "maximal temperature", "accumulated mass", "ejecta velocity", "time dt"
-    ]
-
-    df.columns = column_names
+    df.columns = COLUMN_NAMES
     return df
 
 
-def concatenate_files(file_list):
+def concatenate_files(file_list, columns=None):
     """
     Concatenates multiple data files into a single DataFrame.
 
@@ -42,6 +58,8 @@ def concatenate_files(file_list):
     ----------
     file_list : list of str
         A list of paths to the data files.
+    columns : list of str, optional
+        Names of the columns to read, 'cycle' and 'time' are always included.
 
     Returns
     -------
@@ -52,8 +70,11 @@ def concatenate_files(file_list):
     cycle_offset = 0
     time_offset = 0.0
 
+    if columns is not None:
+        columns = ["cycle", "time"] + [col for col in columns if col not in ("cycle", "time")]
+
     for file_name in file_list:
-        df = read_l_file(file_name)
+        df = read_l_file(file_name, columns)
         if cycle_offset or time_offset:
             df["cycle"] += cycle_offset
             df["time"] += time_offset
@@ -1,7 +1,19 @@
 import pandas as pd
 
+from files_utils import metrics
 
-def read_mat_file(file_name):
+
+BASE_COLUMNS = [
+    "cycle", "Macc", "Menv", "Mej", "Yenv", "Yej", "Zenv", "Zej",
+    "Tmax", "Tc", "RHOc", "time", "t3", "t-ML", "C12", "C13",
+    "N14", "N15", "O16", "O17", "O18", "Ne", "Na", "Mg",
+    "Al26", "Al27", "Si", "P", "Vej_avg", "Mdot_ej",
+    "MWD", "Iacc", "Iej", "Press"
+]
+
+
+@metrics.timed(rows=metrics.rows_of_result, bytes_read=metrics.size_of_file_arg)
+def read_mat_file(file_name, columns=None):
     """
     Reads a tabular data file and returns a DataFrame.
 
@@ -9,6 +21,9 @@ def read_mat_file(file_name):
     ----------
     file_name : str
         The path to the data file.
+    columns : list of str, optional
+        Names of the columns to read. If None, all columns are read.
+        Requested columns that the file does not have are skipped.
 
     Returns
     -------
@@ -18,31 +33,37 @@ def read_mat_file(file_name):
         'Tmax', 'Tc', 'RHOc', 'time', 't3', 't-ML', 'C12', 'C13',
         'N14', 'N15', 'O16', 'O17', 'O18', 'Ne', 'Na', 'Mg',
         'Al26', 'Al27', 'Si', 'P', 'Vej_avg', 'Mdot_ej',
-        'MWD', 'Iacc', 'Iej', 'Press', and optionally 'companion_mass'
+        'MWD', 'Iacc', 'Iej', 'Press', and optionally 'companion_mass',
+        or only the requested ones.
     """
+    if columns is not None:
+        # The number of fields of the header row tells whether there is a companion_mass column
+        with open(file_name, 'r') as f:
+            n_fields = len(f.readline().split())
+        all_columns = BASE_COLUMNS + ["companion_mass"] if n_fields == len(BASE_COLUMNS) + 1 else BASE_COLUMNS
+        column_names = [col for col in all_columns if col in columns]
+        usecols = [all_columns.index(col) for col in column_names]
+        df = pd.read_csv(file_name, sep=r"\s+", header=None, skiprows=1, usecols=usecols, low_memory=False)
+        df = df.apply(pd.to_numeric, errors='coerce')
+        df.index += 1  # Keep the row labels of a full read, which skips the first row
+        df.columns = column_names
+        return df
+
     df = pd.read_csv(file_name, sep=r"\s+", header=None, low_memory=False)
     df = df.apply(pd.to_numeric, errors='coerce')
     df = df.iloc[1:, ]  # Skip the first row
 
-    base_columns = [
-        "cycle", "Macc", "Menv", "Mej", "Yenv", "Yej", "Zenv", "Zej",
-        "Tmax", "Tc", "RHOc", "time", "t3", "t-ML", "C12", "C13",
-        "N14", "N15", "O16", "O17", "O18", "Ne", "Na", "Mg",
-        "Al26", "Al27", "Si", "P", "Vej_avg", "Mdot_ej",
-        "MWD", "Iacc", "Iej", "Press"
-    ]
-
     # If number of columns matches base_columns + 1, assume extra column is companion_mass
-    if df.shape[1] == len(base_columns) + 1:
-        column_names = base_columns + ["companion_mass"]
+    if df.shape[1] == len(BASE_COLUMNS) + 1:
+        column_names = BASE_COLUMNS + ["companion_mass"]
     else:
-        column_names = base_columns
+        column_names = BASE_COLUMNS
 
     df.columns = column_names
     return df
 
 
-def concatenate_files(file_list):
+def concatenate_files(file_list, columns=None):
     """
     Concatenates multiple data files into a single DataFrame.
 
@@ -50,6 +71,8 @@ def concatenate_files(file_list):
     ----------
     file_list : list of str
         A list of paths to the data files.
+    columns : list of str, optional
+        Names of the columns to read, 'cycle' and 'time' are always included.
 
     Returns
     -------
@@ -60,8 +83,11 @@ def concatenate_files(file_list):
     cycle_offset = 0
     time_offset = 0.0
 
+    if columns is not None:
+        columns = ["cycle", "time"] + [col for col in columns if col not in ("cycle", "time")]
+
     for file_name in file_list:
-        df = read_mat_file(file_name)
+        df = read_mat_file(file_name, columns)
         if cycle_offset or time_offset:
             df["cycle"] += cycle_offset
             df["time"] += time_offset
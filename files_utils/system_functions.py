@@ -1,9 +1,14 @@
+import weakref
 import plotly.graph_objects as go
+from plotly.subplots import make_subplots
 import numpy as np
 import pandas as pd
 
+from files_utils import downsampling, demarcators, memory, metrics
+from callbacks_helpers.lru_cache import LRUCache
 
-def system_info(df):
+
+def system_info(df, load_peak_bytes=None):
     """
     Extracts basic metadata and structural information from a DataFrame.
 
@@ -11,6 +16,8 @@ def system_info(df):
     ----------
     df : pandas.DataFrame
         The input DataFrame.
+    load_peak_bytes : int or None
+        Peak memory allocated while loading the DataFrame, if measured.
 
     Returns
     -------
@@ -20,12 +27,14 @@ def system_info(df):
             - 'num_columns': Total number of columns.
             - 'num_rows': Total number of rows.
             - 'max_cycle': Maximum value in 'cycle' column if present, else None.
+            - 'memory': Bytes per column, total and load peak, see `memory.memory_report`.
     """
     result = {
         'column_names': df.columns.tolist(),
         'num_columns': df.shape[1],
         'num_rows': df.shape[0],
-        'max_cycle': df['cycle'].max() if 'cycle' in df.columns else None
+        'max_cycle': df['cycle'].max() if 'cycle' in df.columns else None,
+        'memory': memory.memory_report(df, load_peak_bytes),
     }
 
     return result
@@ -58,11 +67,75 @@ def get_df_preview(df, columns_to_show=None, row_start=None, row_end=None):
     return df.iloc[row_start:row_end]
 
 
-def plot_x_vs_y(df, x_column, y_column, log_x=False, log_y=False):
+def _pyramid_nbytes(pyramid):
+    """Returns the bytes held by the arrays of a pyramid from `downsampling.build_pyramid`."""
+    return pyramid['x'].nbytes + pyramid['y'].nbytes + sum(
+        array.nbytes for level in pyramid['levels'] for array in level.values() if isinstance(array, np.ndarray))
+
+
+# Pyramids of sorted column pairs, bounded in size and dropped with their DataFrame
+xy_pyramid_cache = LRUCache(maxsize=32, maxbytes=256 * 1024 ** 2, sizeof=_pyramid_nbytes)
+
+
+def get_xy_pyramid(df, x_column, y_column, log_x=False, log_y=False):
+    """
+    Returns the finite plotted values of two columns, with a multi-resolution pyramid
+    when the x values are sorted (e.g. time). Only pyramids with levels are cached.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+    x_column : str
+    y_column : str
+    log_x : bool, default False
+        If True, use log10 of the positive x values.
+    log_y : bool, default False
+        If True, use log10 of the positive y values.
+
+    Returns
+    -------
+    dict
+        'x' and 'y' arrays, and 'levels' (see `downsampling.build_pyramid`),
+        None if the x values are not sorted.
+    """
+    key = (id(df), x_column, y_column, log_x, log_y)
+    pyramid = xy_pyramid_cache.get(key)
+    if pyramid is not None:
+        return pyramid
+
+    x = df[x_column].to_numpy(dtype=float)
+    y = df[y_column].to_numpy(dtype=float)
+    valid = np.isfinite(x) & np.isfinite(y)
+    if log_x:
+        valid &= x > 0
+    if log_y:
+        valid &= y > 0
+    x, y = x[valid], y[valid]
+    if log_x:
+        x = np.log10(x)
+    if log_y:
+        y = np.log10(y)
+
+    if not np.all(np.diff(x) >= 0):
+        return {'x': x, 'y': y, 'levels': None}
+
+    pyramid = downsampling.build_pyramid(x, y)
+    if pyramid['levels']:
+        xy_pyramid_cache.put(key, pyramid)
+        weakref.finalize(df, xy_pyramid_cache.pop, key, None)
+    return pyramid
+
+
+@metrics.timed(rows=metrics.rows_of_first_arg)
+def plot_x_vs_y(df, x_column, y_column, log_x=False, log_y=False, max_points=downsampling.DEFAULT_MAX_POINTS, x_range=None):
     """
     Creates a scatter plot of two columns in a DataFrame using Plotly,
     with optional log10 transformation for each axis.
 
+    Large columns are downsampled: from the multi-resolution pyramid when the x column
+    is sorted, with a line through the block means, otherwise to the extrema of both
+    columns within row buckets.
+
     Parameters
     ----------
     df : pandas.DataFrame
@@ -75,6 +148,11 @@ def plot_x_vs_y(df, x_column, y_column, log_x=False, log_y=False):
         If True, apply log10 transformation to the x-axis values.
     log_y : bool, default False
         If True, apply log10 transformation to the y-axis values.
+    max_points : int or None
+        Maximum number of points to plot. If None, all points are plotted.
+    x_range : tuple[float, float] or None
+        Visible x range (in plotted units); only the points within it are plotted,
+        at the finest resolution the budget allows.
 
     Returns
     -------
@@ -84,32 +162,105 @@ def plot_x_vs_y(df, x_column, y_column, log_x=False, log_y=False):
     if x_column not in df.columns or y_column not in df.columns:
         raise ValueError(f"Columns '{x_column}' and/or '{y_column}' not found in DataFrame.")
 
-    x = df[x_column]
-    y = df[y_column]
+    pyramid = get_xy_pyramid(df, x_column, y_column, log_x, log_y)
+    x, y = pyramid['x'], pyramid['y']
 
-    if log_x:
-        x = x[x > 0]
-        y = y.loc[x.index]
-        x = np.log10(x)
-
-    if log_y:
-        y = y[y > 0]
-        x = x.loc[y.index]
-        y = np.log10(y)
+    means = None
+    if pyramid['levels'] is not None:
+        # Two extrema and one mean per block
+        budget = max_points * 2 // 3 if max_points is not None else None
+        keep = downsampling.query_pyramid(pyramid, x_range, budget)
+        means = downsampling.query_pyramid_means(pyramid, x_range, budget)
+    else:
+        selected = np.arange(len(x))
+        if x_range is not None:
+            selected = np.flatnonzero((x >= x_range[0]) & (x <= x_range[1]))
+        keep = selected[downsampling.downsample_indices(x[selected], y[selected], max_points, method='minmax')]
+    x, y = x[keep], y[keep]
 
     fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=x,
-        y=y,
+    fig.add_trace(downsampling.scatter_trace(
+        x,
+        y,
         mode='markers',
         marker=dict(size=8, color='royalblue'),
         name=f'{y_column} vs {x_column}'
     ))
+    if means is not None:
+        # The trend within the downsampled extrema
+        fig.add_trace(downsampling.scatter_trace(
+            *means,
+            mode='lines',
+            line=dict(width=1, color='orange'),
+            name='block mean'
+        ))
 
     fig.update_layout(
         title=f"{'log10 ' if log_y else ''}{y_column} vs {'log10 ' if log_x else ''}{x_column}",
         xaxis_title=f"log10({x_column})" if log_x else x_column,
         yaxis_title=f"log10({y_column})" if log_y else y_column,
+        template="plotly_white",
+        uirevision=f"{x_column}/{y_column}"
+    )
+    if x_range is not None:
+        fig.update_layout(xaxis_range=list(x_range))
+
+    return fig
+
+
+@metrics.timed(rows=metrics.rows_of_first_arg)
+def plot_x_vs_y_density(df, x_column, y_column, log_x=False, log_y=False, bins=(400, 300)):
+    """
+    Creates a density heatmap of two columns in a DataFrame using Plotly,
+    with optional log10 transformation for each axis.
+
+    All points are binned into a 2D histogram, so the figure size does not depend
+    on the number of rows.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        The input DataFrame.
+    x_column : str
+        Column name for the x-axis.
+    y_column : str
+        Column name for the y-axis.
+    log_x : bool, default False
+        If True, apply log10 transformation to the x-axis values.
+    log_y : bool, default False
+        If True, apply log10 transformation to the y-axis values.
+    bins : tuple[int, int]
+        Number of bins along the x and y axes.
+
+    Returns
+    -------
+    plotly.graph_objects.Figure
+        A Plotly Figure object with the point counts as a heatmap (log10 color scale).
+    """
+    if x_column not in df.columns or y_column not in df.columns:
+        raise ValueError(f"Columns '{x_column}' and/or '{y_column}' not found in DataFrame.")
+
+    x_centers, y_centers, counts = downsampling.density_grid(df[x_column], df[y_column], log_x, log_y, bins)
+    if counts.size == 0:
+        raise ValueError("No valid points to plot.")
+
+    with np.errstate(divide='ignore'):
+        # Single precision is plenty for a color scale and halves the payload
+        z = np.where(counts > 0, np.log10(counts), np.nan).astype(np.float32)
+
+    fig = go.Figure(go.Heatmap(
+        x=x_centers,
+        y=y_centers,
+        z=z,
+        colorscale='Viridis',
+        colorbar=dict(title='log10(count)'),
+        hovertemplate="x: %{x}<br>y: %{y}<br>log10(count): %{z:.2f}<extra></extra>"
+    ))
+
+    fig.update_layout(
+        title=f"Density of {'log10 ' if log_y else ''}{y_column} vs {'log10 ' if log_x else ''}{x_column}",
+        xaxis_title=f"log10({x_column})" if log_x else x_column,
+        yaxis_title=f"log10({y_column})" if log_y else y_column,
         template="plotly_white"
     )
 
@@ -132,12 +283,59 @@ def calculate_cycles_length(df):
     dict[int, float]
         Dictionary mapping each cycle ID to its duration (max - min time).
     """
+    return _cycles_length_series(df).to_dict()
+
+
+def _cycles_length_series(df):
+    """Cycle durations (max - min time) as a Series indexed by cycle."""
     grp = df.groupby('cycle')['time']
-    duration_series = grp.max() - grp.min()
-    return duration_series.to_dict()
+    return grp.max() - grp.min()
 
 
-def plot_cycles_lengths_vs_param(l_df, mat_df, param, log_x=False, log_y=False):
+@metrics.timed(rows=metrics.rows_of_first_arg)
+def cycles_summary(l_df, mat_df, mat_columns=("MWD", "companion_mass", "t3", "Mej")):
+    """
+    Summarizes each cycle of a system in one row.
+
+    Parameters
+    ----------
+    l_df : pandas.DataFrame
+        The system's 'l' data, with 'cycle', 'time', 'effective temperature' and
+        'accumulated mass' columns.
+    mat_df : pandas.DataFrame
+        The system's 'mat' data, with a 'cycle' column.
+    mat_columns : iterable of str
+        Per-cycle 'mat' columns to include, when present.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Indexed by cycle, with the columns 'start_time', 'end_time', 'cycle length',
+        'min effective temperature', 'max effective temperature', 'eruption start_time',
+        'eruption end_time' (NaN for cycles without ejection) and the `mat_columns`.
+    """
+    grp = l_df.groupby('cycle')
+    summary = pd.DataFrame({
+        'start_time': grp['time'].min(),
+        'end_time': grp['time'].max(),
+        'min effective temperature': grp['effective temperature'].min(),
+        'max effective temperature': grp['effective temperature'].max(),
+    })
+    summary.insert(2, 'cycle length', summary['end_time'] - summary['start_time'])
+
+    eruptions = demarcators.demarcate_eruption_times(l_df)
+    summary['eruption start_time'] = eruptions['start_time'].reindex(summary.index)
+    summary['eruption end_time'] = eruptions['end_time'].reindex(summary.index)
+
+    per_cycle = mat_df.drop_duplicates('cycle').set_index('cycle')
+    for col in mat_columns:
+        if col in per_cycle.columns:
+            summary[col] = per_cycle[col].reindex(summary.index)
+    return summary
+
+
+@metrics.timed(rows=metrics.rows_of_first_arg)
+def plot_cycles_lengths_vs_param(l_df, mat_df, param, log_x=False, log_y=False, max_points=downsampling.DEFAULT_MAX_POINTS):
     """
     Plots a scatter plot of cycle lengths vs. a selected parameter (e.g., t3),
     with optional log scaling for both axes.
@@ -148,113 +346,139 @@ def plot_cycles_lengths_vs_param(l_df, mat_df, param, log_x=False, log_y=False):
         DataFrame used to calculate cycle lengths.
     mat_df : pandas.DataFrame
         DataFrame containing the target parameter column.
-    param : str
-        Column name in mat_df to use on the x-axis.
+    param : str or list of str
+        Column name(s) in mat_df to use on the x-axis; one panel is drawn per parameter.
     log_x : bool, default False
         If True, log10-transform the param values.
     log_y : bool, default False
         If True, log10-transform the cycle lengths.
+    max_points : int or None
+        Maximum number of points to plot per panel. If None, all points are plotted.
 
     Returns
     -------
     plotly.graph_objects.Figure
-        A Plotly scatter plot of the parameter vs. cycle length.
+        A Plotly scatter plot of the parameter vs. cycle length, with one panel per parameter.
     """
-    cycle_lengths = calculate_cycles_length(l_df)
+    params = [param] if isinstance(param, str) else list(param)
+    if not params:
+        raise ValueError("No parameter to plot.")
 
     if "cycle" not in mat_df.columns:
         raise ValueError("'mat_df' must contain a 'cycle' column.")
-    if param not in mat_df.columns:
-        raise ValueError(f"'{param}' not found in 'mat_df'.")
-
-    if param == "cycle":
-        param_series = mat_df.set_index("cycle").index.to_series()
-    else:
-        param_series = mat_df.set_index("cycle")[param]
+    for p in params:
+        if p not in mat_df.columns:
+            raise ValueError(f"'{p}' not found in 'mat_df'.")
+
+    # Join the cycle lengths with the parameters on the cycle index
+    per_cycle = mat_df.drop_duplicates("cycle").set_index("cycle")
+    joined = _cycles_length_series(l_df).rename("cycle length").to_frame().join(
+        per_cycle[[p for p in params if p != "cycle"]], how="inner"
+    )
+    if "cycle" in params:
+        joined["cycle"] = joined.index.to_numpy()
 
-    # Filter valid cycles
-    valid_data = {
-        cid: (cycle_lengths[cid], param_series[cid])
-        for cid in cycle_lengths
-        if cid in param_series.index and pd.notna(cycle_lengths[cid]) and pd.notna(param_series[cid])
-    }
+    y_label = "Cycle Length (log10)" if log_y else "Cycle Length"
+    fig = make_subplots(rows=1, cols=len(params), shared_yaxes=True) if len(params) > 1 else go.Figure()
+    n_plotted = 0
+
+    for i, p in enumerate(params):
+        x = joined[p].to_numpy(dtype=float)
+        y = joined["cycle length"].to_numpy(dtype=float)
+        cycles = joined.index.to_numpy()
+
+        # Filter valid cycles
+        valid = np.isfinite(x) & np.isfinite(y)
+        if log_x:
+            valid &= x > 0
+        if log_y:
+            valid &= y > 0
+        x, y, cycles = x[valid], y[valid], cycles[valid]
+        if log_x:
+            x = np.log10(x)
+        if log_y:
+            y = np.log10(y)
+
+        keep = downsampling.downsample_indices(x, y, max_points, method='minmax')
+        x, y, cycles = x[keep], y[keep], cycles[keep]
+        n_plotted += len(x)
+
+        x_label = f"{p} (log10)" if log_x else p
+        trace = downsampling.scatter_trace(
+            x,
+            y,
+            mode="markers",
+            name=f"{p} vs Cycle Length",
+            marker=dict(color="blue") if len(params) == 1 else None,
+            text=cycles.astype(str),
+            hovertemplate=(
+                "Cycle: %{text}<br>"
+                f"{x_label}: %{{x}}<br>"
+                f"{y_label}: %{{y}}<extra></extra>"
+            )
+        )
+        if len(params) > 1:
+            fig.add_trace(trace, row=1, col=i + 1)
+            fig.update_xaxes(title_text=x_label, row=1, col=i + 1)
+        else:
+            fig.add_trace(trace)
 
-    if not valid_data:
+    if not n_plotted:
         raise ValueError("No valid cycle data to plot.")
 
-    x = pd.Series({cid: val[1] for cid, val in valid_data.items()})
-    y = pd.Series({cid: val[0] for cid, val in valid_data.items()})
-
-    if log_x:
-        x = x[x > 0]
-        y = y.loc[x.index]
-        x = np.log10(x)
-
-    if log_y:
-        y = y[y > 0]
-        x = x.loc[y.index]
-        y = np.log10(y)
-
-    x_label = f"{param} (log10)" if log_x else param
-    y_label = "Cycle Length (log10)" if log_y else "Cycle Length"
-
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=x.values,
-        y=y.values,
-        mode="markers",
-        name=f"{param} vs Cycle Length",
-        marker=dict(color="blue"),
-        text=x.index.astype(str),
-        hovertemplate=(
-            "Cycle: %{text}<br>"
-            f"{x_label}: %{x}<br>"
-            f"{y_label}: %{y}<extra></extra>"
+    if len(params) > 1:
+        fig.update_yaxes(title_text=y_label, row=1, col=1)
+        fig.update_layout(title=f"Parameters vs {y_label}", legend=dict(x=0.01, y=0.99))
+    else:
+        x_label = f"{params[0]} (log10)" if log_x else params[0]
+        fig.update_layout(
+            title=f"{x_label} vs {y_label}",
+            xaxis=dict(title=x_label),
+            yaxis=dict(title=y_label),
+            legend=dict(x=0.01, y=0.99)
         )
-    ))
-
-    fig.update_layout(
-        title=f"{x_label} vs {y_label}",
-        xaxis=dict(title=x_label),
-        yaxis=dict(title=y_label),
-        legend=dict(x=0.01, y=0.99)
-    )
 
     return fig
 
 
-def plot_cycles(l_df, mat_df, cycles_list, demarcator_func):
+# Columns needed to demarcate and plot the decay phases
+DECAY_L_COLUMNS = ["cycle", "time", "accumulated mass", "effective temperature"]
+DECAY_MAT_COLUMNS = ["cycle", "MWD", "companion_mass"]
+
+
+def decay_phases(l_df, mat_df, cycles_list, demarcator_func):
     """
-    Plots the time vs effective temperature for specified cycles.
+    Extracts the decay phase of the specified cycles.
 
     Parameters
     ----------
     l_df : pandas.DataFrame
         Input data with time and effective temperature columns.
     mat_df : pandas.DataFrame
-        Contains metadata including MWD and possibly companion_mass.
+        Contains metadata including MWD and possibly companion_mass, indexed by cycle.
     cycles_list : list of int
-        List of cycle numbers to plot.
+        List of cycle numbers to extract.
     demarcator_func : callable
         Function that takes `l_df` and returns a dict mapping cycle numbers
         to (start_index, end_index) tuples.
 
     Returns
     -------
-    plotly.graph_objects.Figure
-        A Plotly scatter plot of effective temperature over time per cycle.
+    list of dict
+        One dict per demarcated cycle with 'cycle', 'label', 'time' (log10 of the time
+        since the start of the phase) and 'temperature' arrays.
     """
     cycles_dict = demarcator_func(l_df)
-    fig = go.Figure()
+    phases = []
 
     for cycle in cycles_list:
         start_idx, end_idx = cycles_dict.get(cycle, (None, None))
         if start_idx is None or end_idx is None:
             continue
 
-        phase = l_df.iloc[start_idx:end_idx].copy()
-        phase['time'] -= phase['time'].min()
-        phase['time'] = np.log10(phase['time'] + 1e-10)  # Prevent log(0)
+        phase = l_df.iloc[start_idx:end_idx]
+        time = phase['time'].to_numpy(dtype=float)
+        time = np.log10(time - time.min() + 1e-10)  # Prevent log(0)
 
         # Prepare label with optional MWD and companion_mass
         label = f"Cycle {cycle}"
@@ -271,12 +495,50 @@ def plot_cycles(l_df, mat_df, cycles_list, demarcator_func):
             if extra_info:
                 label += " (" + ", ".join(extra_info) + ")"
 
-        fig.add_trace(go.Scatter(
-            x=phase['time'],
-            y=phase['effective temperature'],
-            mode='markers',
-            name=label
-        ))
+        phases.append({
+            'cycle': cycle,
+            'label': label,
+            'time': time,
+            'temperature': phase['effective temperature'].to_numpy(dtype=float),
+        })
+
+    return phases
+
+
+@metrics.timed()
+def plot_decay_phases(systems_phases, max_points=downsampling.DEFAULT_MAX_POINTS):
+    """
+    Overlays the decay phases of one or several systems in a single figure.
+
+    Parameters
+    ----------
+    systems_phases : list of tuple
+        (system name, phases) pairs, where phases is the output of `decay_phases`.
+        The system name prefixes the trace names when there is more than one system.
+    max_points : int or None
+        Maximum number of points to plot, shared between all the phases. Each phase is
+        downsampled with Largest-Triangle-Three-Buckets. If None, all points are plotted.
+
+    Returns
+    -------
+    plotly.graph_objects.Figure
+        A Plotly scatter plot of effective temperature over time per cycle.
+    """
+    fig = go.Figure()
+    n_phases = sum(len(phases) for _, phases in systems_phases)
+    phase_max_points = max(max_points // max(n_phases, 1), 3) if max_points is not None else None
+
+    for system_name, phases in systems_phases:
+        for phase in phases:
+            name = f"{system_name}: {phase['label']}" if len(systems_phases) > 1 else phase['label']
+            keep = downsampling.downsample_indices(phase['time'], phase['temperature'], phase_max_points, method='lttb')
+
+            fig.add_trace(downsampling.scatter_trace(
+                phase['time'][keep],
+                phase['temperature'][keep],
+                mode='markers',
+                name=name
+            ))
 
     fig.update_layout(
         title="Time vs Effective Temperature",
@@ -288,3 +550,30 @@ def plot_cycles(l_df, mat_df, cycles_list, demarcator_func):
     )
 
     return fig
+
+
+def plot_cycles(l_df, mat_df, cycles_list, demarcator_func, max_points=downsampling.DEFAULT_MAX_POINTS):
+    """
+    Plots the time vs effective temperature for specified cycles.
+
+    Parameters
+    ----------
+    l_df : pandas.DataFrame
+        Input data with time and effective temperature columns.
+    mat_df : pandas.DataFrame
+        Contains metadata including MWD and possibly companion_mass.
+    cycles_list : list of int
+        List of cycle numbers to plot.
+    demarcator_func : callable
+        Function that takes `l_df` and returns a dict mapping cycle numbers
+        to (start_index, end_index) tuples.
+    max_points : int or None
+        Maximum number of points to plot, shared between the cycles. Each cycle is
+        downsampled with Largest-Triangle-Three-Buckets. If None, all points are plotted.
+
+    Returns
+    -------
+    plotly.graph_objects.Figure
+        A Plotly scatter plot of effective temperature over time per cycle.
+    """
+    return plot_decay_phases([(None, decay_phases(l_df, mat_df, cycles_list, demarcator_func))], max_points)
@@ -0,0 +1,13 @@
+import os
+
+
+# Import the app, load the database and build the estimation indexes once in the
+# master process; the forked workers share them copy-on-write
+preload_app = True
+
+bind = os.environ.get("BINARY_SYSTEMS_BIND", "0.0.0.0:8050")
+workers = int(os.environ.get("BINARY_SYSTEMS_WORKERS", max(os.cpu_count() // 2, 1)))
+threads = int(os.environ.get("BINARY_SYSTEMS_THREADS", 4))
+
+# Plot and estimation callbacks on large systems can take a while
+timeout = int(os.environ.get("BINARY_SYSTEMS_TIMEOUT", 300))
@@ -47,7 +47,16 @@ advanced_search_page = html.Div([
             ], className='input-group'),
         ], className='input-pair-container'),
 
-        html.Button("Estimate", id="estimate-nova-button", n_clicks=0, className='button'),
+        html.Div([
+            html.Label("Monte-Carlo samples (optional):", className='input-label'),
+            dcc.Input(id='nova-samples-input', type='number', min=1, step=1, placeholder='e.g., 2000', className='text-input numeric-input'),
+        ], className='input-group'),
+
+        html.Div([
+            html.Button("Estimate", id="estimate-nova-button", n_clicks=0, className='button button-margin-right'),
+            html.Button("Cancel", id="cancel-nova-button", n_clicks=0, disabled=True, className='button'),
+        ], className='button-group'),
+        html.Div(id='last-nova-progress', className='info-message'),
         html.Div(id='last-nova-output', className='output-area'),
 
     ], className='section-container'),
@@ -121,7 +130,22 @@ advanced_search_page = html.Div([
             ], className='input-group'),
         ], className='input-triple-container'),
 
-        html.Button("Estimate", id="estimate-fourth-param-button", n_clicks=0, className='button'),
+        html.Div([
+            dcc.RadioItems(
+                id='missing-param-mode',
+                options=[
+                    {'label': 'Closest simulated row', 'value': 'closest'},
+                    {'label': 'Interpolated between simulations (time is since the eruption start)', 'value': 'surrogate'},
+                ],
+                value='closest',
+            )
+        ], className='input-group'),
+
+        html.Div([
+            html.Button("Estimate", id="estimate-fourth-param-button", n_clicks=0, className='button button-margin-right'),
+            html.Button("Cancel", id="cancel-fourth-param-button", n_clicks=0, disabled=True, className='button'),
+        ], className='button-group'),
+        html.Div(id='fourth-param-progress', className='info-message'),
         html.Div(id='fourth-param-output', className='output-area'),
 
     ], className='section-container'),
@@ -175,7 +199,11 @@ advanced_search_page = html.Div([
             ], className='input-group'),
         ], className='input-triple-container'),
 
-        html.Button("Estimate", id="estimate-two-params-button", n_clicks=0, className='button'),
+        html.Div([
+            html.Button("Estimate", id="estimate-two-params-button", n_clicks=0, className='button button-margin-right'),
+            html.Button("Cancel", id="cancel-two-params-button", n_clicks=0, disabled=True, className='button'),
+        ], className='button-group'),
+        html.Div(id='two-params-progress', className='info-message'),
         html.Div(id='estimated-two-params-output', className='output-area'),
 
     ], className='section-container'),
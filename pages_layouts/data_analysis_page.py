@@ -4,20 +4,21 @@ data_analysis_page = html.Div([
 
     html.Div([
         html.H3("Plot decay of effective temperature after eruption", className='section-title'),
-        html.P("Enter the system name and select cycles to plot their effective temperature over time.", className='section-description'),
+        html.P("Select one or more systems and the cycles to overlay their effective temperature over time.", className='section-description'),
 
         html.Div([
-            html.Label("System Name:", className='input-label'),
+            html.Label("System Names:", className='input-label'),
             dcc.Dropdown(
                 id='system-name-dropdown-temp-time',
-                placeholder='Select system name',
+                placeholder='Select system names',
                 className='dropdown-input',
+                multi=True,
                 options=[]  # Will be filled dynamically via callback
             ),
         ], className='input-group'),
 
         html.Div([
-            html.Label("Cycles List (e.g., [10, 100, 200]):", className='input-label'),
+            html.Label("Cycles List (e.g., [10, 100, 200], or per system {'system_a': [10], 'system_b': [20, 30]}):", className='input-label'),
             dcc.Input(
                 id='cycles-list-input-temp-time',
                 type='text',
@@ -26,7 +27,11 @@ data_analysis_page = html.Div([
             ),
         ], className='input-group'),
 
-        html.Button("Generate Plot", id='generate-temp-time-plot-button', n_clicks=0, className='button'),
+        html.Div([
+            html.Button("Generate Plot", id='generate-temp-time-plot-button', n_clicks=0, className='button button-margin-right'),
+            html.Button("Cancel", id='cancel-temp-time-plot-button', n_clicks=0, disabled=True, className='button'),
+        ], className='button-group'),
+        html.Div(id='temp-time-plot-progress', className='info-message'),
 
         html.Div(id='temp-time-plot', className='output-area'),
 
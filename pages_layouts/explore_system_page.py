@@ -10,7 +10,12 @@ explore_system_page = html.Div([
             html.Label("System Name:", className='input-label'),
             dcc.Dropdown(id='system-name-dropdown',placeholder='Select system...',className='dropdown-input',),
         ], className='input-group'),
-        html.Button("Load System", id='load-button', n_clicks=0, className='button'),
+        html.Div([
+            html.Button("Load System", id='load-button', n_clicks=0, className='button button-margin-right'),
+            html.Button("Cancel", id='cancel-load-button', n_clicks=0, disabled=True, className='button'),
+        ], className='button-group'),
+        html.Div(id='load-progress', className='info-message'),
+        dcc.Store(id='loaded-system-store'),
 
         html.Div(id='files-list-to_display', className='output-area'),
         html.Div(id='system-info-output', className='output-area'),
@@ -111,6 +116,18 @@ explore_system_page = html.Div([
             ], className='input-group half-width'),
         ], className='input-pair-container'),
 
+        html.Div([
+            dcc.RadioItems(
+                id='plot-mode',
+                options=[
+                    {'label': 'Scatter', 'value': 'scatter'},
+                    {'label': 'Density', 'value': 'density'},
+                ],
+                value='scatter',
+                inline=True
+            )
+        ], className='input-group'),
+
         html.Button("Plot", id='plot-button', n_clicks=0, className='button'),
         html.Div(id='plot-output', className='output-area'),
     ], className='section-container'),
@@ -120,14 +137,15 @@ explore_system_page = html.Div([
     # SECTION 4: Plot Cycle Length
     html.Div([
         html.H3("Plot Cycle Length vs Column", className='section-title'),
-        html.P("Select a column to plot against cycle length."),
+        html.P("Select one or more columns to plot against cycle length, one panel per column."),
 
         html.Div([
-            html.Label("Select Column:", className='input-label'),
+            html.Label("Select Columns:", className='input-label'),
             dcc.Dropdown(
                 id='cycle-length-col-dropdown',
                 options=[],
-                placeholder='Select column...',
+                multi=True,
+                placeholder='Select columns...',
                 className='dropdown-input',
             ),
         ], className='input-group half-width'),
@@ -0,0 +1,8 @@
+"""
+WSGI entry point, e.g. `gunicorn -c gunicorn.conf.py wsgi:server`.
+
+The database path is read from the BINARY_SYSTEMS_DB environment variable.
+"""
+from app import create_app
+
+server = create_app().server